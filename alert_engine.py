@@ -0,0 +1,188 @@
+# 导入必要的库
+import time  # 导入时间模块，用于记录事件的墙钟时间
+from collections import deque  # 导入双端队列，用于滑动窗口
+
+ANOMALY_CLASS_ID = 0  # 异常类别ID，对应 CLASS_NAMES 中的 '异常'
+
+
+def box_iou(a, b):
+    """
+    计算两个 (x1, y1, x2, y2) 边界框的交并比
+    """
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])  # 交集左上角
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])  # 交集右下角
+    inter = max(0, ix2 - ix1) * max(0, iy2 - iy1)  # 交集面积
+    if inter == 0:  # 没有交集
+        return 0.0
+    area_a = (a[2] - a[0]) * (a[3] - a[1])  # 框a面积
+    area_b = (b[2] - b[0]) * (b[3] - b[1])  # 框b面积
+    return inter / float(area_a + area_b - inter)  # 交并比
+
+
+class _Track:
+    # 单个区域/目标的滑动窗口状态，每帧更新为O(1)
+    def __init__(self, track_id, box, window_frames):
+        self.track_id = track_id  # 轨迹ID
+        self.box = box  # 最近一次匹配到的边界框
+        self.window = deque(maxlen=window_frames)  # 最近若干帧的异常证据（置信度，未出现为0）
+        self.window_sum = 0.0  # 窗口内证据之和，随进出窗口增量维护
+        self.nonzero = 0  # 窗口内非零证据的帧数（整数计数，不受浮点累计误差影响）
+        self.above_frames = 0  # 证据连续高于阈值的帧数
+        self.below_frames = 0  # 事件激活后证据连续低于结束阈值的帧数
+        self.active = False  # 是否处于报警事件中
+        self.event_id = None  # 当前事件ID
+        self.start_frame = None  # 事件开始帧号
+        self.start_timestamp = None  # 事件开始（start 事件发出）时的墙钟时间
+        self.peak_confidence = 0.0  # 事件期间的最高置信度
+        self.frames_since_update = 0  # 距离上一次 update 事件的帧数
+
+    def push(self, evidence):
+        # 向滑动窗口中加入一帧证据，并增量维护窗口和
+        if len(self.window) == self.window.maxlen:  # 窗口已满
+            self.window_sum -= self.window[0]  # 减去即将被挤出的最旧值
+            self.nonzero -= self.window[0] != 0.0  # 最旧值是非零证据
+        self.window.append(evidence)  # 加入新值
+        self.window_sum += evidence  # 累加新值
+        self.nonzero += evidence != 0.0  # 新值是非零证据
+        if self.nonzero == 0:  # 窗口全为0，消除加减累计的浮点误差（如 3e-15）
+            self.window_sum = 0.0
+
+    def mean(self):
+        # 窗口内证据的平均值
+        return self.window_sum / len(self.window) if self.window else 0.0
+
+
+class AlertEngine:
+    """
+    事件级异常报警引擎
+
+    逐帧接收检测结果，把异常框按IoU关联到区域/轨迹上，对每个轨迹维护滑动窗口的平均置信度。
+    证据持续高于阈值达到 min_duration 秒后发出 start 事件，事件期间每隔 update_interval 秒
+    发出 update 事件，证据持续低于结束阈值达到 end_duration 秒后发出 end 事件。
+    事件以字典形式通过回调函数发出。
+    """
+
+    def __init__(self, callback=None, fps=25.0, threshold=0.5, end_threshold=None,
+                 window_seconds=1.0, min_duration=1.0, end_duration=2.0,
+                 update_interval=5.0, iou_threshold=0.3, class_id=ANOMALY_CLASS_ID):
+        self.callback = callback  # 事件回调函数，参数为事件字典
+        self.fps = fps if fps and fps > 0 else 25.0  # 视频帧率，用于把秒换算为帧数
+        self.threshold = threshold  # 触发事件的平均置信度阈值
+        self.end_threshold = end_threshold if end_threshold is not None else threshold * 0.5  # 结束事件的阈值（滞回）
+        self.window_frames = max(1, int(round(window_seconds * self.fps)))  # 滑动窗口帧数
+        self.min_frames = max(1, int(round(min_duration * self.fps)))  # 触发事件所需的持续帧数
+        self.end_frames = max(1, int(round(end_duration * self.fps)))  # 结束事件所需的持续帧数
+        self.update_frames = max(1, int(round(update_interval * self.fps)))  # update 事件间隔帧数
+        self.iou_threshold = iou_threshold  # 关联轨迹的IoU阈值
+        self.class_id = class_id  # 关注的类别ID
+
+        self.tracks = {}  # 轨迹ID -> _Track
+        self.next_track_id = 1  # 下一个轨迹ID
+        self.next_event_id = 1  # 下一个事件ID
+
+    def reset(self):
+        # 清空所有轨迹状态（切换视频时调用）
+        self.tracks.clear()  # 清空轨迹
+        self.next_track_id = 1  # 重置轨迹ID
+
+    def update(self, frame_index, detections):
+        """
+        处理一帧检测结果，返回本帧产生的事件列表
+        """
+        anomalies = [d for d in detections if int(d['class_id']) == self.class_id]  # 只保留异常类别
+        evidence = self._associate(anomalies)  # 关联到轨迹，得到 轨迹ID -> 本帧证据
+
+        events = []  # 本帧产生的事件
+        for track_id in list(self.tracks):  # 遍历所有轨迹
+            track = self.tracks[track_id]  # 获取轨迹
+            track.push(evidence.get(track_id, 0.0))  # 本帧未出现的轨迹记为0
+            mean = track.mean()  # 窗口平均证据
+
+            if not track.active:  # 尚未报警
+                track.above_frames = track.above_frames + 1 if mean >= self.threshold else 0  # 更新持续高于阈值帧数
+                if track.above_frames >= self.min_frames:  # 持续时间足够，开始事件
+                    track.active = True  # 标记为报警中
+                    track.event_id = self.next_event_id  # 分配事件ID
+                    self.next_event_id += 1  # 事件ID自增
+                    track.start_frame = frame_index - self.min_frames + 1  # 事件从证据开始持续的那一帧算起
+                    track.start_timestamp = time.time()  # 记录开始时的墙钟时间（处理速度与视频速度不同时不能由持续时间反推）
+                    track.peak_confidence = max(track.window)  # 初始化峰值置信度
+                    track.below_frames = 0  # 重置低于阈值计数
+                    track.frames_since_update = 0  # 重置 update 计数
+                    events.append(self._make_event("start", track, frame_index, mean))  # 产生 start 事件
+                elif track.nonzero == 0 and track_id not in evidence:  # 窗口内已经没有任何证据
+                    del self.tracks[track_id]  # 丢弃轨迹
+            else:  # 报警中
+                track.peak_confidence = max(track.peak_confidence, evidence.get(track_id, 0.0))  # 更新峰值
+                track.below_frames = track.below_frames + 1 if mean < self.end_threshold else 0  # 更新持续低于阈值帧数
+                track.frames_since_update += 1  # 累计 update 间隔
+                if track.below_frames >= self.end_frames:  # 证据消失足够久，结束事件
+                    events.append(self._make_event("end", track, frame_index, mean))  # 产生 end 事件
+                    del self.tracks[track_id]  # 删除轨迹
+                elif track.frames_since_update >= self.update_frames:  # 到达 update 间隔
+                    track.frames_since_update = 0  # 重置计数
+                    events.append(self._make_event("update", track, frame_index, mean))  # 产生 update 事件
+
+        self._emit(events)  # 通过回调发出事件
+        return events  # 返回事件列表
+
+    def flush(self, frame_index):
+        """
+        视频结束或停止时，结束所有进行中的事件
+        """
+        events = [self._make_event("end", track, frame_index, track.mean())
+                  for track in self.tracks.values() if track.active]  # 为所有进行中的事件产生 end 事件
+        self.reset()  # 清空轨迹
+        self._emit(events)  # 通过回调发出事件
+        return events  # 返回事件列表
+
+    def active_incidents(self):
+        """
+        返回本帧仍能看到目标的进行中事件列表 [(事件ID, 边界框), ...]
+        """
+        return [(track.event_id, track.box) for track in self.tracks.values()
+                if track.active and track.window and track.window[-1] > 0]
+
+    def _associate(self, anomalies):
+        # 贪心IoU匹配：把本帧异常框关联到已有轨迹，未匹配的框创建新轨迹
+        evidence = {}  # 轨迹ID -> 本帧证据
+        for d in sorted(anomalies, key=lambda d: d['confidence'], reverse=True):  # 高置信度优先匹配
+            best_id, best_iou = None, self.iou_threshold  # 最佳匹配
+            for track_id, track in self.tracks.items():  # 遍历已有轨迹
+                if track_id in evidence:  # 本帧已匹配过
+                    continue
+                iou = box_iou(track.box, d['box'])  # 计算IoU
+                if iou >= best_iou:  # 更好的匹配
+                    best_id, best_iou = track_id, iou  # 记录最佳匹配
+            if best_id is None:  # 没有匹配的轨迹
+                best_id = self.next_track_id  # 分配新轨迹ID
+                self.next_track_id += 1  # 轨迹ID自增
+                self.tracks[best_id] = _Track(best_id, d['box'], self.window_frames)  # 创建新轨迹
+            self.tracks[best_id].box = d['box']  # 更新轨迹位置
+            evidence[best_id] = float(d['confidence'])  # 记录证据
+        return evidence  # 返回证据字典
+
+    def _make_event(self, event_type, track, frame_index, mean):
+        # 生成结构化事件记录
+        return {
+            'event_type': event_type,  # 事件类型：start / update / end
+            'event_id': track.event_id,  # 事件ID
+            'track_id': track.track_id,  # 轨迹ID
+            'class_id': self.class_id,  # 类别ID
+            'box': track.box,  # 最近的边界框
+            'start_frame': track.start_frame,  # 事件开始帧号
+            'frame_index': frame_index,  # 当前帧号
+            'video_time': frame_index / self.fps,  # 当前视频时间（秒）
+            'duration': (frame_index - track.start_frame + 1) / self.fps,  # 事件已持续时间（秒）
+            'mean_confidence': mean,  # 窗口平均置信度
+            'peak_confidence': track.peak_confidence,  # 峰值置信度
+            'start_timestamp': track.start_timestamp,  # 事件开始时的墙钟时间戳
+            'timestamp': time.time()  # 墙钟时间戳
+        }
+
+    def _emit(self, events):
+        # 逐个通过回调发出事件
+        if self.callback is None:  # 未设置回调
+            return
+        for event in events:  # 遍历事件
+            self.callback(event)  # 调用回调
@@ -3,30 +3,52 @@ import sys  # 导入系统模块，用于访问命令行参数和退出程序
 import os  # 导入操作系统模块，用于文件和路径操作
 import cv2  # 导入OpenCV库，用于图像处理和计算机视觉
 import time  # 导入时间模块，用于控制帧率和计时
+import queue  # 导入队列模块，用于视频工作线程的命令队列
+import itertools  # 导入迭代工具，用于分配运行ID
+import sqlite3  # 导入SQLite，用于捕获记录查询错误
+from collections import deque  # 导入双端队列，用于已推理待发送的帧
 import numpy as np  # 导入NumPy库，用于数值计算和数组操作
 from datetime import datetime  # 导入日期时间模块，用于时间戳记录
 from PIL import Image, ImageDraw, ImageFont  # 导入PIL库，用于图像处理和绘制中文文本
 import io  # 导入io模块，用于处理数据流
+from functools import lru_cache  # 导入LRU缓存装饰器，用于缓存文本蒙版
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLabel,
                            QPushButton, QFileDialog, QComboBox, QProgressBar,
                            QMessageBox, QStatusBar, QSplitter, QFrame, QToolBar,
-                           QAction, QStackedWidget, QRadioButton, QButtonGroup)  # 导入PyQt5部件，用于创建GUI
+                           QAction, QStackedWidget, QRadioButton, QButtonGroup, QCheckBox, QSlider,
+                           QDockWidget, QDateTimeEdit, QLineEdit, QDoubleSpinBox, QTableWidget,
+                           QTableWidgetItem, QHeaderView)  # 导入PyQt5部件，用于创建GUI
 from PyQt5.QtGui import QPixmap, QImage, QIcon, QFont, QColor  # 导入PyQt5图形相关类
 from PyQt5.QtCore import Qt, QTimer, QThread, pyqtSignal, QSize, QDateTime  # 导入PyQt5核心类
-from ultralytics import YOLO  # 导入YOLOv8模型，用于目标检测
+from alert_engine import AlertEngine  # 导入事件级异常报警引擎
+from autotune import load_profile, apply_thread_settings  # 导入本机调优配置
+from inference_backend import create_backend  # 导入推理后端（进程内模型或本地推理服务）
+from snapshot_writer import SnapshotWriter  # 导入异常快照异步写入器
+from detection_store import DetectionStore  # 导入检测记录与报警事件数据库
+from model_manager import (ModelLoaderThread, ABComparator, find_models, model_profile,
+                           MODEL_EXTENSIONS)  # 导入模型热切换与A/B对比工具
+from image_detector import ImageDetector  # 导入图像检测器（工作线程池推理，结果缓存）
+from image_pyramid import PyramidCache  # 导入大图预览金字塔缓存（解码阶段降采样）
+from shm_decoder import open_frame_source  # 导入帧来源（共享内存解码进程）
+from frame_pool import FramePool  # 导入帧缓冲池
+import tracing  # 导入可选的性能追踪
+from anomaly_heatmap import HeatmapStore  # 导入按摄像头的异常热力图
+from qos_controller import QosController, build_levels  # 导入服务质量控制器
+from media_cache import MediaCache, MediaPrefetchThread, decode_preview  # 导入媒体元数据与预览图缓存
+from batch_gallery import (FolderDetectionThread, GalleryModel, GalleryFilterModel, GalleryView,
+                           PathRole, MaxConfidenceRole, RecordRole)  # 导入文件夹批量检测和缩略图网格
 
 # 定义类别映射
 CLASS_NAMES = {0: '异常', 1: '正常'}  # 对应 ['anomaly', 'normal']，定义检测类别的映射关系
 
-def cv2_add_chinese_text(img, text, position, textColor=(0, 255, 0), textSize=30):
+_font_cache = {}  # 字号 -> 已加载的中文字体
+
+def load_chinese_font(textSize):
     """
-    使用PIL绘制中文文本到OpenCV图像
+    加载中文字体（按字号缓存，避免每次绘制都重新查找字体文件）
     """
-    if (isinstance(img, np.ndarray)):  # 判断是否OpenCV图片类型
-        img = Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))  # 将OpenCV图像转换为PIL图像
-    
-    # 创建一个可以在给定图像上绘制的对象
-    draw = ImageDraw.Draw(img)  # 创建绘图对象
+    if textSize in _font_cache:  # 已加载过该字号
+        return _font_cache[textSize]
     
     # 尝试加载多种中文字体
     fontStyle = None  # 初始化字体对象
@@ -52,85 +74,449 @@ def cv2_add_chinese_text(img, text, position, textColor=(0, 255, 0), textSize=30
     # 如果所有字体都无法加载，使用默认字体
     if fontStyle is None:  # 检查是否有可用字体
         fontStyle = ImageFont.load_default()  # 使用默认字体
+    _font_cache[textSize] = fontStyle  # 缓存字体
+    return fontStyle
+
+@lru_cache(maxsize=512)
+def _text_mask(text, textSize):
+    # 用PIL把文本渲染为灰度蒙版（按文本和字号缓存），返回 (蒙版, 相对绘制位置的偏移)
+    font = load_chinese_font(textSize)  # 获取字体
+    left, top, right, bottom = font.getbbox(text)  # 文本包围盒
+    mask = Image.new("L", (max(1, right - left), max(1, bottom - top)), 0)  # 只覆盖文本区域的蒙版
+    ImageDraw.Draw(mask).text((-left, -top), text, 255, font=font)  # 绘制文本
+    return np.asarray(mask), (left, top)
+
+def cv2_add_chinese_text(img, text, position, textColor=(0, 255, 0), textSize=30):
+    """
+    使用PIL绘制中文文本到OpenCV图像（原地绘制，只混合文本所在的小区域，不转换整幅图像）
+    """
+    if not isinstance(img, np.ndarray):  # 传入的是PIL图像
+        img = cv2.cvtColor(np.asarray(img), cv2.COLOR_RGB2BGR)  # 转换为OpenCV格式
     
-    # 绘制文本
-    draw.text(position, text, textColor, font=fontStyle)  # 在图像上绘制文本
+    mask, (left, top) = _text_mask(text, textSize)  # 获取文本蒙版
+    x, y = position[0] + left, position[1] + top  # 蒙版在图像中的位置
+    h, w = mask.shape  # 蒙版尺寸
+    x0, y0 = max(x, 0), max(y, 0)  # 裁剪到图像范围内
+    x1, y1 = min(x + w, img.shape[1]), min(y + h, img.shape[0])
+    if x0 >= x1 or y0 >= y1:  # 文本完全在图像外
+        return img
     
-    # 转换回OpenCV格式
-    return cv2.cvtColor(np.asarray(img), cv2.COLOR_RGB2BGR)  # 将PIL图像转换回OpenCV格式
+    # 按蒙版把文本颜色混合到图像上（textColor为RGB，图像为BGR）
+    roi = img[y0:y1, x0:x1]  # 文本区域（视图）
+    alpha = mask[y0 - y:y1 - y, x0 - x:x1 - x, None] * (1.0 / 255)  # 不透明度
+    color = np.array(textColor[::-1], dtype=np.float64)  # BGR颜色
+    roi[...] = roi * (1.0 - alpha) + color * alpha  # 原地混合
+    return img
 
 class VideoThread(QThread):
-    change_pixmap_signal = pyqtSignal(np.ndarray, list)  # 定义信号，用于传递处理后的帧和检测结果
+    """
+    常驻的视频检测工作线程
+
+    线程在第一次检测视频时启动，之后一直复用：模型只加载一次，切换视频不重建线程。
+    界面通过命令队列控制（load/start/pause/seek/stop/shutdown），命令在帧与帧之间处理，
+    因此暂停和停止最多延迟一帧生效。每次 load 分配新的运行ID，界面据此丢弃旧视频仍在排队中的帧。
+    """
+    change_pixmap_signal = pyqtSignal(np.ndarray, list, int, int)  # 定义信号，用于传递处理后的帧、检测结果、共享内存槽位号和运行ID
     progress_signal = pyqtSignal(int)  # 定义信号，用于更新处理进度
-    finished_signal = pyqtSignal()  # 定义信号，用于通知处理完成
+    finished_signal = pyqtSignal()  # 定义信号，用于通知视频处理完成
+    alert_signal = pyqtSignal(dict)  # 定义信号，用于传递报警事件（start/update/end）
+    backend_signal = pyqtSignal(str)  # 定义信号，用于传递推理后端状态（排队耗时、批大小）
+    qos_signal = pyqtSignal(dict)  # 定义信号，用于传递服务质量等级和实测帧率
+    state_signal = pyqtSignal(str)  # 定义信号，用于传递工作线程状态（playing/paused/stopped/finished）
+    error_signal = pyqtSignal(str)  # 定义信号，用于传递错误信息
+    ab_signal = pyqtSignal(dict)  # 定义信号，用于传递A/B对比统计
     
-    def __init__(self, video_path, model_path):
+    def __init__(self, model_path, profile=None, shared_decoder=True, server_address=None,
+                 snapshot_writer=None, target_fps=None, latency_budget_ms=None, adaptive=True,
+                 frame_pool=None, heatmap_store=None, detection_store=None):
         super().__init__()  # 调用父类初始化方法
-        self.video_path = video_path  # 设置视频路径
         self.model_path = model_path  # 设置模型路径
-        self.running = True  # 设置运行标志
+        self.profile = profile if profile is not None else load_profile()  # 设置推理配置（自动调优结果）
+        self.shared_decoder = shared_decoder  # 是否使用独立进程解码
+        self.server_address = server_address  # 本地推理服务地址，None时读取环境变量
+        self.snapshot_writer = snapshot_writer  # 异常快照写入器，None表示不保存快照
+        self.target_fps = target_fps  # 服务质量目标帧率，None时使用视频帧率
+        self.latency_budget_ms = latency_budget_ms  # 单帧推理延迟预算（毫秒），None表示不限制
+        self.adaptive = adaptive  # 是否根据负载自动调整输入尺寸和关键帧间隔
+        self.frame_pool = frame_pool  # 进程内解码时使用的帧缓冲池
+        self.heatmap_store = heatmap_store  # 按摄像头的异常热力图，None表示不统计
+        self.detection_store = detection_store  # 检测记录与报警事件数据库，None表示不记录
+        self.commands = queue.Queue()  # 命令队列（界面线程 -> 工作线程）
+        
+        self.backend = None  # 推理后端（跨视频复用）
+        self.backend_key = None  # 已加载后端对应的 (模型路径, 服务地址)
+        self.ab_backend = None  # A/B对比中的候选模型后端，None表示未开启
+        self.ab = None  # A/B对比统计
+        self.ab_every = 10  # 每隔多少个推理批次抽样对比一次
+        self.ab_batches = 0  # 已推理的批次数（用于抽样）
+        self.ab_seconds = 0.0  # 本批中候选模型的推理耗时，不计入服务质量统计
+        self.run_ids = itertools.count(1)  # 运行ID生成器
+        self.run_id = 0  # 最新的运行ID（界面据此丢弃旧视频或定位前的帧）
+        self.emit_run_id = 0  # 当前打开的视频对应的运行ID，随帧发送
+        self.source_run = (None, 0)  # (帧来源, 运行ID)，作为一个整体读写，归还槽位时不会错配
+        self.video_path = None  # 当前视频路径
+        self.media_info = None  # 当前视频的缓存元数据
+        self.source = None  # 帧来源
+        self.paused = True  # 是否暂停
+        self.heatmap = None  # 当前视频（摄像头）的热力图，读到第一帧后创建
+        self.pending = deque()  # 已推理但尚未发送的帧 (帧, 槽位, 检测结果)
+    
+    # ---- 界面线程调用的命令接口（只入队，不阻塞） ----
+    
+    def new_run_id(self):
+        # 分配新的运行ID，之后界面丢弃旧运行ID的帧
+        self.run_id = next(self.run_ids)
+        return self.run_id
+    
+    def load(self, video_path, media_info=None):
+        # 加载视频（停止当前视频），加载后处于暂停状态
+        self.commands.put(("load", video_path, media_info, self.new_run_id()))
+    
+    def play(self):
+        # 开始或继续处理；视频已结束或已停止时从头开始
+        self.commands.put(("play",))
+    
+    def pause(self):
+        # 暂停处理
+        self.commands.put(("pause",))
+    
+    def seek(self, frame_index):
+        # 定位到指定帧
+        self.commands.put(("seek", frame_index, self.new_run_id()))
+    
+    def stop(self):
+        # 停止当前视频并释放帧来源，线程和模型保留
+        self.new_run_id()  # 界面立即丢弃已排队的帧
+        self.commands.put(("stop",))
+    
+    def swap_backend(self, backend, model_path, profile):
+        # 在帧与帧之间切换到已预热的推理后端（旧后端由工作线程关闭）
+        self.commands.put(("swap", backend, model_path, profile))
+    
+    def set_ab_backend(self, backend, model_path=""):
+        # 开启A/B对比（backend为候选模型的已预热后端），backend为None时关闭
+        self.commands.put(("ab", backend, model_path))
+    
+    def shutdown(self, timeout=5.0):
+        """
+        退出工作线程并释放模型，返回线程是否在超时前结束
+        """
+        self.new_run_id()  # 界面丢弃已排队的帧
+        self.commands.put(("shutdown",))
+        return self.wait(int(timeout * 1000))  # 等待线程结束
+    
+    def release_frame(self, slot, run_id):
+        # 界面线程使用完帧后归还槽位（旧视频的帧来源已关闭，忽略）
+        source, source_run_id = self.source_run  # 当前帧来源及其运行ID
+        if source is None or slot < 0 or run_id != source_run_id:  # 没有帧来源、不是池化帧或已切换视频
+            return
+        try:
+            source.release(slot)  # 归还槽位
+        except (ValueError, OSError):  # 帧来源已关闭
+            pass
+    
+    # ---- 工作线程 ----
     
     def run(self):
-        # 加载YOLOv8模型
-        model = YOLO(self.model_path)  # 初始化YOLOv8模型
-        
-        # 打开视频文件
-        cap = cv2.VideoCapture(self.video_path)  # 打开视频文件
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))  # 获取视频总帧数
-        
-        frame_count = 0  # 初始化帧计数器
-        while self.running and cap.isOpened():  # 当线程运行且视频文件打开时循环处理
-            ret, frame = cap.read()  # 读取一帧
-            if not ret:  # 如果读取失败（视频结束）
-                break  # 跳出循环
-                
-            # 使用YOLOv8进行推理
-            results = model(frame)  # 对当前帧进行目标检测
-            
-            # 获取检测结果（用于在主界面中绘制）
-            detections = []  # 初始化检测结果列表
-            for result in results:  # 遍历检测结果
-                boxes = result.boxes.cpu().numpy()  # 获取边界框数据并转换为numpy数组
-                for box in boxes:  # 遍历每个边界框
-                    x1, y1, x2, y2 = map(int, box.xyxy[0])  # 提取边界框坐标并转换为整数
-                    confidence = float(box.conf[0])  # 提取置信度并转换为浮点数
-                    class_id = int(box.cls[0])  # 提取类别ID并转换为整数
-                    detections.append({  # 将检测结果添加到列表中
-                        'box': (x1, y1, x2, y2),  # 边界框坐标
-                        'confidence': confidence,  # 置信度
-                        'class_id': class_id  # 类别ID
-                    })
-            
-            # 发送处理后的帧和检测结果
-            self.change_pixmap_signal.emit(frame, detections)  # 发送信号，传递当前帧和检测结果
-            
-            # 更新进度
-            frame_count += 1  # 帧计数器加1
-            progress = int(frame_count / total_frames * 100)  # 计算处理进度百分比
-            self.progress_signal.emit(progress)  # 发送进度信号
-            
-            # 控制帧率
-            time.sleep(0.01)  # 短暂休眠，控制处理速度
+        tracing.set_thread_name("VideoThread")  # 追踪文件中的线程名称
+        while True:  # 常驻循环
+            idle = self.source is None or self.paused  # 没有需要处理的帧时阻塞等待命令
+            try:
+                command = self.commands.get(timeout=0.1) if idle else self.commands.get_nowait()  # 获取命令
+            except queue.Empty:  # 没有命令
+                command = None
+            try:
+                if command is not None:  # 处理命令
+                    if command[0] == "shutdown":  # 退出
+                        break
+                    self.handle_command(command)
+                elif not idle:  # 继续处理视频
+                    self.process_batch()
+            except Exception as e:  # 加载模型、打开视频或推理失败，结束当前视频但保留线程
+                self.close_run()
+                self.error_signal.emit(str(e))  # 通知界面
+                self.state_signal.emit("stopped")
         
         # 释放资源
-        cap.release()  # 释放视频捕获对象
-        self.finished_signal.emit()  # 发送处理完成信号
+        self.close_run()  # 结束当前视频
+        while not self.commands.empty():  # 关闭尚未交接的预加载后端
+            command = self.commands.get_nowait()
+            if command[0] in ("swap", "ab") and command[1] is not None:
+                command[1].close()
+        for backend in (self.backend, self.ab_backend):  # 关闭推理后端
+            if backend is not None:
+                backend.close()
+        self.backend = self.ab_backend = None
     
-    def stop(self):
-        self.running = False  # 设置运行标志为False，停止循环
-        self.wait()  # 等待线程结束
+    def handle_command(self, command):
+        # 在工作线程中执行一条命令
+        name = command[0]  # 命令名称
+        if name == "load":  # 加载视频
+            self.close_run()  # 结束上一个视频
+            self.video_path, self.media_info = command[1], command[2]  # 保存视频信息
+            self.ensure_backend()  # 模型只在第一次或模型路径变化时加载
+            self.open_run(0, command[3])  # 打开视频
+            self.paused = True  # 加载后暂停，等待 play
+        elif name == "play":  # 开始或继续
+            if self.source is None and self.video_path is not None:  # 已结束或已停止，从头开始
+                self.open_run(0, self.new_run_id())
+            self.paused = self.source is None  # 有帧来源时开始处理
+            self.state_signal.emit("paused" if self.paused else "playing")
+        elif name == "pause":  # 暂停
+            self.paused = True
+            self.state_signal.emit("paused")
+        elif name == "seek":  # 定位
+            if self.video_path is not None:  # 已加载视频
+                paused = self.paused  # 保持原来的暂停状态
+                self.close_run()  # 结束当前位置的处理（报警事件结束）
+                self.open_run(max(0, int(command[1])), command[2])  # 从目标帧重新打开
+                self.paused = paused
+                if paused:  # 暂停时显示目标帧
+                    self.process_batch(single=True)
+        elif name == "stop":  # 停止
+            self.close_run()
+            self.state_signal.emit("stopped")
+        elif name == "swap":  # 切换模型（下一批推理开始使用新模型）
+            old, self.backend = self.backend, command[1]  # 原子替换
+            self.model_path, self.profile = command[2], command[3]  # 新模型路径和推理配置
+            self.backend_key = (self.model_path, self.server_address)  # 之后加载视频时不再重新加载
+            if self.source is not None and self.backend.dynamic_imgsz:  # 沿用当前质量等级的输入尺寸
+                self.backend.set_imgsz(self.qos.current()['imgsz'])
+            if old is not None:  # 关闭旧后端
+                old.close()
+            if self.ab is not None:  # A侧模型变化，重新统计
+                self.ab = ABComparator(os.path.basename(self.model_path), self.ab.model_b)
+            self.backend_signal.emit(self.backend.describe())  # 发送后端状态
+        elif name == "ab":  # 开启或关闭A/B对比
+            if self.ab_backend is not None:  # 关闭之前的候选模型
+                self.ab_backend.close()
+            self.ab_backend = command[1]  # 候选模型后端
+            self.ab = ABComparator(os.path.basename(self.model_path or ""),
+                                   os.path.basename(command[2])) if command[1] is not None else None  # 对比统计
+    
+    def ensure_backend(self):
+        # 加载推理后端（模型路径或服务地址变化时重新加载）
+        key = (self.model_path, self.server_address)  # 后端键
+        if self.backend is not None and self.backend_key == key:  # 已加载
+            return
+        if self.backend is not None:  # 关闭旧后端
+            self.backend.close()
+            self.backend = None
+        with tracing.span("load_model"):  # 追踪：加载模型
+            self.backend = create_backend(self.model_path, self.profile, self.server_address)  # 创建推理后端
+        self.backend_key = key  # 记录后端键
+        self.backend_signal.emit(self.backend.describe())  # 发送后端状态
+    
+    def open_run(self, start_frame, run_id):
+        # 从指定帧打开当前视频，初始化报警、服务质量和热力图状态
+        self.batch_size = max(1, int(self.profile.get("batch") or 1))  # 批大小
+        
+        # 打开视频文件（独立进程解码到共享内存，槽位数需覆盖一批帧和界面尚未处理完的帧）
+        with tracing.span("open_source"):  # 追踪：打开帧来源
+            self.source = open_frame_source(self.video_path, self.shared_decoder, max(16, self.batch_size * 4),
+                                            start_frame, metadata=self.media_info, pool=self.frame_pool)  # 打开帧来源
+        self.source_run = (self.source, run_id)  # 记录帧来源对应的运行ID
+        self.emit_run_id = run_id  # 之后发送的帧带上该运行ID
+        self.total_frames = max(1, self.source.total_frames)  # 获取视频总帧数
+        self.frame_count = start_frame  # 当前帧号
+        
+        # 创建报警引擎，事件通过信号发送到主线程
+        self.alert_engine = AlertEngine(callback=self.alert_signal.emit, fps=self.source.fps)  # 创建报警引擎
+        self.snapshot_tag = os.path.splitext(os.path.basename(self.video_path))[0]  # 快照文件名前缀（同时作为摄像头ID）
+        
+        # 创建服务质量控制器：处理速度跟不上目标帧率时先降低输入尺寸，再改为每隔几帧推理一次
+        imgsz = int(self.profile.get("imgsz") or 640)  # 调优配置中的输入尺寸（最高质量）
+        levels = build_levels(imgsz, self.backend.dynamic_imgsz) if self.adaptive else build_levels(imgsz)[:1]  # 质量等级
+        self.qos = QosController(levels, self.target_fps or self.source.fps, self.latency_budget_ms)  # 创建控制器
+        if self.backend.dynamic_imgsz:  # 恢复最高质量的输入尺寸
+            self.backend.set_imgsz(imgsz)
+        self.last_detections = []  # 最近一次推理的检测结果，非关键帧复用
+        self.batch_start = None  # 当前批开始时间
+        self.infer_ms = None  # 当前批单帧推理延迟
+        self.progress_signal.emit(int(start_frame / self.total_frames * 100))  # 发送进度信号
+    
+    def close_run(self):
+        # 结束当前视频：结束进行中的报警事件，保存热力图，归还未发送的帧并关闭帧来源
+        if self.source is None:  # 没有打开的视频
+            return
+        self.source_run = (None, 0)  # 之后界面归还的旧槽位一律忽略
+        for event in self.alert_engine.flush(self.frame_count):  # 发出 end 事件
+            if self.snapshot_writer is not None:  # 清除快照限速记录
+                self.snapshot_writer.end_incident(event['event_id'])
+            if self.detection_store is not None:  # 记录已结束的事件
+                self.detection_store.add_event(self.snapshot_tag, event)
+        if self.heatmap_store is not None:  # 保存热力图快照
+            self.heatmap_store.save(self.snapshot_tag)
+        while self.pending:  # 归还未发送的帧
+            _, slot, _ = self.pending.popleft()
+            self.source.release(slot)
+        self.source.close()  # 停止解码并释放帧来源
+        self.source = None
+        self.heatmap = None
+    
+    def process_batch(self, single=False):
+        # 处理一批帧；每发送一帧检查一次命令队列，有新命令时立即返回（未发送的帧保留到下次）
+        if not self.pending:  # 需要读取并推理新的一批
+            if not self.infer_batch(1 if single else self.batch_size):  # 视频结束
+                self.close_run()
+                self.progress_signal.emit(100)  # 发送进度信号
+                self.state_signal.emit("finished")
+                self.finished_signal.emit()  # 发送处理完成信号
+                return
+        
+        while self.pending:  # 逐帧处理结果
+            frame, slot, detections = self.pending.popleft()  # 取出一帧
+            self.process_frame(frame, slot, detections)
+            if single:  # 只显示一帧
+                break
+            if not self.commands.empty():  # 有新命令，下一帧之前处理
+                self.batch_start = None  # 本批耗时不再计入服务质量统计
+                return
+        
+        # 控制帧率
+        time.sleep(0.01)  # 短暂休眠，控制处理速度
+        
+        # 根据本批耗时调整质量等级
+        if self.batch_start is not None and self.qos.record(
+                self.batch_frames, time.perf_counter() - self.batch_start - self.ab_seconds, self.infer_ms):  # 等级发生变化（不计候选模型耗时）
+            if self.backend.dynamic_imgsz:  # 后端支持改变输入尺寸
+                self.backend.set_imgsz(self.qos.current()['imgsz'])  # 下一批生效
+            self.qos_signal.emit(self.qos.metrics())  # 立即通知界面
+        
+        if self.frame_count % 30 < self.batch_frames:  # 大约每30帧报告一次后端状态
+            self.backend_signal.emit(self.backend.describe())  # 发送后端状态
+            self.qos_signal.emit(self.qos.metrics())  # 发送质量等级和实测帧率
+    
+    def infer_batch(self, batch_size):
+        # 读取一批帧并推理，结果放入待发送队列；没有读到帧时返回False
+        self.batch_start = time.perf_counter()  # 本批开始时间（含解码等待）
+        self.ab_seconds = 0.0  # 本批候选模型耗时
+        frames = []  # 本批帧
+        slots = []  # 本批帧所在的共享内存槽位
+        with tracing.span("decode"):  # 追踪：读取一批帧（含等待解码）
+            while len(frames) < batch_size:  # 读取一批帧
+                ret, frame, slot = self.source.read()  # 读取一帧（共享内存视图，零拷贝）
+                if not ret:  # 如果读取失败（视频结束）
+                    break  # 跳出循环
+                frames.append(frame)  # 加入本批
+                slots.append(slot)  # 记录槽位
+        if not frames:  # 没有读到任何帧
+            return False
+        
+        # 使用YOLOv8进行推理（只对关键帧推理，其余帧复用上一次的检测结果）
+        stride = self.qos.current()['stride']  # 当前关键帧间隔
+        key_frames = [i for i in range(len(frames)) if (self.frame_count + i) % stride == 0]  # 本批中的关键帧
+        key_detections = {}  # 帧序号 -> 检测结果
+        self.infer_ms = None  # 本批单帧推理延迟
+        if key_frames:  # 本批有关键帧
+            t0 = time.perf_counter()  # 推理开始时间
+            with tracing.span("inference"):  # 追踪：推理
+                key_detections = dict(zip(key_frames, self.backend.predict([frames[i] for i in key_frames])))  # 关键帧检测结果
+            self.infer_ms = (time.perf_counter() - t0) * 1000 / len(key_frames)  # 单帧推理延迟
+            if self.ab_backend is not None:  # A/B对比：抽样批次用候选模型推理同样的关键帧
+                self.ab_batches += 1  # 批次计数
+                if self.ab_batches % self.ab_every == 0:  # 抽样
+                    self.compare_ab([frames[i] for i in key_frames], [key_detections[i] for i in key_frames])
+            if self.detection_store is not None:  # 记录关键帧检测结果（非关键帧复用的结果不重复记录）
+                now = time.time()  # 墙钟时间戳
+                for i, detections in key_detections.items():  # 遍历关键帧
+                    frame_index = self.frame_count + i  # 全局帧号
+                    self.detection_store.add_detections(self.snapshot_tag, detections, frame_index,
+                                                        frame_index / self.source.fps, now)  # 只入队，不阻塞推理
+        for i, (frame, slot) in enumerate(zip(frames, slots)):  # 逐帧确定检测结果
+            self.last_detections = key_detections.get(i, self.last_detections)  # 非关键帧复用上一次结果
+            self.pending.append((frame, slot, self.last_detections))  # 放入待发送队列
+        self.batch_frames = len(frames)  # 本批帧数
+        return True
+    
+    def compare_ab(self, frames, detections_a):
+        # 用候选模型推理抽样帧，与当前模型的结果对比并发送统计
+        t0 = time.perf_counter()  # 开始时间
+        with tracing.span("ab_inference"):  # 追踪：候选模型推理
+            detections_b = self.ab_backend.predict(frames)  # 候选模型检测结果
+        self.ab_seconds = time.perf_counter() - t0  # 候选模型耗时
+        self.ab.record(detections_a, detections_b, self.infer_ms * len(frames), self.ab_seconds * 1000)  # 累计统计
+        self.ab_signal.emit(self.ab.metrics())  # 发送统计
+    
+    def process_frame(self, frame, slot, detections):
+        # 处理并发送一帧：热力图、报警、快照，最后把帧交给界面线程
+        # 累加异常热力图（以视频文件名作为摄像头ID，首次使用时恢复上次保存的快照）
+        if self.heatmap_store is not None:  # 启用了热力图
+            if self.heatmap is None:  # 第一帧
+                self.heatmap = self.heatmap_store.get(self.snapshot_tag, frame.shape)  # 获取热力图
+            with tracing.span("heatmap"):  # 追踪：热力图累加
+                self.heatmap.advance(detections, 1.0 / self.source.fps)  # 前进一帧的视频时间并累加本帧异常框
+        
+        # 更新报警引擎状态
+        with tracing.span("alert"):  # 追踪：报警引擎
+            events = self.alert_engine.update(self.frame_count, detections)  # 处理本帧检测结果，必要时发出报警事件
+        
+        # 为进行中的异常事件保存快照（只入队，不阻塞推理）
+        if self.snapshot_writer is not None:  # 启用了快照
+            with tracing.span("snapshot"):  # 追踪：提交快照
+                for event_id, box in self.alert_engine.active_incidents():  # 遍历进行中的事件
+                    self.snapshot_writer.submit(frame, [box], event_id, self.frame_count, self.snapshot_tag)  # 提交快照
+                for event in events:  # 事件结束后清除限速记录
+                    if event['event_type'] == 'end':
+                        self.snapshot_writer.end_incident(event['event_id'])
+        
+        # 记录已结束的报警事件
+        if self.detection_store is not None:  # 启用了检测记录
+            for event in events:  # 遍历本帧事件
+                if event['event_type'] == 'end':
+                    self.detection_store.add_event(self.snapshot_tag, event)
+        
+        # 发送帧和检测结果，槽位由界面线程使用完毕后归还（之后本线程不再访问该帧）
+        with tracing.span("emit"):  # 追踪：发送信号
+            self.change_pixmap_signal.emit(frame, detections, slot, self.emit_run_id)  # 发送信号，传递当前帧、检测结果、槽位号和运行ID
+        
+        # 更新进度
+        self.frame_count += 1  # 帧计数器加1
+        self.progress_signal.emit(min(100, int(self.frame_count / self.total_frames * 100)))  # 发送进度信号
 
 class AnomalyDetectionApp(QMainWindow):
     def __init__(self, username):
         super().__init__()  # 调用父类初始化方法
         
         self.username = username  # 存储当前用户名
-        self.video_thread = None  # 初始化视频处理线程为None
-        self.model_path = "best.pt"  # 默认模型路径
-        self.current_image = None  # 初始化当前图像为None
+        self.video_thread = None  # 常驻的视频检测工作线程（第一次检测视频时创建，之后复用）
+        self.folder_thread = None  # 初始化文件夹检测线程为None
+        self.close_pending = False  # 关闭窗口时视频线程未及时退出，等待其结束后自动关闭
+        self.model_path = "best.pt"  # 默认模型路径（可在控制面板中切换，无需重启）
+        self.inference_profile = load_profile()  # 读取本机的推理调优配置
+        apply_thread_settings(self.inference_profile)  # 在推理开始前设置torch线程数
+        self.tuned_model_path = self.model_path  # 调优配置（导出的模型）对应的原始模型
+        self.model_profile = self.inference_profile  # 当前模型使用的推理配置
+        self.model_loader = None  # 正在后台加载的模型（切换或A/B对比）
+        self.model_loader_purpose = None  # 加载目的："swap" 或 "ab"
+        self.snapshot_writer = SnapshotWriter("snapshots")  # 异常快照写入器（后台线程编码保存，超出配额淘汰最旧快照）
+        self.qos_target_fps = None  # 视频处理目标帧率，None时使用视频自身帧率
+        self.qos_latency_budget_ms = None  # 单帧推理延迟预算（毫秒），None表示不限制
+        self.adaptive_quality = True  # 处理跟不上时自动降低输入尺寸或跳帧推理
+        self.inference_server = None  # 本地推理服务地址，如 "127.0.0.1:8765"；None时读取环境变量 ANOMALY_INFERENCE_SERVER
+        self.current_image_path = None  # 当前图像文件路径（原分辨率只在检测线程中解码）
+        self.current_pyramid = None  # 当前图像的预览金字塔
+        self.pyramid_cache = PyramidCache(capacity=8)  # 最近8张图像的预览金字塔
+        self.image_detector = ImageDetector(self.model_path, self.model_profile, self.inference_server,
+                                            parent=self)  # 图像检测器（后台推理，按图像内容+模型+参数缓存最近64个结果）
+        self.image_detector.result_signal.connect(self.on_image_result)  # 连接信号到图像检测结果方法
+        self.image_detector.progress_signal.connect(self.on_image_progress)  # 连接信号到图像检测进度方法
+        self.image_detector.error_signal.connect(self.on_image_error)  # 连接信号到图像检测错误方法
         self.current_video_path = None  # 初始化当前视频路径为None
-        self.current_detections = []  # 初始化当前检测结果列表
+        self.current_video_info = None  # 初始化当前视频元数据为None
+        self.media_cache = MediaCache("media_cache.db")  # 媒体元数据与预览图缓存
+        self.prefetch_thread = None  # 初始化目录预取线程为None
+        self.last_video_dir = ""  # 上一次选择视频的目录
+        self.current_folder = None  # 初始化当前图像文件夹为None
+        self.folder_stats = {'total': 0, 'anomaly': 0}  # 文件夹检测统计
+        self.current_detections = []  # 初始化当前检测结果列表（原图坐标，图像模式下窗口大小变化时重新绘制）
+        self.frame_pool = FramePool()  # 帧缓冲池（进程内解码缓冲区和显示缓冲区）
+        self.pool_stats = self.frame_pool.stats()  # 上一次刷新状态栏时的缓冲池统计
+        self.heatmap_store = HeatmapStore("heatmaps")  # 按摄像头的异常热力图（半衰期1小时，快照保存在 heatmaps/）
+        self.detection_store = DetectionStore("detections.db")  # 检测记录与报警事件数据库（后台线程批量写入）
+        self.recent_alerts = []  # 最近的报警事件文本
         self.mode = "image"  # 默认为图像模式
+        tracing.set_thread_name("GUI")  # 追踪文件中的界面线程名称
         
         self.init_ui()  # 初始化用户界面
     
@@ -169,6 +555,9 @@ class AnomalyDetectionApp(QMainWindow):
         # 添加到主布局
         main_layout.addWidget(splitter)  # 将分割器添加到主布局
         
+        # 创建记录查询面板（停靠在底部，默认隐藏）
+        self.create_query_panel()  # 调用创建记录查询面板方法
+        
         # 创建状态栏
         self.create_status_bar()  # 调用创建状态栏方法
         
@@ -190,6 +579,18 @@ class AnomalyDetectionApp(QMainWindow):
         toolbar.addAction(about_action)  # 将关于操作添加到工具栏
         about_action.triggered.connect(self.show_about)  # 连接触发信号到显示关于方法
         
+        # 性能追踪开关
+        self.trace_action = QAction(QIcon(""), "性能追踪", self)  # 创建性能追踪操作
+        self.trace_action.setCheckable(True)  # 可勾选
+        self.trace_action.setChecked(tracing.is_enabled())  # 环境变量 ANOMALY_TRACE 已开启时默认勾选
+        toolbar.addAction(self.trace_action)  # 将性能追踪操作添加到工具栏
+        self.trace_action.toggled.connect(self.on_trace_toggled)  # 连接切换信号到追踪开关方法
+        
+        # 记录查询面板开关（面板在 init_ui 中随后创建）
+        self.query_action = QAction(QIcon(""), "记录查询", self)  # 创建记录查询操作
+        self.query_action.setCheckable(True)  # 可勾选
+        toolbar.addAction(self.query_action)  # 将记录查询操作添加到工具栏
+        
         # 添加分隔符
         toolbar.addSeparator()  # 添加分隔符
         
@@ -222,11 +623,13 @@ class AnomalyDetectionApp(QMainWindow):
         
         self.image_radio = QRadioButton("图像检测")  # 创建图像检测单选按钮
         self.video_radio = QRadioButton("视频检测")  # 创建视频检测单选按钮
+        self.folder_radio = QRadioButton("文件夹检测")  # 创建文件夹批量检测单选按钮
         
         # 按钮分组
         mode_group = QButtonGroup(self)  # 创建按钮组
         mode_group.addButton(self.image_radio)  # 添加图像单选按钮到组
         mode_group.addButton(self.video_radio)  # 添加视频单选按钮到组
+        mode_group.addButton(self.folder_radio)  # 添加文件夹单选按钮到组
         
         # 默认选择图像模式
         self.image_radio.setChecked(True)  # 设置图像单选按钮为选中状态
@@ -234,9 +637,35 @@ class AnomalyDetectionApp(QMainWindow):
         # 连接槽函数
         self.image_radio.toggled.connect(self.on_mode_changed)  # 连接切换信号到模式改变方法
         self.video_radio.toggled.connect(self.on_mode_changed)  # 连接切换信号到模式改变方法
+        self.folder_radio.toggled.connect(self.on_mode_changed)  # 连接切换信号到模式改变方法
         
         mode_layout.addWidget(self.image_radio)  # 添加图像单选按钮到布局
         mode_layout.addWidget(self.video_radio)  # 添加视频单选按钮到布局
+        mode_layout.addWidget(self.folder_radio)  # 添加文件夹单选按钮到布局
+        
+        # 模型选择（后台加载预热后在帧与帧之间切换）
+        model_group_label = QLabel("检测模型:")  # 创建模型组标签
+        model_group_label.setFont(QFont("Arial", 10, QFont.Bold))  # 设置字体
+        model_layout = QHBoxLayout()  # 创建水平布局
+        self.model_combo = QComboBox()  # 创建模型下拉框
+        for path in [self.model_path] + [m for m in find_models() if m != self.model_path]:  # 当前模型和训练输出目录中的模型
+            self.model_combo.addItem(os.path.basename(path) if path == self.model_path else path, path)
+        self.model_combo.setToolTip("当前模型和 runs/、experiments/ 中训练得到的权重")  # 设置提示
+        browse_model_button = QPushButton("浏览")  # 创建浏览按钮
+        browse_model_button.clicked.connect(self.browse_model)  # 连接点击信号到浏览模型方法
+        model_layout.addWidget(self.model_combo, 1)  # 添加模型下拉框
+        model_layout.addWidget(browse_model_button)  # 添加浏览按钮
+        model_button_layout = QHBoxLayout()  # 创建水平布局
+        self.swap_model_button = QPushButton("切换模型")  # 创建切换模型按钮
+        self.swap_model_button.clicked.connect(self.swap_model)  # 连接点击信号到切换模型方法
+        self.ab_button = QPushButton("A/B 对比")  # 创建A/B对比按钮
+        self.ab_button.setCheckable(True)  # 可勾选
+        self.ab_button.toggled.connect(self.on_ab_toggled)  # 连接切换信号到A/B对比方法
+        model_button_layout.addWidget(self.swap_model_button)  # 添加切换模型按钮
+        model_button_layout.addWidget(self.ab_button)  # 添加A/B对比按钮
+        self.model_status_label = QLabel(f"当前模型: {self.model_path}")  # 模型状态和A/B对比结果
+        self.model_status_label.setWordWrap(True)  # 启用自动换行
+        self.model_status_label.setStyleSheet("background-color: #f0f0f0; padding: 5px; border-radius: 3px;")  # 设置样式
         
         # 文件选择
         file_group_label = QLabel("文件选择:")  # 创建文件组标签
@@ -311,6 +740,26 @@ class AnomalyDetectionApp(QMainWindow):
             }
         """)  # 设置按钮样式
         
+        self.pause_button = QPushButton("暂停")  # 创建暂停/继续按钮
+        self.pause_button.clicked.connect(self.toggle_pause)  # 连接点击信号到暂停/继续方法
+        self.pause_button.setEnabled(False)  # 设置按钮初始为禁用状态
+        self.pause_button.setStyleSheet("""
+            QPushButton {
+                background-color: #ff9800;
+                color: white;
+                border: none;
+                border-radius: 4px;
+                padding: 8px;
+            }
+            QPushButton:hover {
+                background-color: #fb8c00;
+            }
+            QPushButton:disabled {
+                background-color: #cccccc;
+                color: #666666;
+            }
+        """)  # 设置按钮样式
+        
         # 进度条
         progress_label = QLabel("检测进度:")  # 创建进度标签
         progress_label.setFont(QFont("Arial", 10, QFont.Bold))  # 设置字体
@@ -332,6 +781,13 @@ class AnomalyDetectionApp(QMainWindow):
             }
         """)  # 设置进度条样式
         
+        # 视频定位滑块
+        self.seek_slider = QSlider(Qt.Horizontal)  # 创建定位滑块
+        self.seek_slider.setRange(0, 1000)  # 千分比
+        self.seek_slider.setEnabled(False)  # 加载视频后启用
+        self.seek_slider.setToolTip("拖动定位视频")  # 设置提示
+        self.seek_slider.sliderReleased.connect(self.on_seek)  # 松开滑块时定位
+        
         # 结果显示区域
         results_label = QLabel("检测结果:")  # 创建结果标签
         results_label.setFont(QFont("Arial", 10, QFont.Bold))  # 设置字体
@@ -346,20 +802,48 @@ class AnomalyDetectionApp(QMainWindow):
         """)  # 设置样式
         self.results_display.setWordWrap(True)  # 启用自动换行
         
+        # 报警事件显示区域
+        alerts_label = QLabel("报警事件:")  # 创建报警事件标签
+        alerts_label.setFont(QFont("Arial", 10, QFont.Bold))  # 设置字体
+        
+        self.alerts_display = QLabel("无报警事件")  # 创建报警事件显示标签
+        self.alerts_display.setAlignment(Qt.AlignTop | Qt.AlignLeft)  # 左上对齐
+        self.alerts_display.setStyleSheet("""
+            background-color: #fdecea;
+            color: #b71c1c;
+            padding: 8px;
+            border-radius: 3px;
+            min-height: 80px;
+        """)  # 设置样式
+        self.alerts_display.setWordWrap(True)  # 启用自动换行
+        
+        # 异常热力图叠加开关
+        self.heatmap_checkbox = QCheckBox("叠加异常热力图")  # 创建热力图复选框
+        self.heatmap_checkbox.setToolTip("在视频画面上叠加当前摄像头的异常分布热力图")  # 设置提示
+        
         # 添加所有组件到控制面板布局
         control_layout.addWidget(title_label)  # 添加标题
         control_layout.addWidget(line)  # 添加分割线
         control_layout.addWidget(mode_group_label)  # 添加模式组标签
         control_layout.addLayout(mode_layout)  # 添加模式选择布局
+        control_layout.addWidget(model_group_label)  # 添加模型组标签
+        control_layout.addLayout(model_layout)  # 添加模型选择布局
+        control_layout.addLayout(model_button_layout)  # 添加模型操作按钮
+        control_layout.addWidget(self.model_status_label)  # 添加模型状态标签
         control_layout.addWidget(file_group_label)  # 添加文件组标签
         control_layout.addWidget(self.file_path_label)  # 添加文件路径标签
         control_layout.addWidget(self.select_file_button)  # 添加选择文件按钮
         control_layout.addWidget(self.start_button)  # 添加开始按钮
         control_layout.addWidget(self.stop_button)  # 添加停止按钮
+        control_layout.addWidget(self.pause_button)  # 添加暂停/继续按钮
         control_layout.addWidget(progress_label)  # 添加进度标签
         control_layout.addWidget(self.progress_bar)  # 添加进度条
+        control_layout.addWidget(self.seek_slider)  # 添加定位滑块
         control_layout.addWidget(results_label)  # 添加结果标签
         control_layout.addWidget(self.results_display)  # 添加结果显示区域
+        control_layout.addWidget(alerts_label)  # 添加报警事件标签
+        control_layout.addWidget(self.alerts_display)  # 添加报警事件显示区域
+        control_layout.addWidget(self.heatmap_checkbox)  # 添加热力图复选框
         control_layout.addStretch()  # 添加弹性空间
         
         return control_panel  # 返回控制面板
@@ -391,14 +875,139 @@ class AnomalyDetectionApp(QMainWindow):
         placeholder.fill(QColor(44, 62, 80))  # 填充背景色
         self.image_label.setPixmap(placeholder)  # 设置为图像标签的图像
         
+        # 文件夹检测结果网格
+        gallery_panel = QWidget()  # 创建网格面板
+        gallery_layout = QVBoxLayout(gallery_panel)  # 创建垂直布局
+        gallery_layout.setContentsMargins(0, 0, 0, 0)  # 设置布局边距
+        
+        gallery_toolbar = QHBoxLayout()  # 网格工具条
+        self.anomaly_only_checkbox = QCheckBox("仅显示异常")  # 创建筛选复选框
+        self.anomaly_only_checkbox.toggled.connect(self.on_gallery_filter_changed)  # 连接切换信号到筛选方法
+        self.gallery_sort_combo = QComboBox()  # 创建排序下拉框
+        self.gallery_sort_combo.addItems(["按文件名排序", "按异常置信度排序"])  # 排序方式
+        self.gallery_sort_combo.currentIndexChanged.connect(self.on_gallery_sort_changed)  # 连接切换信号到排序方法
+        gallery_toolbar.addWidget(self.anomaly_only_checkbox)  # 添加筛选复选框
+        gallery_toolbar.addStretch()  # 添加弹性空间
+        gallery_toolbar.addWidget(self.gallery_sort_combo)  # 添加排序下拉框
+        
+        self.gallery_model = GalleryModel(self)  # 创建结果模型
+        self.gallery_proxy = GalleryFilterModel(self)  # 创建筛选排序代理
+        self.gallery_proxy.setSourceModel(self.gallery_model)  # 设置源模型
+        self.gallery_proxy.setSortRole(PathRole)  # 默认按路径排序
+        self.gallery_proxy.sort(0, Qt.AscendingOrder)  # 启用排序
+        self.gallery_view = GalleryView()  # 创建虚拟化缩略图网格
+        self.gallery_view.setModel(self.gallery_proxy)  # 设置模型
+        self.gallery_view.clicked.connect(self.on_gallery_item_clicked)  # 连接点击信号到显示详情方法
+        self.gallery_view.setMinimumHeight(500)  # 设置最小高度
+        
+        gallery_layout.addLayout(gallery_toolbar)  # 添加工具条
+        gallery_layout.addWidget(self.gallery_view)  # 添加网格
+        
+        # 单图/视频显示与文件夹网格之间切换
+        self.display_stack = QStackedWidget()  # 创建堆叠部件
+        self.display_stack.addWidget(self.image_label)  # 页0：图像/视频显示
+        self.display_stack.addWidget(gallery_panel)  # 页1：文件夹结果网格
+        
         # 添加到布局
         display_layout.addWidget(title_label)  # 添加标题
         display_layout.addWidget(line)  # 添加分割线
-        display_layout.addWidget(self.image_label)  # 添加图像标签
+        display_layout.addWidget(self.display_stack)  # 添加显示区域
         display_layout.addStretch()  # 添加弹性空间
         
         return display_panel  # 返回显示面板
     
+    def create_query_panel(self):
+        # 创建检测记录/报警事件查询面板
+        panel = QWidget()  # 创建面板部件
+        layout = QVBoxLayout(panel)  # 创建垂直布局
+        
+        # 查询条件
+        filter_layout = QHBoxLayout()  # 创建水平布局
+        self.query_type_combo = QComboBox()  # 查询对象
+        self.query_type_combo.addItems(["检测记录", "报警事件"])  # 添加选项
+        now = QDateTime.currentDateTime()  # 当前时间
+        self.query_start_edit = QDateTimeEdit(now.addSecs(-3600))  # 开始时间，默认一小时前
+        self.query_end_edit = QDateTimeEdit(now)  # 结束时间，默认现在
+        for edit in (self.query_start_edit, self.query_end_edit):  # 设置时间格式
+            edit.setDisplayFormat("yyyy-MM-dd hh:mm")
+            edit.setCalendarPopup(True)
+        self.query_camera_edit = QLineEdit()  # 摄像头ID（视频文件名），逗号分隔，留空表示全部
+        self.query_camera_edit.setPlaceholderText("摄像头，逗号分隔，留空为全部")  # 设置提示
+        self.query_class_combo = QComboBox()  # 类别
+        self.query_class_combo.addItem("全部类别", None)  # 不限类别
+        for class_id, name in CLASS_NAMES.items():  # 添加类别选项
+            self.query_class_combo.addItem(name, class_id)
+        self.query_class_combo.setCurrentIndex(1)  # 默认查询异常
+        self.query_conf_spin = QDoubleSpinBox()  # 最低置信度
+        self.query_conf_spin.setRange(0.0, 1.0)  # 范围
+        self.query_conf_spin.setSingleStep(0.05)  # 步长
+        self.query_conf_spin.setValue(0.7)  # 默认0.7
+        query_button = QPushButton("查询")  # 创建查询按钮
+        query_button.clicked.connect(self.run_query)  # 连接点击信号到查询方法
+        for widget in (self.query_type_combo, QLabel("从"), self.query_start_edit, QLabel("到"),
+                       self.query_end_edit, self.query_camera_edit, self.query_class_combo,
+                       QLabel("置信度 ≥"), self.query_conf_spin, query_button):  # 添加到布局
+            filter_layout.addWidget(widget)
+        layout.addLayout(filter_layout)  # 添加查询条件
+        
+        # 查询结果
+        self.query_table = QTableWidget(0, 0)  # 创建结果表格
+        self.query_table.setEditTriggers(QTableWidget.NoEditTriggers)  # 只读
+        self.query_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)  # 列宽自适应
+        layout.addWidget(self.query_table)  # 添加结果表格
+        self.query_status_label = QLabel("")  # 结果数量和查询耗时
+        layout.addWidget(self.query_status_label)  # 添加状态标签
+        
+        # 停靠在主窗口底部
+        dock = QDockWidget("记录查询", self)  # 创建停靠窗口
+        dock.setWidget(panel)  # 设置内容
+        self.addDockWidget(Qt.BottomDockWidgetArea, dock)  # 停靠在底部
+        dock.hide()  # 默认隐藏
+        self.query_action.toggled.connect(dock.setVisible)  # 工具栏按钮控制显示
+        dock.visibilityChanged.connect(self.query_action.setChecked)  # 关闭面板时同步按钮状态
+    
+    def run_query(self):
+        # 按查询条件查询检测记录或报警事件（索引查询，最多显示1000条）
+        cameras = [c.strip() for c in self.query_camera_edit.text().split(",") if c.strip()]  # 摄像头列表
+        conditions = {
+            'start': self.query_start_edit.dateTime().toSecsSinceEpoch(),  # 开始时间戳
+            'end': self.query_end_edit.dateTime().toSecsSinceEpoch(),  # 结束时间戳
+            'cameras': cameras or None,  # 摄像头
+            'class_id': self.query_class_combo.currentData(),  # 类别
+            'min_confidence': self.query_conf_spin.value() or None,  # 最低置信度
+            'limit': 1000  # 最多返回的条数
+        }
+        t0 = time.perf_counter()  # 查询开始时间
+        try:
+            if self.query_type_combo.currentIndex() == 0:  # 检测记录
+                headers = ["时间", "摄像头", "帧号", "类别", "置信度", "边界框"]  # 表头
+                rows = [(datetime.fromtimestamp(r['ts']).strftime("%Y-%m-%d %H:%M:%S"), r['camera'], r['frame'],
+                         CLASS_NAMES.get(r['class_id'], f"类别{r['class_id']}"), f"{r['confidence']:.2f}",
+                         str(r['box'])) for r in self.detection_store.query_detections(**conditions)]  # 表格行
+            else:  # 报警事件
+                headers = ["开始时间", "结束时间", "摄像头", "事件", "类别", "峰值置信度", "平均置信度"]  # 表头
+                rows = [(datetime.fromtimestamp(r['start_ts']).strftime("%Y-%m-%d %H:%M:%S"),
+                         datetime.fromtimestamp(r['end_ts']).strftime("%H:%M:%S"), r['camera'], r['event_id'],
+                         CLASS_NAMES.get(r['class_id'], f"类别{r['class_id']}"), f"{r['peak_confidence']:.2f}",
+                         f"{r['mean_confidence']:.2f}") for r in self.detection_store.query_events(**conditions)]  # 表格行
+        except sqlite3.Error as e:  # 数据库错误
+            QMessageBox.critical(self, "错误", f"查询失败: {str(e)}")  # 显示错误消息
+            return
+        elapsed_ms = (time.perf_counter() - t0) * 1000  # 查询耗时
+        
+        # 填充表格
+        self.query_table.clear()  # 清空表格
+        self.query_table.setColumnCount(len(headers))  # 列数
+        self.query_table.setHorizontalHeaderLabels(headers)  # 表头
+        self.query_table.setRowCount(len(rows))  # 行数
+        for r, row in enumerate(rows):  # 逐行填充
+            for c, value in enumerate(row):
+                self.query_table.setItem(r, c, QTableWidgetItem(str(value)))
+        stats = self.detection_store.store_stats()  # 写入统计
+        self.query_status_label.setText(
+            f"共 {len(rows)} 条{'（只显示前1000条）' if len(rows) >= 1000 else ''}，耗时 {elapsed_ms:.1f} ms；"
+            f"本次运行已写入检测 {stats['detections']} 条、事件 {stats['events']} 条，丢弃 {stats['dropped']} 批")  # 更新状态
+    
     def create_status_bar(self):
         # 创建状态栏
         status_bar = QStatusBar()  # 创建状态栏
@@ -411,6 +1020,26 @@ class AnomalyDetectionApp(QMainWindow):
         # 添加永久的分隔符
         status_bar.addPermanentWidget(QLabel("|"))  # 添加垂直分隔符
         
+        # 快照统计标签
+        self.snapshot_label = QLabel()  # 创建快照统计标签
+        status_bar.addPermanentWidget(self.snapshot_label)  # 添加快照统计标签到状态栏右侧
+        status_bar.addPermanentWidget(QLabel("|"))  # 添加垂直分隔符
+        
+        # 推理后端状态标签
+        self.backend_label = QLabel("本地模型")  # 创建后端状态标签
+        status_bar.addPermanentWidget(self.backend_label)  # 添加后端状态标签到状态栏右侧
+        status_bar.addPermanentWidget(QLabel("|"))  # 添加垂直分隔符
+        
+        # 服务质量标签
+        self.qos_label = QLabel("画质: -")  # 创建服务质量标签
+        status_bar.addPermanentWidget(self.qos_label)  # 添加服务质量标签到状态栏右侧
+        status_bar.addPermanentWidget(QLabel("|"))  # 添加垂直分隔符
+        
+        # 帧缓冲分配标签
+        self.pool_label = QLabel("帧缓冲分配: -")  # 创建帧缓冲分配标签
+        status_bar.addPermanentWidget(self.pool_label)  # 添加帧缓冲分配标签到状态栏右侧
+        status_bar.addPermanentWidget(QLabel("|"))  # 添加垂直分隔符
+        
         # 添加时间标签
         self.time_label = QLabel()  # 创建时间标签
         status_bar.addPermanentWidget(self.time_label)  # 添加时间标签到状态栏右侧
@@ -471,18 +1100,46 @@ class AnomalyDetectionApp(QMainWindow):
         current_time = QDateTime.currentDateTime()  # 获取当前日期时间
         formatted_time = current_time.toString("yyyy-MM-dd hh:mm:ss")  # 格式化日期时间
         self.time_label.setText(formatted_time)  # 更新时间标签文本
+        
+        # 更新快照统计
+        stats = self.snapshot_writer.snapshot_stats()  # 获取快照统计
+        self.snapshot_label.setText(f"快照: 已保存 {stats['written']}, 丢弃 {stats['dropped']}, "
+                                    f"淘汰 {stats['evicted']}")  # 更新快照统计标签
+        
+        # 更新最近一秒的每帧分配数
+        pool_stats = self.frame_pool.stats()  # 获取缓冲池统计
+        frames = pool_stats['frames'] - self.pool_stats['frames']  # 最近一秒显示的帧数
+        if frames > 0:  # 有新帧
+            allocations = pool_stats['allocations'] - self.pool_stats['allocations']  # 最近一秒的分配次数
+            self.pool_label.setText(f"帧缓冲分配: {allocations / frames:.2f}/帧 (池 {pool_stats['pooled']})")
+        self.pool_stats = pool_stats  # 保存本次统计
     
     def on_mode_changed(self):
         # 模式切换处理
         if self.image_radio.isChecked():  # 如果图像单选按钮被选中
             self.mode = "image"  # 设置模式为图像
-        else:  # 否则
+        elif self.video_radio.isChecked():  # 如果视频单选按钮被选中
             self.mode = "video"  # 设置模式为视频
+        else:  # 否则
+            self.mode = "folder"  # 设置模式为文件夹
+        self.display_stack.setCurrentIndex(1 if self.mode == "folder" else 0)  # 切换显示区域
+        
+        # 取消正在检测的图像，停止正在检测的视频（工作线程保留）
+        self.image_detector.cancel()  # 取消图像检测
+        if self.video_thread is not None:  # 已创建视频工作线程
+            self.video_thread.stop()  # 停止当前视频
+        self.pause_button.setEnabled(False)  # 禁用暂停按钮
+        self.seek_slider.setEnabled(False)  # 禁用定位滑块
         
         # 重置文件选择
         self.file_path_label.setText("未选择文件")  # 重置文件路径标签
-        self.current_image = None  # 清除当前图像
+        self.current_image_path = None  # 清除当前图像
+        self.current_pyramid = None  # 清除预览金字塔
+        self.current_detections = []  # 清除检测结果
         self.current_video_path = None  # 清除当前视频路径
+        self.current_video_info = None  # 清除当前视频元数据
+        self.current_folder = None  # 清除当前文件夹
+        self.gallery_model.clear()  # 清空文件夹检测结果
         self.start_button.setEnabled(False)  # 禁用开始按钮
         
         # 重置显示区域
@@ -492,6 +1149,8 @@ class AnomalyDetectionApp(QMainWindow):
         
         # 重置检测结果
         self.results_display.setText("无检测结果")  # 重置结果显示
+        self.recent_alerts = []  # 清空报警事件
+        self.alerts_display.setText("无报警事件")  # 重置报警事件显示
         self.progress_bar.setValue(0)  # 重置进度条
     
     def select_file(self):
@@ -502,23 +1161,89 @@ class AnomalyDetectionApp(QMainWindow):
             )  # 打开文件对话框选择图像
             if file_path:  # 如果选择了文件
                 self.file_path_label.setText(file_path)  # 更新文件路径标签
-                self.current_image = cv2.imread(file_path)  # 读取图像
-                self.display_image(self.current_image)  # 显示图像
+                self.image_detector.cancel()  # 取消上一张图像尚未完成的检测
+                self.stop_button.setEnabled(False)  # 禁用停止按钮
+                self.progress_bar.setValue(0)  # 重置进度条
+                label_size = self.image_label.size()  # 显示区域尺寸
+                try:
+                    pyramid = self.pyramid_cache.get(file_path, label_size.width(), label_size.height())  # 按显示尺寸降采样解码
+                except OSError as e:  # 文件无法访问
+                    pyramid, message = None, str(e)
+                else:
+                    message = "文件已损坏或格式不支持"
+                if pyramid is None:  # 无法读取图像
+                    QMessageBox.warning(self, "警告", f"无法读取图像: {message}")  # 显示警告
+                    self.current_image_path = None  # 清除当前图像
+                    self.current_pyramid = None
+                    self.start_button.setEnabled(False)  # 禁用开始按钮
+                    return
+                self.current_image_path = file_path  # 保存图像路径
+                self.current_pyramid = pyramid  # 保存预览金字塔
+                self.current_detections = []  # 新图像还没有检测结果
+                w, h = pyramid.full_size  # 原图尺寸
+                self.file_path_label.setText(f"{file_path}\n{w}x{h}")  # 显示原图尺寸
+                self.show_current_image()  # 显示图像
+                self.start_button.setEnabled(True)  # 启用开始按钮
+        elif self.mode == "folder":  # 文件夹模式
+            folder = QFileDialog.getExistingDirectory(self, "选择图像文件夹", "")  # 打开对话框选择文件夹
+            if folder:  # 如果选择了文件夹
+                self.file_path_label.setText(folder)  # 更新文件路径标签
+                self.current_folder = folder  # 保存文件夹路径
                 self.start_button.setEnabled(True)  # 启用开始按钮
         else:  # 视频模式
+            if self.last_video_dir:  # 用户浏览上次的目录时，后台继续填充缓存
+                self.prefetch_directory(self.last_video_dir)  # 预取目录
             file_path, _ = QFileDialog.getOpenFileName(
-                self, "选择视频文件", "", "视频文件 (*.mp4 *.avi *.mov *.mkv)"
+                self, "选择视频文件", self.last_video_dir, "视频文件 (*.mp4 *.avi *.mov *.mkv)"
             )  # 打开文件对话框选择视频
             if file_path:  # 如果选择了文件
-                self.file_path_label.setText(file_path)  # 更新文件路径标签
                 self.current_video_path = file_path  # 保存视频路径
-                # 显示视频第一帧
-                cap = cv2.VideoCapture(file_path)  # 打开视频文件
-                ret, frame = cap.read()  # 读取第一帧
-                if ret:  # 如果读取成功
-                    self.display_image(frame)  # 显示第一帧
-                cap.release()  # 释放视频捕获对象
-                self.start_button.setEnabled(True)  # 启用开始按钮
+                self.last_video_dir = os.path.dirname(file_path)  # 记录目录
+                # 读取视频元数据和第一帧：之前见过的文件直接使用缓存，未命中时交给预取线程读取，界面不阻塞
+                info = self.media_cache.get(file_path)  # 查询缓存
+                if info is not None:  # 命中缓存
+                    self.show_video_info(file_path, info)
+                else:  # 未命中
+                    self.current_video_info = None  # 元数据尚未读取
+                    self.file_path_label.setText(f"{file_path}\n正在读取视频信息...")  # 更新文件路径标签
+                    self.start_button.setEnabled(False)  # 读取完成前禁用开始按钮
+                    self.ensure_prefetch_thread().probe(file_path)  # 优先读取该视频
+                self.prefetch_directory(self.last_video_dir)  # 后台预取同目录的其他视频
+    
+    def show_video_info(self, file_path, info):
+        # 显示视频元数据和第一帧，启用开始按钮
+        self.current_video_info = info  # 保存元数据
+        self.file_path_label.setText(
+            f"{file_path}\n{info['width']}x{info['height']}, {info['fps']:.1f} FPS, "
+            f"{info['duration']:.1f} 秒, {info['codec'] or '未知编码'}"
+        )  # 更新文件路径标签，附带元数据
+        preview = decode_preview(info['preview'])  # 解码预览图
+        if preview is not None:  # 如果有预览图
+            self.display_image(preview)  # 显示第一帧
+        self.start_button.setEnabled(True)  # 启用开始按钮
+    
+    def on_video_probed(self, file_path, info):
+        # 预取线程读取完界面请求的视频
+        if self.mode != "video" or file_path != self.current_video_path:  # 已切换模式或选择了其他视频
+            return
+        if info is None:  # 读取失败
+            QMessageBox.warning(self, "警告", f"无法读取视频: {file_path}")  # 显示警告
+            self.current_video_path = None  # 清除当前视频
+            self.file_path_label.setText("未选择文件")  # 重置文件路径标签
+            return
+        self.show_video_info(file_path, info)  # 显示元数据
+    
+    def ensure_prefetch_thread(self):
+        # 创建并启动常驻的媒体预取线程（只创建一次）
+        if self.prefetch_thread is None:  # 尚未创建
+            self.prefetch_thread = MediaPrefetchThread(self.media_cache)  # 创建预取线程
+            self.prefetch_thread.probed_signal.connect(self.on_video_probed)  # 连接信号到视频读取完成方法
+            self.prefetch_thread.start()  # 启动线程
+        return self.prefetch_thread
+    
+    def prefetch_directory(self, directory):
+        # 后台为目录中的视频填充元数据缓存（与当前预取目录相同时忽略）
+        self.ensure_prefetch_thread().prefetch(directory)
     
     def start_detection(self):
         # 开始检测
@@ -526,128 +1251,314 @@ class AnomalyDetectionApp(QMainWindow):
             QMessageBox.critical(self, "错误", f"模型文件 {self.model_path} 不存在!")  # 显示错误消息
             return  # 退出方法
         
-        if self.mode == "image" and self.current_image is not None:  # 如果是图像模式且已选择图像
-            # 图像模式检测
+        if self.mode == "image" and self.current_image_path is not None:  # 如果是图像模式且已选择图像
+            # 图像模式检测（在工作线程中推理，界面不阻塞；可点击"停止检测"取消）
             self.start_button.setEnabled(False)  # 禁用开始按钮
-            self.stop_button.setEnabled(False)  # 禁用停止按钮
-            self.progress_bar.setValue(10)  # 设置进度为10%
-            
-            # 加载模型
-            try:
-                model = YOLO(self.model_path)  # 初始化YOLOv8模型
-                
-                # 推理
-                self.progress_bar.setValue(50)  # 设置进度为50%
-                results = model(self.current_image)  # 对图像进行目标检测
-                
-                # 获取原始图像的副本
-                img_with_boxes = self.current_image.copy()  # 复制原图像用于绘制
-                
-                # 生成检测结果文本
-                detections = []  # 初始化检测结果列表
-                for result in results:  # 遍历检测结果
-                    boxes = result.boxes.cpu().numpy()  # 获取边界框数据
-                    for i, box in enumerate(boxes):  # 遍历每个边界框
-                        x1, y1, x2, y2 = map(int, box.xyxy[0])  # 提取边界框坐标
-                        confidence = float(box.conf[0])  # 提取置信度
-                        class_id = int(box.cls[0])  # 提取类别ID
-                        
-                        # 绘制边界框
-                        cv2.rectangle(img_with_boxes, (x1, y1), (x2, y2), (0, 255, 0), 2)  # 绘制矩形边界框
-                        
-                        # 获取中文类别名称
-                        class_name = CLASS_NAMES.get(class_id, f"类别{class_id}")  # 获取类别名称
-                        
-                        # 绘制中文标签
-                        label_text = f"{class_name}: {confidence:.2f}"  # 生成标签文本
-                        img_with_boxes = cv2_add_chinese_text(
-                            img_with_boxes, 
-                            label_text, 
-                            (x1, y1 - 35), 
-                            textColor=(0, 255, 0), 
-                            textSize=25
-                        )  # 添加中文文本标签
-                        
-                        detections.append({  # 添加检测结果到列表
-                            'id': i+1,  # 目标ID
-                            'class_id': class_id,  # 类别ID
-                            'confidence': confidence,  # 置信度
-                            'box': (x1, y1, x2, y2)  # 边界框坐标
-                        })
-                
-                # 显示图像
-                self.display_image(img_with_boxes)  # 显示添加了边界框的图像
-                
-                # 更新结果显示
-                if detections:  # 如果有检测结果
-                    result_text = "检测到以下结果:\n"  # 初始化结果文本
-                    for d in detections:  # 遍历检测结果
-                        class_name = CLASS_NAMES.get(d['class_id'], f"类别{d['class_id']}")  # 获取类别名称
-                        result_text += f"- 目标 {d['id']}: {class_name}, 置信度 {d['confidence']:.2f}\n"  # 添加结果信息
-                    self.results_display.setText(result_text)  # 更新结果显示
-                else:  # 没有检测到目标
-                    self.results_display.setText("未检测到目标")  # 更新结果显示
-                
-                self.progress_bar.setValue(100)  # 设置进度为100%
-                self.start_button.setEnabled(True)  # 启用开始按钮
-                
-            except Exception as e:  # 捕获异常
-                QMessageBox.critical(self, "错误", f"检测过程中发生错误: {str(e)}")  # 显示错误消息
-                self.progress_bar.setValue(0)  # 重置进度条
-                self.start_button.setEnabled(True)  # 启用开始按钮
+            self.stop_button.setEnabled(True)  # 启用停止按钮，用于取消
+            self.progress_bar.setValue(0)  # 重置进度条
+            self.image_detector.model_path = self.model_path  # 当前模型
+            self.image_detector.server_address = self.inference_server  # 当前推理服务地址
+            self.image_detector.submit(self.current_image_path)  # 提交文件路径（检测线程按原分辨率解码，命中缓存时无需解码）
         
         elif self.mode == "video" and self.current_video_path is not None:  # 如果是视频模式且已选择视频
             # 视频模式检测
             self.start_button.setEnabled(False)  # 禁用开始按钮
             self.stop_button.setEnabled(True)  # 启用停止按钮
+            self.pause_button.setEnabled(True)  # 启用暂停按钮
+            self.pause_button.setText("暂停")  # 重置按钮文本
+            self.seek_slider.setEnabled(True)  # 启用定位滑块
             
             # 重置进度条
             self.progress_bar.setValue(0)  # 设置进度条为0
+            self.recent_alerts = []  # 清空报警事件
+            self.alerts_display.setText("无报警事件")  # 重置报警事件显示
+            
+            # 在常驻工作线程中加载并开始处理视频（模型已加载时无需重新加载）
+            worker = self.ensure_video_worker()  # 获取视频工作线程
+            worker.target_fps = self.qos_target_fps  # 服务质量目标帧率
+            worker.latency_budget_ms = self.qos_latency_budget_ms  # 推理延迟预算
+            worker.adaptive = self.adaptive_quality  # 是否自适应画质
+            worker.load(self.current_video_path, self.current_video_info)  # 加载视频
+            worker.play()  # 开始处理
+        
+        elif self.mode == "folder" and self.current_folder is not None:  # 如果是文件夹模式且已选择文件夹
+            # 文件夹批量检测
+            self.start_button.setEnabled(False)  # 禁用开始按钮
+            self.stop_button.setEnabled(True)  # 启用停止按钮
+            self.progress_bar.setValue(0)  # 设置进度条为0
+            self.gallery_model.clear()  # 清空上一次的结果
+            self.folder_stats = {'total': 0, 'anomaly': 0}  # 重置统计
+            self.results_display.setText("正在检测...")  # 更新结果显示
             
-            # 创建并启动视频处理线程
-            self.video_thread = VideoThread(self.current_video_path, self.model_path)  # 创建视频处理线程
+            # 创建并启动文件夹检测线程
+            self.folder_thread = FolderDetectionThread(self.current_folder, self.model_path, self.model_profile,
+                                                       self.inference_server)  # 创建文件夹检测线程（与图像、视频模式使用相同的推理后端）
+            self.folder_thread.results_signal.connect(self.on_folder_results)  # 连接信号到结果处理方法
+            self.folder_thread.progress_signal.connect(self.update_progress)  # 连接信号到更新进度方法
+            self.folder_thread.finished_signal.connect(self.on_folder_finished)  # 连接信号到完成方法
+            self.folder_thread.start()  # 启动线程
+    
+    def ensure_video_worker(self):
+        # 创建并启动常驻的视频检测工作线程（只创建一次）
+        if self.video_thread is None:  # 尚未创建
+            self.video_thread = VideoThread(self.model_path, self.model_profile,
+                                            server_address=self.inference_server,
+                                            snapshot_writer=self.snapshot_writer,
+                                            frame_pool=self.frame_pool,
+                                            heatmap_store=self.heatmap_store,
+                                            detection_store=self.detection_store)  # 创建视频工作线程
             self.video_thread.change_pixmap_signal.connect(self.update_video_frame)  # 连接信号到更新视频帧方法
             self.video_thread.progress_signal.connect(self.update_progress)  # 连接信号到更新进度方法
             self.video_thread.finished_signal.connect(self.on_video_finished)  # 连接信号到视频完成方法
+            self.video_thread.alert_signal.connect(self.on_alert_event)  # 连接信号到报警事件处理方法
+            self.video_thread.backend_signal.connect(self.backend_label.setText)  # 连接信号到后端状态标签
+            self.video_thread.qos_signal.connect(self.on_qos_update)  # 连接信号到服务质量显示方法
+            self.video_thread.state_signal.connect(self.on_video_state)  # 连接信号到工作线程状态方法
+            self.video_thread.error_signal.connect(self.on_video_error)  # 连接信号到错误处理方法
+            self.video_thread.ab_signal.connect(self.on_ab_update)  # 连接信号到A/B对比统计方法
             self.video_thread.start()  # 启动线程
+        return self.video_thread
+    
+    def browse_model(self):
+        # 选择其他模型文件并加入下拉框
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, "选择模型文件", "", "模型文件 (" + " ".join("*" + ext for ext in MODEL_EXTENSIONS) + ")"
+        )  # 打开文件对话框选择模型
+        if file_path:  # 如果选择了文件
+            index = self.model_combo.findData(file_path)  # 是否已在列表中
+            if index < 0:  # 添加到列表
+                self.model_combo.addItem(file_path, file_path)
+                index = self.model_combo.count() - 1
+            self.model_combo.setCurrentIndex(index)  # 选中
+    
+    def load_model(self, model_path, purpose):
+        # 在后台加载并预热模型，完成后按用途切换或开始A/B对比
+        if self.model_loader is not None and self.model_loader.isRunning():  # 上一次加载尚未完成
+            QMessageBox.information(self, "提示", "正在加载模型，请稍候")  # 提示
+            return False
+        self.model_loader_purpose = purpose  # 记录用途
+        self.model_loader = ModelLoaderThread(model_path, model_profile(self.inference_profile, model_path,
+                                                                        self.tuned_model_path),
+                                              self.inference_server)  # 创建模型加载线程
+        self.model_loader.loaded_signal.connect(self.on_model_loaded)  # 连接信号到模型加载完成方法
+        self.model_loader.error_signal.connect(self.on_model_error)  # 连接信号到模型加载失败方法
+        self.model_loader.start()  # 启动线程
+        self.model_status_label.setText(f"正在加载并预热 {model_path} ...")  # 更新状态
+        return True
+    
+    def swap_model(self):
+        # 切换到下拉框中选择的模型（检测不中断）
+        model_path = self.model_combo.currentData()  # 选择的模型
+        if model_path == self.model_path:  # 已是当前模型
+            return
+        if self.ab_button.isChecked():  # 切换模型时结束A/B对比
+            self.ab_button.setChecked(False)
+        self.load_model(model_path, "swap")  # 后台加载
+    
+    def on_ab_toggled(self, checked):
+        # 开启或关闭A/B对比：当前模型为A，下拉框中选择的模型为B
+        if not checked:  # 关闭
+            if self.video_thread is not None:  # 释放候选模型
+                self.video_thread.set_ab_backend(None)
+            self.model_status_label.setText(f"当前模型: {self.model_path}")  # 恢复状态
+            return
+        model_path = self.model_combo.currentData()  # 候选模型
+        if model_path == self.model_path or not self.load_model(model_path, "ab"):  # 需要选择另一个模型
+            if model_path == self.model_path:  # 提示
+                QMessageBox.information(self, "提示", "请先在下拉框中选择另一个模型作为 B")
+            self.ab_button.blockSignals(True)  # 恢复按钮状态，不触发关闭逻辑
+            self.ab_button.setChecked(False)
+            self.ab_button.blockSignals(False)
+    
+    def on_model_loaded(self, backend, model_path, load_ms):
+        # 模型加载预热完成：交给检测线程（检测线程在帧与帧之间替换并关闭旧后端）
+        if self.model_loader_purpose == "swap":  # 切换当前模型
+            self.model_path = model_path  # 新模型路径
+            self.model_profile = model_profile(self.inference_profile, model_path, self.tuned_model_path)  # 新模型的推理配置
+            self.ensure_video_worker().swap_backend(backend, model_path, self.model_profile)  # 切换视频检测模型
+            self.image_detector.model_path = model_path  # 图像检测使用新模型（缓存键包含模型，不会误用旧结果）
+            self.image_detector.profile = self.model_profile
+            self.model_status_label.setText(f"当前模型: {model_path}（加载预热 {load_ms:.0f} ms）")  # 更新状态
+        elif self.ab_button.isChecked():  # 开始A/B对比
+            self.ensure_video_worker().set_ab_backend(backend, model_path)  # 候选模型交给视频检测线程
+            self.model_status_label.setText(f"A/B 对比: A={os.path.basename(self.model_path)}, "
+                                            f"B={os.path.basename(model_path)}，等待抽样帧...")  # 更新状态
+        else:  # 加载期间已取消A/B对比
+            backend.close()  # 释放候选模型
+    
+    def on_model_error(self, model_path, message):
+        # 模型加载失败，当前模型不受影响
+        if self.model_loader_purpose == "ab":  # 取消A/B对比
+            self.ab_button.blockSignals(True)
+            self.ab_button.setChecked(False)
+            self.ab_button.blockSignals(False)
+        self.model_status_label.setText(f"当前模型: {self.model_path}")  # 恢复状态
+        QMessageBox.critical(self, "错误", f"加载模型 {model_path} 失败: {message}")  # 显示错误消息
+    
+    def on_ab_update(self, metrics):
+        # 显示A/B对比统计
+        if not self.ab_button.isChecked():  # 已关闭（排队中的旧统计）
+            return
+        self.model_status_label.setText(
+            f"A/B 对比（{metrics['frames']} 帧抽样）\n"
+            f"结果不一致: {metrics['disagreement']:.1%}，异常判断相反: {metrics['anomaly_flip']:.1%}\n"
+            f"A {metrics['model_a']}: {metrics['ms_a']:.1f} ms/帧\n"
+            f"B {metrics['model_b']}: {metrics['ms_b']:.1f} ms/帧"
+        )  # 更新状态
+    
+    def toggle_pause(self):
+        # 暂停/继续视频检测
+        if self.video_thread is None:  # 没有视频工作线程
+            return
+        if self.pause_button.text() == "暂停":  # 正在处理
+            self.video_thread.pause()  # 暂停（最多再处理一帧）
+            self.pause_button.setText("继续")  # 更新按钮文本
+        else:  # 已暂停
+            self.video_thread.play()  # 继续
+            self.pause_button.setText("暂停")  # 更新按钮文本
+    
+    def on_seek(self):
+        # 松开定位滑块时定位到对应帧
+        if self.video_thread is None or not self.current_video_info:  # 没有加载视频
+            return
+        frame_index = int(self.seek_slider.value() / 1000 * self.current_video_info['frame_count'])  # 目标帧号
+        self.video_thread.seek(frame_index)  # 定位
+    
+    def on_video_state(self, state):
+        # 视频工作线程状态变化
+        if state in ("stopped", "finished"):  # 已停止或已结束
+            self.pause_button.setEnabled(False)  # 禁用暂停按钮
+            self.pause_button.setText("暂停")  # 重置按钮文本
+    
+    def on_video_error(self, message):
+        # 视频工作线程出错（线程仍保留，可重新开始）
+        self.stop_button.setEnabled(False)  # 禁用停止按钮
+        self.start_button.setEnabled(self.current_video_path is not None)  # 启用开始按钮
+        QMessageBox.critical(self, "错误", f"视频检测过程中发生错误: {message}")  # 显示错误消息
+    
+    def on_image_progress(self, request_id, value):
+        # 图像检测进度
+        self.progress_bar.setValue(value)  # 设置进度条值
+    
+    def on_image_result(self, request_id, raw_detections, description, cached):
+        # 图像检测完成
+        self.backend_label.setText(description + (" (缓存)" if cached else ""))  # 显示推理后端状态
+        
+        # 生成检测结果文本
+        detections = []  # 初始化检测结果列表
+        for i, d in enumerate(raw_detections):  # 遍历每个边界框
+            detections.append({  # 添加检测结果到列表
+                'id': i+1,  # 目标ID
+                'class_id': d['class_id'],  # 类别ID
+                'confidence': d['confidence'],  # 置信度
+                'box': d['box']  # 边界框坐标
+            })
+        
+        # 显示图像
+        self.current_detections = raw_detections  # 保存检测结果，窗口大小变化时重新绘制
+        self.show_current_image()  # 在预览图像上显示边界框
+        
+        # 更新结果显示
+        if detections:  # 如果有检测结果
+            result_text = "检测到以下结果:\n"  # 初始化结果文本
+            for d in detections:  # 遍历检测结果
+                class_name = CLASS_NAMES.get(d['class_id'], f"类别{d['class_id']}")  # 获取类别名称
+                result_text += f"- 目标 {d['id']}: {class_name}, 置信度 {d['confidence']:.2f}\n"  # 添加结果信息
+            self.results_display.setText(result_text)  # 更新结果显示
+        else:  # 没有检测到目标
+            self.results_display.setText("未检测到目标")  # 更新结果显示
+        
+        self.progress_bar.setValue(100)  # 设置进度为100%
+        self.start_button.setEnabled(True)  # 启用开始按钮
+        self.stop_button.setEnabled(False)  # 禁用停止按钮
+    
+    def on_image_error(self, request_id, message):
+        # 图像检测出错
+        QMessageBox.critical(self, "错误", f"检测过程中发生错误: {message}")  # 显示错误消息
+        self.progress_bar.setValue(0)  # 重置进度条
+        self.start_button.setEnabled(True)  # 启用开始按钮
+        self.stop_button.setEnabled(False)  # 禁用停止按钮
     
     def stop_detection(self):
         # 停止检测
-        if self.video_thread is not None and self.video_thread.isRunning():  # 如果视频线程存在且正在运行
-            self.video_thread.stop()  # 停止视频线程
+        if self.mode == "image":  # 图像模式：取消检测（正在进行的推理结果会被丢弃）
+            self.image_detector.cancel()  # 取消图像检测
+            self.progress_bar.setValue(0)  # 重置进度条
+            self.stop_button.setEnabled(False)  # 禁用停止按钮
+            self.start_button.setEnabled(self.current_image_path is not None)  # 启用开始按钮
+        if self.video_thread is not None and self.mode == "video":  # 视频模式（只发送停止命令，不等待推理结束）
+            self.video_thread.stop()  # 停止当前视频，工作线程和模型保留
+            self.stop_button.setEnabled(False)  # 禁用停止按钮
+            self.start_button.setEnabled(True)  # 启用开始按钮
+        if self.folder_thread is not None and self.folder_thread.isRunning():  # 如果文件夹检测线程正在运行
+            self.folder_thread.stop()  # 停止文件夹检测线程
             self.stop_button.setEnabled(False)  # 禁用停止按钮
             self.start_button.setEnabled(True)  # 启用开始按钮
     
-    def update_video_frame(self, frame, detections):
+    def on_folder_results(self, records):
+        # 追加一批文件夹检测结果
+        self.gallery_model.append_records(records)  # 添加到结果模型
+        self.folder_stats['total'] += len(records)  # 累计图像数
+        self.folder_stats['anomaly'] += sum(1 for r in records if r['has_anomaly'])  # 累计异常图像数
+        self.results_display.setText(
+            f"已检测 {self.folder_stats['total']} 张图像\n包含异常: {self.folder_stats['anomaly']} 张"
+        )  # 更新结果显示
+    
+    def on_folder_finished(self):
+        # 文件夹检测完成
+        self.stop_button.setEnabled(False)  # 禁用停止按钮
+        self.start_button.setEnabled(True)  # 启用开始按钮
+        self.statusBar().showMessage(f"文件夹检测完成，共 {self.folder_stats['total']} 张图像", 5000)  # 状态栏提示
+    
+    def on_gallery_filter_changed(self, checked):
+        # 切换“仅显示异常”筛选
+        self.gallery_proxy.set_anomaly_only(checked)  # 设置筛选条件
+    
+    def on_gallery_sort_changed(self, index):
+        # 切换排序方式
+        if index == 0:  # 按文件名
+            self.gallery_proxy.setSortRole(PathRole)  # 按路径排序
+            self.gallery_proxy.sort(0, Qt.AscendingOrder)  # 升序
+        else:  # 按异常置信度
+            self.gallery_proxy.setSortRole(MaxConfidenceRole)  # 按最高置信度排序
+            self.gallery_proxy.sort(0, Qt.DescendingOrder)  # 降序
+    
+    def on_gallery_item_clicked(self, index):
+        # 显示所选图像的检测结果
+        record = index.data(RecordRole)  # 获取结果记录
+        if record is None:  # 无效项
+            return
+        if record['error']:  # 读取失败
+            self.results_display.setText(f"{record['path']}\n{record.get('message') or '无法读取图像'}")  # 显示错误
+            return
+        result_text = f"{os.path.basename(record['path'])}\n"  # 文件名
+        if record['detections']:  # 如果有检测结果
+            result_text += "检测到以下结果:\n"  # 初始化结果文本
+            for i, d in enumerate(record['detections']):  # 遍历检测结果
+                class_name = CLASS_NAMES.get(d['class_id'], f"类别{d['class_id']}")  # 获取类别名称
+                result_text += f"- 目标 {i+1}: {class_name}, 置信度 {d['confidence']:.2f}\n"  # 添加结果信息
+        else:  # 没有检测到目标
+            result_text += "未检测到目标"  # 更新结果文本
+        self.results_display.setText(result_text)  # 更新结果显示
+    
+    def update_video_frame(self, frame, detections, slot=-1, run_id=0):
         # 更新视频帧和检测结果
+        with tracing.span("update_video_frame"):  # 追踪：界面处理一帧
+            self._update_video_frame(frame, detections, slot, run_id)
+    
+    def _update_video_frame(self, frame, detections, slot, run_id):
+        # 更新视频帧和检测结果（update_video_frame 的实现）
+        thread = self.video_thread  # 视频工作线程
+        if run_id != thread.run_id:  # 已停止、切换视频或定位，丢弃排队中的旧帧
+            thread.release_frame(slot, run_id)  # 归还槽位（帧来源已关闭时忽略）
+            return
         self.current_detections = detections  # 保存当前检测结果
         
-        # 绘制检测结果
-        frame_with_boxes = frame.copy()  # 复制原帧用于绘制
-        for d in detections:  # 遍历检测结果
-            x1, y1, x2, y2 = d['box']  # 获取边界框坐标
-            confidence = d['confidence']  # 获取置信度
-            class_id = int(d['class_id'])  # 获取类别ID
-            
-            # 绘制边界框
-            cv2.rectangle(frame_with_boxes, (x1, y1), (x2, y2), (0, 255, 0), 2)  # 绘制矩形边界框
-            
-            # 获取中文类别名称
-            class_name = CLASS_NAMES.get(class_id, f"类别{class_id}")  # 获取类别名称
-            
-            # 绘制中文标签
-            label_text = f"{class_name}: {confidence:.2f}"  # 生成标签文本
-            # 使用自定义函数添加中文文本
-            frame_with_boxes = cv2_add_chinese_text(
-                frame_with_boxes, 
-                label_text, 
-                (x1, y1 - 35), 
-                textColor=(0, 255, 0), 
-                textSize=25
-            )  # 添加中文文本标签
-        
-        # 显示帧
-        self.display_image(frame_with_boxes)  # 显示添加了边界框的帧
+        # 缩放到显示缓冲区后立即归还槽位，再在显示缓冲区上绘制检测结果
+        heatmap = thread.heatmap if self.heatmap_checkbox.isChecked() else None  # 需要叠加的热力图
+        self.display_detections(frame, detections, release=lambda: thread.release_frame(slot, run_id),
+                                heatmap=heatmap)
+        self.frame_pool.mark_frame()  # 记录显示了一帧
         
         # 更新检测结果文本
         if detections:  # 如果有检测结果
@@ -660,41 +1571,142 @@ class AnomalyDetectionApp(QMainWindow):
         else:  # 没有检测到目标
             self.results_display.setText("未检测到目标")  # 更新结果显示
     
+    def on_alert_event(self, event):
+        # 报警事件处理：只在事件开始、持续、结束时更新界面，而不是每帧刷新
+        type_names = {'start': '开始', 'update': '持续', 'end': '结束'}  # 事件类型中文名称
+        text = (f"事件 {event['event_id']} {type_names.get(event['event_type'], event['event_type'])}: "
+                f"{event['video_time']:.1f}s, 持续 {event['duration']:.1f}s, "
+                f"峰值置信度 {event['peak_confidence']:.2f}")  # 生成事件文本
+        self.recent_alerts = ([text] + self.recent_alerts)[:5]  # 只保留最近5条
+        self.alerts_display.setText("\n".join(self.recent_alerts))  # 更新报警事件显示
+        if event['event_type'] == 'start':  # 新事件开始时在状态栏提示
+            self.statusBar().showMessage(f"检测到异常事件 {event['event_id']}", 5000)  # 显示5秒
+    
+    def on_qos_update(self, metrics):
+        # 显示当前质量等级和实测处理帧率
+        text = f"画质: {metrics['level'] + 1}/{metrics['levels']} {metrics['imgsz']}px"  # 等级和输入尺寸
+        if metrics['stride'] > 1:  # 跳帧推理
+            text += f" 每{metrics['stride']}帧推理"
+        text += f", {metrics['fps']:.1f}/{metrics['target_fps']:.0f} FPS"  # 实测帧率/目标帧率
+        self.qos_label.setText(text)  # 更新服务质量标签
+        self.qos_label.setStyleSheet("color: #e65100;" if metrics['level'] > 0 else "")  # 降级时以橙色显示
+    
     def update_progress(self, value):
         # 更新进度条
         self.progress_bar.setValue(value)  # 设置进度条值
+        if self.mode == "video" and not self.seek_slider.isSliderDown():  # 用户未拖动滑块时同步位置
+            self.seek_slider.setValue(value * 10)
     
     def on_video_finished(self):
         # 视频处理完成
         self.stop_button.setEnabled(False)  # 禁用停止按钮
+        self.pause_button.setEnabled(False)  # 禁用暂停按钮
         self.start_button.setEnabled(True)  # 启用开始按钮
         QMessageBox.information(self, "完成", "视频检测已完成!")  # 显示完成消息
     
-    def display_image(self, cv_img):
-        # 将OpenCV图像转换为QPixmap并显示
-        if cv_img is None:  # 如果图像为空
-            return  # 直接返回
-            
-        # 调整图像大小以适应标签
+    def display_detections(self, image, detections, release=None, heatmap=None, box_scale=1.0):
+        """
+        把图像缩放到显示区域大小的池化缓冲区，在缓冲区上原地绘制检测框和中文标签后显示
+        release 在缩放完成后调用，用于尽早归还原始帧；heatmap 不为None时先叠加热力图；
+        box_scale 为检测框坐标到 image 坐标的比例（image 为降采样预览时小于1）
+        """
+        with tracing.span("resize"):  # 追踪：缩放
+            display, scale = self.resize_for_display(image)  # 缩放到显示缓冲区
+        scale *= box_scale  # 检测框坐标到显示坐标的比例
+        if release is not None:  # 原始帧已不再需要
+            release()
+        if heatmap is not None:  # 叠加异常热力图
+            with tracing.span("heatmap_overlay"):  # 追踪：热力图叠加
+                heatmap.blend(display)
+        with tracing.span("draw_labels"):  # 追踪：绘制检测框和标签
+            for d in detections:  # 遍历检测结果
+                x1, y1, x2, y2 = (int(v * scale) for v in d['box'])  # 换算到显示坐标
+                class_id = int(d['class_id'])  # 获取类别ID
+                
+                # 绘制边界框
+                cv2.rectangle(display, (x1, y1), (x2, y2), (0, 255, 0), 2)  # 绘制矩形边界框
+                
+                # 绘制中文标签（字号和偏移按显示比例缩放，与在原图上绘制后再缩小的效果一致）
+                class_name = CLASS_NAMES.get(class_id, f"类别{class_id}")  # 获取类别名称
+                label_text = f"{class_name}: {d['confidence']:.2f}"  # 生成标签文本
+                cv2_add_chinese_text(display, label_text, (x1, y1 - int(35 * scale)),
+                                     textColor=(0, 255, 0), textSize=max(12, int(25 * scale)))  # 原地添加中文文本标签
+        
+        with tracing.span("display_image"):  # 追踪：转换并显示
+            self.show_display_buffer(display)  # 显示
+        self.frame_pool.release(display)  # QPixmap已复制像素，归还显示缓冲区
+    
+    def resize_for_display(self, cv_img):
+        # 按标签尺寸保持纵横比缩放到池化缓冲区，返回 (缓冲区, 缩放比例)
         h, w, ch = cv_img.shape  # 获取图像尺寸和通道数
         label_size = self.image_label.size()  # 获取标签尺寸
         
         # 计算要保持纵横比的新尺寸
         scale = min(label_size.width() / w, label_size.height() / h)  # 计算缩放比例
-        new_w = int(w * scale)  # 计算新宽度
-        new_h = int(h * scale)  # 计算新高度
-        
-        # 调整大小
-        cv_img = cv2.resize(cv_img, (new_w, new_h))  # 调整图像大小
-        
-        # 转换颜色空间
-        bytes_per_line = ch * new_w  # 计算每行字节数
-        convert_to_Qt_format = QImage(cv_img.data, new_w, new_h, bytes_per_line, QImage.Format_BGR888)  # 转换为Qt图像格式
-        pixmap = QPixmap.fromImage(convert_to_Qt_format)  # 转换为QPixmap
+        new_w = max(1, int(w * scale))  # 计算新宽度
+        new_h = max(1, int(h * scale))  # 计算新高度
         
-        # 显示图像
+        # 调整大小（直接写入复用的缓冲区）
+        display = self.frame_pool.acquire((new_h, new_w, ch))  # 借出显示缓冲区
+        cv2.resize(cv_img, (new_w, new_h), dst=display)  # 调整图像大小
+        return display, scale
+    
+    def show_display_buffer(self, display):
+        # 把显示大小的BGR缓冲区转换为QPixmap并显示
+        h, w, ch = display.shape  # 获取缓冲区尺寸
+        convert_to_Qt_format = QImage(display.data, w, h, ch * w, QImage.Format_BGR888)  # 转换为Qt图像格式（不复制）
+        pixmap = QPixmap.fromImage(convert_to_Qt_format)  # 转换为QPixmap（复制像素）
         self.image_label.setPixmap(pixmap)  # 设置图像到标签
     
+    def show_current_image(self):
+        # 从预览金字塔中取不小于显示区域的最小一级显示当前图像，有检测结果时绘制边界框
+        if self.current_pyramid is None:  # 没有图像
+            return
+        label_size = self.image_label.size()  # 显示区域尺寸
+        w, h = label_size.width(), label_size.height()
+        if not self.current_pyramid.covers(w, h):  # 显示区域变大，预览分辨率不足
+            try:
+                pyramid = self.pyramid_cache.get(self.current_image_path, w, h)  # 以更小的降采样比例重新解码
+            except OSError:  # 文件已被移动或删除，继续使用已有的预览
+                pyramid = None
+            if pyramid is not None:
+                self.current_pyramid = pyramid
+        image, factor = self.current_pyramid.level_for(w, h)  # 选择金字塔层级
+        self.display_detections(image, self.current_detections, box_scale=1.0 / factor)  # 显示
+    
+    def resizeEvent(self, event):
+        # 窗口大小变化时按新的显示尺寸重新绘制当前图像（等布局更新后再绘制）
+        super().resizeEvent(event)  # 调用父类方法
+        if getattr(self, "current_pyramid", None) is not None and self.mode == "image":  # 图像模式且已选择图像
+            QTimer.singleShot(0, self.show_current_image)
+    
+    def display_image(self, cv_img):
+        # 将OpenCV图像转换为QPixmap并显示
+        if cv_img is None:  # 如果图像为空
+            return  # 直接返回
+        with tracing.span("display_image"):  # 追踪：缩放并显示
+            display, _ = self.resize_for_display(cv_img)  # 缩放到显示缓冲区
+            self.show_display_buffer(display)  # 显示
+            self.frame_pool.release(display)  # 归还显示缓冲区
+    
+    def on_trace_toggled(self, checked):
+        # 开启追踪时清空旧事件；关闭时把记录的事件导出为 Chrome trace JSON
+        if checked:  # 开启
+            tracing.clear()  # 清空旧事件
+            tracing.enable()  # 开启追踪
+            self.statusBar().showMessage("性能追踪已开启，再次点击停止并导出", 5000)  # 状态栏提示
+            return
+        tracing.disable()  # 关闭追踪
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, "导出追踪文件", f"trace_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json", "Chrome Trace (*.json)"
+        )  # 选择导出路径
+        if file_path:  # 选择了路径
+            try:
+                count = tracing.dump(file_path)  # 导出
+                self.statusBar().showMessage(f"已导出 {count} 个追踪事件到 {file_path}，可在 ui.perfetto.dev 中打开", 8000)
+            except OSError as e:  # 写入失败
+                QMessageBox.critical(self, "错误", f"导出追踪文件失败: {str(e)}")  # 显示错误消息
+    
     def show_about(self):
         # 显示关于对话框
         about_text = """
@@ -710,5 +1722,22 @@ class AnomalyDetectionApp(QMainWindow):
     def closeEvent(self, event):
         # 关闭事件处理
         if self.video_thread is not None and self.video_thread.isRunning():  # 如果视频线程存在且正在运行
-            self.video_thread.stop()  # 停止视频线程
+            if not self.video_thread.shutdown(timeout=5.0):  # 通知退出并等待（最多5秒）
+                # 推理尚未结束：线程仍会写入快照和检测记录，此时不能关闭存储和窗口，等线程结束后自动再次关闭
+                if not self.close_pending:  # 只连接一次
+                    self.close_pending = True
+                    self.video_thread.finished.connect(self.close)  # 线程结束后重新关闭窗口
+                self.statusBar().showMessage("正在等待视频检测线程完成当前推理，完成后自动关闭...")  # 状态栏提示
+                event.ignore()  # 暂不关闭
+                return
+        if self.model_loader is not None:  # 等待正在加载的模型（已加载的后端随进程退出释放）
+            self.model_loader.wait(5000)
+        self.image_detector.shutdown(timeout=5.0)  # 取消图像检测并释放模型
+        if self.folder_thread is not None and self.folder_thread.isRunning():  # 如果文件夹检测线程正在运行
+            self.folder_thread.stop()  # 停止文件夹检测线程
+        if self.prefetch_thread is not None and self.prefetch_thread.isRunning():  # 如果预取线程正在运行
+            self.prefetch_thread.stop()  # 停止预取线程
+        self.snapshot_writer.close()  # 写完剩余快照并停止写入线程
+        self.heatmap_store.save_all()  # 保存热力图快照
+        self.detection_store.close()  # 写完剩余检测记录并停止写入线程
         event.accept()  # 接受关闭事件 
\ No newline at end of file
@@ -0,0 +1,194 @@
+# 异常空间热力图：按摄像头把异常框覆盖的区域累加到降采样的浮点网格上，随时间指数衰减，可保存到磁盘并在下次恢复
+
+# 导入必要的库
+import os  # 导入操作系统模块，用于文件和路径操作
+import math  # 导入数学模块，用于衰减系数计算
+import time  # 导入时间模块，用于限制叠加层的重建频率
+import threading  # 导入线程模块，检测线程更新、界面线程绘制时加锁
+import numpy as np  # 导入NumPy库，用于向量化累加
+import cv2  # 导入OpenCV库，用于缩放和伪彩色映射
+
+ANOMALY_CLASS_ID = 0  # 异常类别ID
+RENORMALIZE_EXPONENT = 30.0  # 延迟衰减的指数超过该值时把衰减真正作用到网格上，避免数值溢出
+OVERLAY_REFRESH = 0.5  # 持续有新证据时，显示叠加层最多每隔多少秒重建一次
+
+
+class AnomalyHeatmap:
+    """
+    单个摄像头的异常热力图
+
+    网格分辨率为帧分辨率的 1/cell_size。每帧把所有异常框的覆盖区域（按置信度加权）写入二维差分数组，
+    再做两次累加得到本帧的覆盖图，整体耗时只与网格大小有关，与框的数量无关。
+    时间衰减采用延迟方式：新证据乘以随时间增长的权重，而不是每帧把整个网格乘以衰减系数。
+    时间为已处理的视频时间（每帧前进 1/帧率），暂停、定位和程序关闭期间热度不变。
+    """
+
+    def __init__(self, frame_shape, cell_size=8, half_life=3600.0, class_id=ANOMALY_CLASS_ID):
+        self.frame_shape = tuple(frame_shape[:2])  # 帧尺寸 (高, 宽)
+        self.cell_size = cell_size  # 网格单元对应的像素数
+        self.tau = half_life / math.log(2)  # 衰减时间常数（秒）
+        self.class_id = class_id  # 统计的类别ID
+        h, w = self.frame_shape  # 帧尺寸
+        self.grid_shape = ((h + cell_size - 1) // cell_size, (w + cell_size - 1) // cell_size)  # 网格尺寸
+        self.grid = np.zeros(self.grid_shape, dtype=np.float32)  # 热力网格（以 ref_time 为基准的值）
+        self.diff = np.zeros((self.grid_shape[0] + 1, self.grid_shape[1] + 1), dtype=np.float32)  # 差分数组（复用）
+        self.ref_time = None  # 网格值对应的基准时间
+        self.last_time = None  # 最近一次更新的时间
+        self.version = 0  # 网格内容版本，有新证据时加1（整体衰减在归一化后抵消，不影响叠加层）
+        self.overlay_cache = None  # 显示叠加层缓存 (版本, 显示尺寸, 不透明度, 生成时间, 预乘伪彩色, 背景保留比例)
+        self.lock = threading.Lock()  # 更新与读取互斥
+
+    def advance(self, detections, seconds):
+        """
+        时间前进 seconds 秒（通常为一帧的时长 1/帧率）并累加本帧的异常框
+        """
+        self.update(detections, (self.last_time or 0.0) + seconds)  # last_time 只在检测线程中修改
+
+    def update(self, detections, timestamp):
+        """
+        把一帧的异常框累加到热力图，timestamp 为单调递增的秒数（已处理的视频时间）
+        """
+        boxes = [(d['box'], d['confidence']) for d in detections if int(d['class_id']) == self.class_id]  # 异常框
+        with self.lock:  # 加锁
+            if self.ref_time is None:  # 第一次更新
+                self.ref_time = timestamp
+            self.last_time = timestamp  # 记录更新时间
+            exponent = (timestamp - self.ref_time) / self.tau  # 延迟衰减指数
+            if exponent > RENORMALIZE_EXPONENT:  # 权重过大，把衰减作用到网格上
+                self.grid *= math.exp(-exponent)
+                self.ref_time, exponent = timestamp, 0.0
+            if not boxes:  # 本帧没有异常
+                return
+
+            # 框坐标换算到网格并裁剪（向量化）
+            coords = np.array([b for b, _ in boxes], dtype=np.float32) / self.cell_size  # 网格坐标
+            gh, gw = self.grid_shape  # 网格尺寸
+            x0 = np.clip(np.floor(coords[:, 0]), 0, gw).astype(np.intp)  # 左
+            y0 = np.clip(np.floor(coords[:, 1]), 0, gh).astype(np.intp)  # 上
+            x1 = np.clip(np.ceil(coords[:, 2]), 0, gw).astype(np.intp)  # 右（不含）
+            y1 = np.clip(np.ceil(coords[:, 3]), 0, gh).astype(np.intp)  # 下（不含）
+            weight = np.array([c for _, c in boxes], dtype=np.float32) * math.exp(exponent)  # 按置信度和延迟衰减加权
+
+            # 二维差分：每个框只写四个角，两次累加后得到覆盖区域
+            self.diff.fill(0)  # 清空差分数组
+            np.add.at(self.diff, (y0, x0), weight)
+            np.add.at(self.diff, (y0, x1), -weight)
+            np.add.at(self.diff, (y1, x0), -weight)
+            np.add.at(self.diff, (y1, x1), weight)
+            np.cumsum(self.diff, axis=0, out=self.diff)  # 纵向累加
+            np.cumsum(self.diff, axis=1, out=self.diff)  # 横向累加
+            self.grid += self.diff[:gh, :gw]  # 累加到热力网格
+            self.version += 1  # 叠加层需要重建
+
+    def values(self, timestamp=None):
+        # 返回衰减到指定时间（默认最近一次更新）的热力网格副本
+        with self.lock:  # 加锁
+            if self.ref_time is None:  # 尚未更新
+                return np.zeros(self.grid_shape, dtype=np.float32)
+            t = self.last_time if timestamp is None else timestamp  # 目标时间
+            return self.grid * np.float32(math.exp(-(t - self.ref_time) / self.tau))
+
+    def _overlay(self, shape, alpha):
+        # 返回显示尺寸的 (预乘不透明度的伪彩色, 背景保留比例)，没有异常时返回 (None, None)；
+        # 只在有新证据或显示尺寸变化时重建，持续有新证据时最多每 OVERLAY_REFRESH 秒重建一次
+        now = time.monotonic()  # 当前时间
+        cache = self.overlay_cache  # 已缓存的叠加层
+        if (cache is not None and cache[1] == shape and cache[2] == alpha
+                and (cache[0] == self.version or now - cache[3] < OVERLAY_REFRESH)):  # 缓存仍可用
+            return cache[4], cache[5]
+        with self.lock:  # 加锁
+            version = self.version  # 网格版本
+            peak = float(self.grid.max())  # 最大热度（整体衰减在归一化时抵消，直接使用网格值）
+            level = cv2.convertScaleAbs(self.grid, alpha=255.0 / peak) if peak > 0 else None  # 归一化到 0-255
+        if level is None:  # 没有任何异常
+            self.overlay_cache = (version, shape, alpha, now, None, None)
+            return None, None
+        h, w = shape  # 显示尺寸
+        level = cv2.resize(level, (w, h), interpolation=cv2.INTER_LINEAR)  # 放大到显示尺寸
+        weight = cv2.cvtColor(cv2.convertScaleAbs(level, alpha=alpha), cv2.COLOR_GRAY2BGR)  # 每个像素的不透明度（0-255）
+        premultiplied = cv2.multiply(cv2.applyColorMap(level, cv2.COLORMAP_JET), weight, scale=1.0 / 255)  # 伪彩色 × 不透明度
+        keep = np.subtract(255, weight, dtype=np.uint8)  # 背景保留比例（0-255）
+        self.overlay_cache = (version, shape, alpha, now, premultiplied, keep)  # 缓存
+        return premultiplied, keep
+
+    def blend(self, display, alpha=0.6):
+        """
+        把热力图以伪彩色半透明叠加到显示图像上（原地修改），热度越高越不透明；
+        每帧只做两次 uint8 运算，不分配整帧临时数组
+        """
+        premultiplied, keep = self._overlay(display.shape[:2], alpha)  # 缓存的叠加层
+        if premultiplied is None:  # 没有任何异常
+            return display
+        cv2.multiply(display, keep, dst=display, scale=1.0 / 255)  # 背景按保留比例变暗
+        cv2.add(display, premultiplied, dst=display)  # 加上伪彩色
+        return display
+
+    def save(self, path):
+        # 保存快照（先写临时文件再改名）
+        with self.lock:  # 加锁
+            grid = self.grid.copy()  # 网格副本
+            ref_time = self.ref_time if self.ref_time is not None else 0.0  # 基准时间
+            last_time = self.last_time if self.last_time is not None else 0.0  # 最近更新时间
+        tmp_path = path + ".tmp.npz"  # 临时文件
+        np.savez_compressed(tmp_path, grid=grid, ref_time=ref_time, last_time=last_time,
+                            frame_shape=self.frame_shape, cell_size=self.cell_size, tau=self.tau)  # 写入临时文件
+        os.replace(tmp_path, path)  # 原子改名
+
+    def restore(self, path):
+        """
+        从快照恢复，帧尺寸或网格参数不一致时忽略快照，返回是否成功恢复
+        """
+        try:
+            with np.load(path) as data:  # 读取快照
+                if (tuple(data['frame_shape']) != self.frame_shape or int(data['cell_size']) != self.cell_size
+                        or data['grid'].shape != self.grid_shape):  # 参数不一致
+                    return False
+                with self.lock:  # 加锁
+                    # 以快照中的最近更新时间为基准，之后的更新按经过的时间衰减
+                    self.grid[...] = data['grid'] * math.exp(-(float(data['last_time']) - float(data['ref_time'])) / self.tau)
+                    self.ref_time = self.last_time = float(data['last_time'])
+                    self.version += 1  # 叠加层需要重建
+            return True
+        except (OSError, KeyError, ValueError):  # 文件不存在或已损坏
+            return False
+
+
+class HeatmapStore:
+    """
+    按摄像头管理热力图，首次使用时从 root 目录恢复快照，save_all() 时写回
+    """
+
+    def __init__(self, root="heatmaps", cell_size=8, half_life=3600.0):
+        self.root = root  # 快照目录
+        self.cell_size = cell_size  # 网格单元像素数
+        self.half_life = half_life  # 半衰期（秒）
+        self.heatmaps = {}  # 摄像头ID -> 热力图
+        self.lock = threading.Lock()  # 多个检测线程共享时加锁
+
+    def _path(self, camera_id):
+        # 摄像头快照文件路径
+        safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in str(camera_id))  # 过滤文件名中的特殊字符
+        return os.path.join(self.root, f"{safe}.npz")
+
+    def get(self, camera_id, frame_shape):
+        # 获取摄像头的热力图，帧尺寸变化时重新创建
+        with self.lock:  # 加锁
+            heatmap = self.heatmaps.get(camera_id)  # 已有热力图
+            if heatmap is None or heatmap.frame_shape != tuple(frame_shape[:2]):  # 不存在或尺寸变化
+                heatmap = AnomalyHeatmap(frame_shape, self.cell_size, self.half_life)  # 创建热力图
+                heatmap.restore(self._path(camera_id))  # 尝试恢复快照
+                self.heatmaps[camera_id] = heatmap
+            return heatmap
+
+    def save(self, camera_id):
+        # 保存单个摄像头的快照
+        heatmap = self.heatmaps.get(camera_id)  # 获取热力图
+        if heatmap is None or heatmap.last_time is None:  # 没有数据
+            return
+        os.makedirs(self.root, exist_ok=True)  # 创建目录
+        heatmap.save(self._path(camera_id))  # 保存快照
+
+    def save_all(self):
+        # 保存所有摄像头的快照
+        for camera_id in list(self.heatmaps):
+            self.save(camera_id)
@@ -0,0 +1,269 @@
+# CPU推理自动调优：在样例视频上扫描线程数、输入尺寸、批大小和推理后端，保存本机最优配置
+# 用法: python autotune.py sample.mp4 --model best.pt --threads 1,2,4,8 --imgsz 320,480,640 --batch 1,4
+
+# 导入必要的库
+import os  # 导入操作系统模块，用于文件和路径操作
+import sys  # 导入系统模块，用于退出程序
+import json  # 导入JSON模块，用于保存配置
+import time  # 导入时间模块，用于计时
+import socket  # 导入socket模块，用于获取主机名
+import argparse  # 导入命令行参数解析模块
+import itertools  # 导入迭代工具，用于生成参数组合
+import multiprocessing  # 导入多进程模块，每组参数在独立进程中测量
+from datetime import datetime  # 导入日期时间模块，用于记录调优时间
+
+PROFILE_FILE = "autotune_profiles.json"  # 调优结果文件，按主机名保存
+DEFAULT_PROFILE = {  # 未调优时的默认配置（与原来直接调用 model(frame) 等价）
+    "intra_op_threads": None,  # torch算子内线程数，None表示使用torch默认值
+    "inter_op_threads": None,  # torch算子间线程数，None表示使用torch默认值
+    "imgsz": 640,  # 推理输入尺寸
+    "batch": 1,  # 批大小
+    "backend": "torch",  # 推理后端：torch / onnx / openvino
+    "model_path": None,  # 导出后端对应的模型文件，None表示使用原始模型
+    "source_model": None  # 导出模型对应的原始模型文件
+}
+
+
+def host_key():
+    # 当前机器的标识：主机名 + CPU核数
+    return f"{socket.gethostname()}-{os.cpu_count()}"
+
+
+def load_profile(profile_file=PROFILE_FILE):
+    """
+    读取本机的调优配置，没有时返回默认配置
+    """
+    profile = dict(DEFAULT_PROFILE)  # 复制默认配置
+    if os.path.exists(profile_file):  # 调优文件存在
+        try:
+            with open(profile_file, "r", encoding="utf-8") as f:  # 打开调优文件
+                profiles = json.load(f)  # 读取所有主机的配置
+            profile.update(profiles.get(host_key(), {}).get("settings", {}))  # 合并本机配置
+        except (OSError, ValueError):  # 文件损坏时使用默认配置
+            pass
+    if profile["model_path"] and not os.path.exists(profile["model_path"]):  # 导出的模型文件已被删除
+        profile["backend"], profile["model_path"] = "torch", None  # 回退到原始模型
+    return profile  # 返回配置
+
+
+def save_profile(settings, metrics, profile_file=PROFILE_FILE):
+    # 把本机的最优配置写入调优文件（先写临时文件再替换，避免写坏）
+    profiles = {}  # 所有主机的配置
+    if os.path.exists(profile_file):  # 文件已存在时保留其他主机的配置
+        with open(profile_file, "r", encoding="utf-8") as f:  # 打开调优文件
+            profiles = json.load(f)  # 读取配置
+    profiles[host_key()] = {  # 更新本机配置
+        "settings": settings,  # 最优参数
+        "metrics": metrics,  # 对应的测量结果
+        "tuned_at": datetime.now().isoformat(timespec="seconds")  # 调优时间
+    }
+    tmp_file = profile_file + ".tmp"  # 临时文件
+    with open(tmp_file, "w", encoding="utf-8") as f:  # 写入临时文件
+        json.dump(profiles, f, indent=4, ensure_ascii=False)  # 写入配置
+    os.replace(tmp_file, profile_file)  # 原子替换
+
+
+def apply_thread_settings(profile):
+    """
+    按配置设置torch线程数，需在推理开始前调用
+    """
+    import torch  # 导入torch
+    if profile.get("intra_op_threads"):  # 设置了算子内线程数
+        torch.set_num_threads(int(profile["intra_op_threads"]))  # 设置算子内线程数
+    if profile.get("inter_op_threads"):  # 设置了算子间线程数
+        try:
+            torch.set_interop_threads(int(profile["inter_op_threads"]))  # 设置算子间线程数
+        except RuntimeError:  # 进程内已经开始并行计算后不能再修改
+            pass
+
+
+def resolve_model_path(profile, model_path):
+    # 根据配置返回实际加载的模型文件
+    return profile.get("model_path") or model_path
+
+
+def profile_for_model(profile, model_path):
+    """
+    返回加载指定原始模型使用的配置：导出的模型只在由该模型导出时使用，否则改用原始torch后端
+    （旧配置没有记录原始模型时，按导出文件与原始模型同目录、同文件名判断）
+    """
+    exported = profile.get("model_path")  # 导出的模型文件
+    if not exported:  # 未导出，配置对任何模型都适用
+        return profile
+    source = profile.get("source_model")  # 调优时的原始模型
+    if source:  # 比较原始模型路径
+        derived = os.path.abspath(source) == os.path.abspath(model_path)
+    else:  # 按ultralytics的导出命名判断（best.onnx / best_openvino_model）
+        stem = os.path.splitext(os.path.abspath(model_path))[0]  # 原始模型去掉扩展名
+        exported_stem = os.path.splitext(os.path.abspath(exported))[0]  # 导出模型去掉扩展名
+        derived = exported_stem in (stem, stem + "_openvino_model")
+    if derived:  # 由该模型导出
+        return profile
+    return dict(profile, backend="torch", model_path=None, source_model=None)  # 不使用导出的模型
+
+
+def predict_kwargs(profile):
+    # 根据配置返回推理参数
+    return {"imgsz": int(profile.get("imgsz") or 640), "verbose": False}
+
+
+def export_backend(model_path, backend, imgsz):
+    """
+    把原始模型导出为指定后端格式，返回导出的模型路径
+    """
+    if backend == "torch":  # 原始后端无需导出
+        return model_path
+    from ultralytics import YOLO  # 导入YOLOv8模型
+    return YOLO(model_path).export(format=backend, imgsz=imgsz)  # 导出模型并返回路径
+
+
+def read_sample_frames(video_path, max_frames):
+    # 从样例视频中读取若干帧
+    import cv2  # 导入OpenCV库
+    cap = cv2.VideoCapture(video_path)  # 打开视频文件
+    frames = []  # 帧列表
+    while len(frames) < max_frames:  # 读取指定帧数
+        ret, frame = cap.read()  # 读取一帧
+        if not ret:  # 视频结束
+            break
+        frames.append(frame)  # 保存帧
+    cap.release()  # 释放视频捕获对象
+    return frames  # 返回帧列表
+
+
+def _benchmark_trial(video_path, model_path, settings, num_frames, warmup, queue):
+    """
+    子进程入口：按给定参数测量吞吐量和延迟（torch线程数只能在进程启动时设置，因此每组参数单独开进程）
+    """
+    try:
+        apply_thread_settings(settings)  # 设置线程数
+        from ultralytics import YOLO  # 导入YOLOv8模型
+        model = YOLO(resolve_model_path(settings, model_path))  # 加载模型
+        kwargs = predict_kwargs(settings)  # 推理参数
+        batch = int(settings["batch"])  # 批大小
+        frames = read_sample_frames(video_path, num_frames)  # 读取样例帧
+        if not frames:  # 没有读到帧
+            raise ValueError(f"无法读取样例视频: {video_path}")
+        batches = [frames[i:i + batch] for i in range(0, len(frames), batch)]  # 按批切分
+
+        for i in range(warmup):  # 预热
+            model(batches[i % len(batches)], **kwargs)  # 预热推理
+
+        latencies = []  # 每批延迟（毫秒）
+        start = time.perf_counter()  # 开始计时
+        for frames_batch in batches:  # 逐批推理
+            t0 = time.perf_counter()  # 批开始时间
+            model(frames_batch, **kwargs)  # 推理
+            latencies.append((time.perf_counter() - t0) * 1000)  # 记录批延迟
+        elapsed = time.perf_counter() - start  # 总耗时
+
+        latencies.sort()  # 排序用于计算分位数
+        queue.put({  # 返回测量结果
+            "fps": len(frames) / elapsed,  # 吞吐量（帧/秒）
+            # 批中的每一帧都要等整批推理完成才得到结果，因此批延迟就是每帧实际经历的推理延迟
+            "latency_ms": sum(latencies) / len(latencies),  # 平均批延迟
+            "p95_latency_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]  # 95分位批延迟
+        })
+    except Exception as e:  # 捕获异常，返回错误信息
+        queue.put({"error": str(e)})
+
+
+def run_trial(video_path, model_path, settings, num_frames=60, warmup=3, timeout=600):
+    # 在独立子进程中运行一组参数的测量
+    context = multiprocessing.get_context("spawn")  # 使用spawn方式，保证每个进程的torch状态干净
+    queue = context.Queue()  # 结果队列
+    process = context.Process(target=_benchmark_trial,
+                              args=(video_path, model_path, settings, num_frames, warmup, queue))  # 创建子进程
+    process.start()  # 启动子进程
+    try:
+        return queue.get(timeout=timeout)  # 等待结果
+    except Exception:  # 超时
+        process.terminate()  # 终止子进程
+        return {"error": "timeout"}
+    finally:
+        process.join()  # 回收子进程
+
+
+def autotune(video_path, model_path="best.pt", threads=None, interop=None, imgsz_list=(320, 480, 640),
+             batch_list=(1, 4), backends=("torch",), num_frames=60, max_latency_ms=None, log=print):
+    """
+    扫描参数组合，返回 (最优参数, 最优测量结果, 全部结果)
+
+    最优配置为吞吐量最高者；设置 max_latency_ms 时只在95分位批延迟不超过该值的配置中选择
+    （批中每一帧都要等整批推理完成，批越大吞吐量越高，但每帧等待的时间也越长）
+    """
+    cpu_count = os.cpu_count() or 1  # CPU核数
+    if threads is None:  # 默认的算子内线程数候选
+        threads = sorted({1, 2, 4, max(1, cpu_count // 2), cpu_count})
+    if interop is None:  # 默认的算子间线程数候选
+        interop = [1, 2]
+
+    exported = {}  # (后端, 输入尺寸) -> 导出的模型路径
+    trials = []  # 全部结果
+    for backend, imgsz in itertools.product(backends, imgsz_list):  # 导出各后端模型（导出模型与输入尺寸绑定）
+        exported[(backend, imgsz)] = export_backend(model_path, backend, imgsz)
+
+    for backend, imgsz, batch, intra, inter in itertools.product(backends, imgsz_list, batch_list, threads, interop):  # 遍历全部参数组合
+        settings = {  # 本组参数
+            "intra_op_threads": intra,
+            "inter_op_threads": inter,
+            "imgsz": imgsz,
+            "batch": batch,
+            "backend": backend,
+            "model_path": None if backend == "torch" else exported[(backend, imgsz)],
+            "source_model": None if backend == "torch" else os.path.abspath(model_path)
+        }
+        metrics = run_trial(video_path, model_path, settings, num_frames)  # 运行测量
+        trials.append((settings, metrics))  # 记录结果
+        if "error" in metrics:  # 测量失败
+            log(f"{backend} imgsz={imgsz} batch={batch} threads={intra}/{inter}: 失败 ({metrics['error']})")
+        else:  # 测量成功
+            log(f"{backend} imgsz={imgsz} batch={batch} threads={intra}/{inter}: "
+                f"{metrics['fps']:.1f} FPS, 延迟 {metrics['latency_ms']:.1f} ms (p95 {metrics['p95_latency_ms']:.1f} ms)")
+
+    candidates = [(s, m) for s, m in trials if "error" not in m and
+                  (max_latency_ms is None or m["p95_latency_ms"] <= max_latency_ms)]  # 满足约束的配置
+    if not candidates:  # 没有可用配置
+        return None, None, trials
+    best_settings, best_metrics = max(candidates, key=lambda sm: sm[1]["fps"])  # 选择吞吐量最高者
+    return best_settings, best_metrics, trials
+
+
+def _int_list(text):
+    # 解析逗号分隔的整数列表
+    return [int(x) for x in text.split(",") if x]
+
+
+def main():
+    # 命令行入口
+    parser = argparse.ArgumentParser(description="CPU推理参数自动调优")  # 创建参数解析器
+    parser.add_argument("video", help="样例视频路径")  # 样例视频
+    parser.add_argument("--model", default="best.pt", help="模型文件路径")  # 模型路径
+    parser.add_argument("--threads", type=_int_list, default=None, help="算子内线程数候选，如 1,2,4,8")  # 算子内线程数
+    parser.add_argument("--interop", type=_int_list, default=None, help="算子间线程数候选，如 1,2")  # 算子间线程数
+    parser.add_argument("--imgsz", type=_int_list, default=[320, 480, 640], help="输入尺寸候选")  # 输入尺寸
+    parser.add_argument("--batch", type=_int_list, default=[1, 4], help="批大小候选")  # 批大小
+    parser.add_argument("--backends", default="torch", help="推理后端候选，如 torch,onnx,openvino")  # 推理后端
+    parser.add_argument("--frames", type=int, default=60, help="每组参数测量的帧数")  # 测量帧数
+    parser.add_argument("--max-latency-ms", type=float, default=None, help="95分位批延迟上限（毫秒，即每帧等待推理结果的时间）")  # 延迟约束
+    parser.add_argument("--profile", default=PROFILE_FILE, help="调优结果文件")  # 结果文件
+    args = parser.parse_args()  # 解析参数
+
+    if not os.path.exists(args.model):  # 检查模型文件是否存在
+        print(f"模型文件 {args.model} 不存在!", file=sys.stderr)  # 输出错误信息
+        return 1
+
+    best_settings, best_metrics, _ = autotune(
+        args.video, args.model, args.threads, args.interop, args.imgsz, args.batch,
+        [b for b in args.backends.split(",") if b], args.frames, args.max_latency_ms)  # 运行调优
+    if best_settings is None:  # 没有可用配置
+        print("没有满足条件的配置", file=sys.stderr)  # 输出错误信息
+        return 1
+
+    save_profile(best_settings, best_metrics, args.profile)  # 保存最优配置
+    print(f"最优配置已保存到 {args.profile}: {best_settings}, {best_metrics['fps']:.1f} FPS")  # 输出结果
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
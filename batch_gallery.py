@@ -0,0 +1,314 @@
+# 文件夹批量检测：工作线程池逐张推理，结果以虚拟化缩略图网格显示，只解码可见项
+
+# 导入必要的库
+import os  # 导入操作系统模块，用于遍历文件夹
+import time  # 导入时间模块，用于控制结果批量发送的间隔
+import queue  # 导入队列模块，用于推理后端借还和结果收集
+from collections import OrderedDict  # 导入有序字典，用于缩略图LRU缓存
+import cv2  # 导入OpenCV库，用于图像读取和缩放
+from PyQt5.QtWidgets import QListView, QAbstractItemView  # 导入列表视图
+from PyQt5.QtGui import QImage, QColor  # 导入Qt图像类
+from PyQt5.QtCore import (Qt, QThread, QObject, QRunnable, QThreadPool, QSize, pyqtSignal,
+                          QAbstractListModel, QModelIndex, QSortFilterProxyModel)  # 导入Qt核心类
+from inference_backend import create_backend  # 导入推理后端（进程内模型或本地推理服务）
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')  # 支持的图像扩展名
+THUMBNAIL_SIZE = 160  # 缩略图边长
+ANOMALY_CLASS_ID = 0  # 异常类别ID
+
+# 自定义数据角色
+PathRole = Qt.UserRole + 1  # 图像路径
+HasAnomalyRole = Qt.UserRole + 2  # 是否包含异常
+MaxConfidenceRole = Qt.UserRole + 3  # 异常最高置信度
+RecordRole = Qt.UserRole + 4  # 完整结果记录
+
+
+def error_record(path, message=None):
+    """
+    读取或推理失败时的结果记录，message 为错误信息（None表示图像无法读取）
+    """
+    return {'path': path, 'error': True, 'message': message, 'size': (0, 0), 'detections': [],
+            'has_anomaly': False, 'max_confidence': 0.0}
+
+
+def list_images(folder):
+    """
+    按文件名顺序列出文件夹中的图像路径
+    """
+    with os.scandir(folder) as entries:  # 遍历文件夹
+        names = sorted(e.name for e in entries if e.is_file() and e.name.lower().endswith(IMAGE_EXTENSIONS))  # 过滤图像文件
+    return [os.path.join(folder, name) for name in names]  # 拼接完整路径
+
+
+class _FolderTask(QRunnable):
+    # 单张图像检测任务，结果放入检测线程的结果队列
+    def __init__(self, owner, index, path):
+        super().__init__()  # 调用父类初始化方法
+        self.owner = owner  # 所属文件夹检测线程
+        self.index = index  # 图像序号
+        self.path = path  # 图像路径
+
+    def run(self):
+        self.owner._run_task(self.index, self.path)  # 在工作线程中执行
+
+
+class FolderDetectionThread(QThread):
+    # 文件夹批量检测线程：把图像分发给工作线程池，结果按文件名顺序分批发送到界面
+    results_signal = pyqtSignal(list)  # 定义信号，传递一批结果记录
+    progress_signal = pyqtSignal(int)  # 定义信号，用于更新处理进度
+    finished_signal = pyqtSignal()  # 定义信号，用于通知处理完成
+
+    def __init__(self, folder, model_path, profile, server_address=None, workers=2):
+        super().__init__()  # 调用父类初始化方法
+        self.folder = folder  # 图像文件夹
+        self.model_path = model_path  # 模型路径
+        self.profile = profile  # 推理配置
+        self.server_address = server_address  # 推理服务地址
+        self.workers = max(1, workers)  # 工作线程数（每个线程一个推理后端）
+        self.running = True  # 设置运行标志
+        self.backends = queue.Queue()  # 空闲的推理后端，任务开始时借出，结束后归还
+        self.results = queue.Queue()  # 工作线程完成的 (序号, 结果记录)
+
+    def _detect(self, path, backend):
+        # 读取图像并推理，只返回小的结果记录，不保留图像数据
+        image = cv2.imread(path)  # 读取图像
+        if image is None:  # 读取失败
+            return error_record(path)
+        detections = backend.predict([image])[0]  # 推理并转换结果
+        anomalies = [d['confidence'] for d in detections if d['class_id'] == ANOMALY_CLASS_ID]  # 异常置信度
+        return {
+            'path': path,  # 图像路径
+            'error': False,  # 是否读取失败
+            'size': (image.shape[1], image.shape[0]),  # 原图宽高，用于缩放缩略图上的边界框
+            'detections': detections,  # 检测结果
+            'has_anomaly': bool(anomalies),  # 是否包含异常
+            'max_confidence': max(anomalies, default=0.0)  # 异常最高置信度
+        }
+
+    def _run_task(self, index, path):
+        # 工作线程：借出一个推理后端检测图像，推理出错时记录到该图像的结果中
+        backend = self.backends.get()  # 借出推理后端
+        try:
+            record = self._detect(path, backend)  # 检测
+        except Exception as e:  # 推理失败
+            record = error_record(path, str(e))
+        finally:
+            self.backends.put(backend)  # 归还推理后端
+        self.results.put((index, record))  # 交给检测线程
+
+    def run(self):
+        pending = []  # 尚未发送的结果
+        backends = []  # 本次检测使用的推理后端
+        try:
+            # 开始前加载全部推理后端（与图像、视频模式相同的后端工厂，支持推理服务），加载失败时只报告一次
+            try:
+                for _ in range(self.workers):
+                    backends.append(create_backend(self.model_path, self.profile, self.server_address))
+            except Exception as e:  # 模型文件无效或推理服务不可用
+                pending.append(error_record(self.folder, f"模型加载失败: {e}"))
+                return
+            for backend in backends:  # 放入空闲队列
+                self.backends.put(backend)
+            self._run(pending)  # 分发任务并收集结果
+        except Exception as e:  # 遍历文件夹失败等意外错误，记录后结束
+            pending.append(error_record(self.folder, str(e)))
+        finally:  # 无论是否出错都通知界面，恢复开始/停止按钮
+            for backend in backends:  # 释放推理后端（此时所有任务都已结束）
+                backend.close()
+            if pending:  # 发送剩余结果
+                self.results_signal.emit(pending)
+            if self.running:  # 正常完成
+                self.progress_signal.emit(100)  # 进度100%
+            self.finished_signal.emit()  # 发送处理完成信号
+
+    def _run(self, pending):
+        # 把图像分发给工作线程池，按文件名顺序收集结果，攒够一批后发送（剩余结果留在 pending 中）
+        paths = list_images(self.folder)  # 列出所有图像
+        total = len(paths)  # 图像总数
+        last_emit = time.monotonic()  # 上一次发送时间
+        max_in_flight = self.workers * 2  # 在途任务上限，保证内存占用与文件夹大小无关
+        pool = QThreadPool()  # 本次检测的工作线程池
+        pool.setMaxThreadCount(self.workers)  # 工作线程数
+        finished = {}  # 已完成但前面还有未完成图像的结果
+        next_submit = 0  # 下一个要提交的图像序号
+        next_done = 0  # 下一个要按顺序收集的图像序号
+        try:
+            while self.running and next_done < total:  # 还有任务未完成
+                while next_submit < total and next_submit - next_done < max_in_flight:  # 补充在途任务
+                    pool.start(_FolderTask(self, next_submit, paths[next_submit]))  # 提交任务
+                    next_submit += 1  # 下一个图像
+                index, record = self.results.get()  # 等待任一任务完成
+                finished[index] = record
+                while next_done in finished:  # 按顺序收集已就绪的结果
+                    pending.append(finished.pop(next_done))
+                    next_done += 1
+
+                if len(pending) >= 64 or time.monotonic() - last_emit > 0.2:  # 攒够一批或超过间隔时发送
+                    self.results_signal.emit(list(pending))  # 发送结果
+                    self.progress_signal.emit(int(next_done / total * 100))  # 发送进度
+                    pending.clear()  # 清空待发送列表
+                    last_emit = time.monotonic()  # 记录发送时间
+        finally:
+            pool.clear()  # 停止时取消尚未开始的任务
+            pool.waitForDone()  # 等待正在推理的任务，之后才能释放推理后端
+
+    def stop(self):
+        self.running = False  # 设置运行标志为False，停止提交新任务
+        self.wait()  # 等待线程结束
+
+
+class _ThumbnailSignals(QObject):
+    # QRunnable不是QObject，借助该对象把解码结果发回界面线程
+    loaded = pyqtSignal(str, QImage)  # 图像路径和缩略图（解码失败时为空图像）
+
+
+class _ThumbnailTask(QRunnable):
+    # 缩略图解码任务：以降采样方式解码，缩放后绘制边界框
+    def __init__(self, record, signals):
+        super().__init__()  # 调用父类初始化方法
+        self.record = record  # 结果记录
+        self.signals = signals  # 信号对象
+
+    def run(self):
+        path = self.record['path']  # 图像路径
+        image = cv2.imread(path, cv2.IMREAD_REDUCED_COLOR_4)  # 以1/4分辨率解码，JPEG可直接在解码阶段降采样
+        if image is None:  # 读取失败（如文件在检测后被删除），发送空图像让界面清除解码中标记
+            self.signals.loaded.emit(path, QImage())
+            return
+        h, w = image.shape[:2]  # 降采样后尺寸
+        scale = THUMBNAIL_SIZE / max(w, h)  # 缩放到缩略图尺寸
+        thumb = cv2.resize(image, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)  # 缩放
+        orig_w = self.record['size'][0] or w  # 原图宽度
+        box_scale = thumb.shape[1] / orig_w  # 原图坐标到缩略图坐标的比例
+        for d in self.record['detections']:  # 绘制边界框
+            x1, y1, x2, y2 = (int(v * box_scale) for v in d['box'])  # 缩放坐标
+            color = (0, 0, 255) if d['class_id'] == ANOMALY_CLASS_ID else (0, 255, 0)  # 异常为红色，其他为绿色
+            cv2.rectangle(thumb, (x1, y1), (x2, y2), color, 1)  # 绘制矩形
+        qimage = QImage(thumb.data, thumb.shape[1], thumb.shape[0], thumb.strides[0], QImage.Format_BGR888).copy()  # 转换为QImage（复制以脱离numpy缓冲区）
+        self.signals.loaded.emit(path, qimage)  # 发送到界面线程
+
+
+class GalleryModel(QAbstractListModel):
+    """
+    检测结果列表模型：只保存小的结果记录，缩略图按需异步解码并放入有限大小的LRU缓存
+    """
+
+    def __init__(self, parent=None, cache_size=512):
+        super().__init__(parent)  # 调用父类初始化方法
+        self.records = []  # 结果记录列表
+        self.row_of = {}  # 图像路径 -> 行号
+        self.cache = OrderedDict()  # 路径 -> 缩略图 的LRU缓存
+        self.cache_size = cache_size  # 缓存上限
+        self.loading = set()  # 正在解码的路径
+        self.pool = QThreadPool(self)  # 缩略图解码线程池
+        self.pool.setMaxThreadCount(2)  # 解码线程数
+        self.request_counter = 0  # 请求计数，用作优先级，最近请求（当前可见项）优先解码
+        self.signals = _ThumbnailSignals()  # 信号对象
+        self.signals.loaded.connect(self.on_thumbnail_loaded)  # 连接解码完成信号
+        self.placeholder = QImage(THUMBNAIL_SIZE, THUMBNAIL_SIZE, QImage.Format_RGB888)  # 占位图
+        self.placeholder.fill(QColor(44, 62, 80))  # 填充背景色
+
+    def rowCount(self, parent=QModelIndex()):
+        # 行数
+        return 0 if parent.isValid() else len(self.records)
+
+    def data(self, index, role=Qt.DisplayRole):
+        # 返回指定角色的数据，视图只会为可见项请求DecorationRole
+        if not index.isValid():  # 无效索引
+            return None
+        record = self.records[index.row()]  # 获取记录
+        if role == Qt.DisplayRole:  # 显示文本
+            name = os.path.basename(record['path'])  # 文件名
+            return f"[异常] {name}" if record['has_anomaly'] else name
+        if role == Qt.DecorationRole:  # 缩略图
+            return self.thumbnail(record)
+        if role == Qt.ForegroundRole:  # 文字颜色
+            return QColor(183, 28, 28) if record['has_anomaly'] else None
+        if role == PathRole:  # 图像路径
+            return record['path']
+        if role == HasAnomalyRole:  # 是否包含异常
+            return record['has_anomaly']
+        if role == MaxConfidenceRole:  # 异常最高置信度
+            return record['max_confidence']
+        if role == RecordRole:  # 完整记录
+            return record
+        return None
+
+    def thumbnail(self, record):
+        # 返回缓存的缩略图，未命中时提交异步解码并先返回占位图
+        path = record['path']  # 图像路径
+        image = self.cache.get(path)  # 查询缓存
+        if image is not None:  # 命中缓存
+            self.cache.move_to_end(path)  # 更新LRU顺序
+            return image
+        if path not in self.loading and not record['error']:  # 尚未提交解码
+            self.loading.add(path)  # 标记为解码中
+            self.request_counter += 1  # 请求计数加1
+            self.pool.start(_ThumbnailTask(record, self.signals), self.request_counter)  # 提交任务，越新的请求优先级越高
+        return self.placeholder  # 返回占位图
+
+    def on_thumbnail_loaded(self, path, image):
+        # 缩略图解码完成：放入缓存并通知视图刷新该项
+        self.loading.discard(path)  # 取消解码中标记
+        self.cache[path] = self.placeholder if image.isNull() else image  # 放入缓存（解码失败时缓存占位图，避免视图刷新时反复解码）
+        while len(self.cache) > self.cache_size:  # 超过缓存上限
+            self.cache.popitem(last=False)  # 淘汰最久未使用的缩略图
+        row = self.row_of.get(path)  # 查找行号
+        if row is not None:  # 该项仍在模型中
+            index = self.index(row)  # 获取索引
+            self.dataChanged.emit(index, index, [Qt.DecorationRole])  # 通知视图刷新
+
+    def append_records(self, records):
+        # 追加一批结果记录
+        if not records:  # 空列表
+            return
+        first = len(self.records)  # 起始行号
+        self.beginInsertRows(QModelIndex(), first, first + len(records) - 1)  # 通知视图即将插入
+        for offset, record in enumerate(records):  # 遍历记录
+            self.row_of[record['path']] = first + offset  # 记录行号
+        self.records.extend(records)  # 追加记录
+        self.endInsertRows()  # 通知视图插入完成
+
+    def clear(self):
+        # 清空所有记录和缓存
+        self.beginResetModel()  # 通知视图即将重置
+        self.records = []  # 清空记录
+        self.row_of = {}  # 清空行号索引
+        self.cache.clear()  # 清空缓存
+        self.loading.clear()  # 清空解码中标记
+        self.pool.clear()  # 取消尚未开始的解码任务
+        self.endResetModel()  # 通知视图重置完成
+
+
+class GalleryFilterModel(QSortFilterProxyModel):
+    # 排序和筛选代理：支持“仅显示异常”筛选和按文件名/置信度排序
+    def __init__(self, parent=None):
+        super().__init__(parent)  # 调用父类初始化方法
+        self.anomaly_only = False  # 是否仅显示异常
+
+    def set_anomaly_only(self, enabled):
+        # 设置是否仅显示包含异常的图像
+        self.anomaly_only = enabled  # 保存设置
+        self.invalidateFilter()  # 重新筛选
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        # 筛选条件
+        if not self.anomaly_only:  # 不筛选
+            return True
+        return self.sourceModel().records[source_row]['has_anomaly']  # 只保留包含异常的图像
+
+
+class GalleryView(QListView):
+    # 虚拟化缩略图网格：统一项尺寸 + 分批布局，视图只为可见项请求数据
+    def __init__(self, parent=None):
+        super().__init__(parent)  # 调用父类初始化方法
+        self.setViewMode(QListView.IconMode)  # 图标模式（网格）
+        self.setResizeMode(QListView.Adjust)  # 窗口大小变化时重新排列
+        self.setMovement(QListView.Static)  # 禁止拖动
+        self.setUniformItemSizes(True)  # 统一项尺寸，避免为计算布局而请求所有项的数据
+        self.setLayoutMode(QListView.Batched)  # 分批布局，大量项时不阻塞界面
+        self.setBatchSize(200)  # 每批布局的项数
+        self.setIconSize(QSize(THUMBNAIL_SIZE, THUMBNAIL_SIZE))  # 缩略图尺寸
+        self.setGridSize(QSize(THUMBNAIL_SIZE + 20, THUMBNAIL_SIZE + 40))  # 网格尺寸
+        self.setSelectionMode(QAbstractItemView.SingleSelection)  # 单选
+        self.setStyleSheet("background-color: #2c3e50; color: white; border-radius: 5px;")  # 设置样式
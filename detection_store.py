@@ -0,0 +1,228 @@
+# 检测记录与报警事件数据库：检测线程批量写入SQLite，按摄像头、时间、类别和置信度建立索引，支持跨视频的范围查询
+
+# 导入必要的库
+import time  # 导入时间模块，用于批量提交的时间间隔
+import queue  # 导入队列模块，用于有界写入队列
+import sqlite3  # 导入SQLite，用于持久化存储
+import threading  # 导入线程模块，用于写入线程、线程本地连接和统计加锁
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS detections ("
+    " id INTEGER PRIMARY KEY,"
+    " camera TEXT NOT NULL,"
+    " ts REAL NOT NULL,"
+    " frame INTEGER, video_time REAL,"
+    " class_id INTEGER NOT NULL,"
+    " confidence REAL NOT NULL,"
+    " x1 INTEGER, y1 INTEGER, x2 INTEGER, y2 INTEGER)",
+    "CREATE TABLE IF NOT EXISTS events ("
+    " id INTEGER PRIMARY KEY,"
+    " camera TEXT NOT NULL,"
+    " event_id INTEGER, track_id INTEGER,"
+    " class_id INTEGER NOT NULL,"
+    " start_ts REAL NOT NULL, end_ts REAL NOT NULL,"
+    " start_frame INTEGER, end_frame INTEGER,"
+    " mean_confidence REAL, peak_confidence REAL NOT NULL,"
+    " x1 INTEGER, y1 INTEGER, x2 INTEGER, y2 INTEGER)",
+    # 按摄像头查询时间段（摄像头 + 类别 + 时间，置信度放在索引中避免回表过滤）
+    "CREATE INDEX IF NOT EXISTS idx_detections_camera ON detections (camera, class_id, ts, confidence)",
+    # 不限摄像头时按时间段查询
+    "CREATE INDEX IF NOT EXISTS idx_detections_ts ON detections (ts, class_id, confidence)",
+    # 不限时间时按置信度查询（如"所有置信度 0.9 以上的异常"）
+    "CREATE INDEX IF NOT EXISTS idx_detections_confidence ON detections (class_id, confidence, ts)",
+    "CREATE INDEX IF NOT EXISTS idx_events_camera ON events (camera, class_id, start_ts, peak_confidence)",
+    "CREATE INDEX IF NOT EXISTS idx_events_ts ON events (start_ts, class_id, peak_confidence)",
+)  # 表结构和索引
+
+DETECTION_COLUMNS = ('camera', 'ts', 'frame', 'video_time', 'class_id', 'confidence', 'box')  # 检测记录字段
+EVENT_COLUMNS = ('camera', 'event_id', 'track_id', 'class_id', 'start_ts', 'end_ts', 'start_frame', 'end_frame',
+                 'mean_confidence', 'peak_confidence', 'box')  # 事件记录字段
+
+
+class DetectionStore:
+    """
+    检测记录与报警事件存储
+
+    add_detections() / add_event() 在检测线程中调用，只把行放入有界队列，从不阻塞；队列满时丢弃并计数。
+    写入线程把队列中的行合并到一个事务中用 executemany 批量插入。查询在调用线程使用自己的连接，
+    WAL 模式下与写入互不阻塞。
+    """
+
+    def __init__(self, db_path="detections.db", queue_size=256, batch_rows=2000, flush_interval=0.5):
+        self.db_path = db_path  # 数据库文件路径
+        self.batch_rows = batch_rows  # 单个事务最多插入的检测行数
+        self.flush_interval = flush_interval  # 最长提交间隔（秒）
+        self._local = threading.local()  # 每个线程独立的数据库连接
+        conn = self._connect()  # 获取连接
+        with conn:  # 在事务中执行
+            for statement in SCHEMA:  # 创建表和索引
+                conn.execute(statement)
+        self.queue = queue.Queue(maxsize=queue_size)  # 有界写入队列，每项为一帧的检测行或一个事件
+        self.stats_lock = threading.Lock()  # 统计信息锁
+        self.stats = {"detections": 0, "events": 0, "dropped": 0, "failed": 0}  # 统计信息
+        self.thread = threading.Thread(target=self._worker, daemon=True)  # 写入线程
+        self.thread.start()  # 启动写入线程
+
+    def _connect(self):
+        # 获取当前线程的数据库连接
+        conn = getattr(self._local, "conn", None)  # 尝试获取已有连接
+        if conn is None:  # 当前线程还没有连接
+            conn = sqlite3.connect(self.db_path, timeout=10)  # 打开数据库
+            conn.execute("PRAGMA journal_mode=WAL")  # 启用WAL模式，写入不阻塞查询
+            conn.execute("PRAGMA synchronous=NORMAL")  # WAL模式下兼顾安全与性能
+            self._local.conn = conn  # 保存到线程本地
+        return conn
+
+    def _count(self, key, n=1):
+        # 更新统计信息
+        with self.stats_lock:  # 加锁
+            self.stats[key] += n
+
+    def _put(self, item):
+        # 放入写入队列，队列满时丢弃
+        try:
+            self.queue.put_nowait(item)  # 不阻塞
+            return True
+        except queue.Full:  # 写入跟不上
+            self._count("dropped")  # 计数
+            return False
+
+    def add_detections(self, camera, detections, frame_index=None, video_time=None, timestamp=None):
+        """
+        记录一帧的检测结果，返回是否被接受
+        """
+        if not detections:  # 没有检测结果
+            return True
+        ts = time.time() if timestamp is None else timestamp  # 墙钟时间戳
+        rows = [(camera, ts, frame_index, video_time, int(d['class_id']), float(d['confidence']),
+                 *(int(v) for v in d['box'])) for d in detections]  # 转换为数据库行
+        return self._put(("detections", rows))
+
+    def add_event(self, camera, event):
+        """
+        记录一个已结束的报警事件（AlertEngine 的 end 事件），返回是否被接受
+        """
+        end_ts = event['timestamp']  # 结束时的墙钟时间
+        start_ts = event.get('start_timestamp') or end_ts  # start 事件发出时的墙钟时间（duration 是视频时间，不能相减）
+        row = (camera, event['event_id'], event['track_id'], int(event['class_id']),
+               start_ts, end_ts, event['start_frame'], event['frame_index'],
+               event['mean_confidence'], event['peak_confidence'], *(int(v) for v in event['box']))  # 转换为数据库行
+        return self._put(("events", [row]))
+
+    def _worker(self):
+        # 写入线程：攒够一批或超过提交间隔后在一个事务中批量插入
+        conn = self._connect()  # 写入线程的连接
+        closing = False  # 是否收到退出标记
+        while not closing:  # 持续处理
+            try:
+                item = self.queue.get(timeout=1.0)  # 等待第一项
+            except queue.Empty:  # 空闲
+                continue
+            detections, events = [], []  # 本批要插入的行
+            deadline = time.monotonic() + self.flush_interval  # 本批截止时间
+            while True:  # 收集一批
+                if item is None:  # 退出标记
+                    closing = True
+                    break
+                (detections if item[0] == "detections" else events).extend(item[1])  # 按表归类
+                if len(detections) >= self.batch_rows:  # 本批已满
+                    break
+                try:
+                    item = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))  # 继续收集
+                except queue.Empty:  # 超过提交间隔
+                    break
+            try:
+                with conn:  # 一个事务
+                    conn.executemany(
+                        "INSERT INTO detections (camera, ts, frame, video_time, class_id, confidence,"
+                        " x1, y1, x2, y2) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", detections)  # 批量插入检测记录
+                    conn.executemany(
+                        "INSERT INTO events (camera, event_id, track_id, class_id, start_ts, end_ts,"
+                        " start_frame, end_frame, mean_confidence, peak_confidence, x1, y1, x2, y2)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", events)  # 批量插入事件
+                self._count("detections", len(detections))  # 计数
+                self._count("events", len(events))
+            except sqlite3.Error:  # 写入失败（如磁盘已满），丢弃本批
+                self._count("failed", len(detections) + len(events))
+        conn.close()  # 关闭写入线程的连接
+
+    @staticmethod
+    def _where(time_column, confidence_column, start, end, cameras, class_id, min_confidence):
+        # 生成查询条件和参数
+        clauses, params = [], []  # 条件和参数
+        if cameras:  # 指定摄像头
+            clauses.append(f"camera IN ({', '.join('?' * len(cameras))})")
+            params.extend(cameras)
+        if class_id is not None:  # 指定类别
+            clauses.append("class_id = ?")
+            params.append(int(class_id))
+        if start is not None:  # 开始时间
+            clauses.append(f"{time_column} >= ?")
+            params.append(float(start))
+        if end is not None:  # 结束时间
+            clauses.append(f"{time_column} < ?")
+            params.append(float(end))
+        if min_confidence is not None:  # 最低置信度
+            clauses.append(f"{confidence_column} >= ?")
+            params.append(float(min_confidence))
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def query_detections(self, start=None, end=None, cameras=None, class_id=None, min_confidence=None,
+                         limit=1000):
+        """
+        查询检测记录，按时间排序；start/end 为墙钟时间戳（秒），cameras 为摄像头ID列表
+        """
+        where, params = self._where("ts", "confidence", start, end, cameras, class_id, min_confidence)  # 查询条件
+        # 明确指定索引：没有统计信息时SQLite常因置信度范围条件选中置信度索引，再对整个类别排序
+        if cameras:  # 指定摄像头：摄像头 + 类别 + 时间范围
+            index = "idx_detections_camera"
+        elif start is None and end is None and class_id is not None and min_confidence is not None:  # 只按类别和置信度
+            index = "idx_detections_confidence"
+        else:  # 按时间范围（或按时间顺序扫描直到凑够 limit 条）
+            index = "idx_detections_ts"
+        rows = self._connect().execute(
+            "SELECT camera, ts, frame, video_time, class_id, confidence, x1, y1, x2, y2 FROM detections"
+            f" INDEXED BY {index}" + where + " ORDER BY ts LIMIT ?", params + [int(limit)]).fetchall()  # 执行查询
+        return [dict(zip(DETECTION_COLUMNS, row[:6] + (row[6:],))) for row in rows]  # 转换为字典
+
+    def query_events(self, start=None, end=None, cameras=None, class_id=None, min_confidence=None, limit=1000):
+        """
+        查询报警事件（按开始时间过滤和排序，置信度条件作用于峰值置信度）
+        """
+        where, params = self._where("start_ts", "peak_confidence", start, end, cameras, class_id,
+                                    min_confidence)  # 查询条件
+        index = "idx_events_camera" if cameras else "idx_events_ts"  # 指定摄像头时按摄像头索引，否则按时间索引
+        rows = self._connect().execute(
+            "SELECT camera, event_id, track_id, class_id, start_ts, end_ts, start_frame, end_frame,"
+            " mean_confidence, peak_confidence, x1, y1, x2, y2 FROM events"
+            f" INDEXED BY {index}" + where + " ORDER BY start_ts LIMIT ?", params + [int(limit)]).fetchall()  # 执行查询
+        return [dict(zip(EVENT_COLUMNS, row[:10] + (row[10:],))) for row in rows]  # 转换为字典
+
+    def cameras(self):
+        # 已记录的摄像头ID列表（沿摄像头索引逐个查找下一个摄像头，每次只做一次索引定位，不遍历全表）
+        conn = self._connect()  # 获取连接
+        cameras = []  # 摄像头ID列表
+        camera = conn.execute("SELECT MIN(camera) FROM detections").fetchone()[0]  # 第一个摄像头
+        while camera is not None:  # 还有摄像头
+            cameras.append(camera)
+            camera = conn.execute("SELECT MIN(camera) FROM detections WHERE camera > ?", (camera,)).fetchone()[0]  # 下一个摄像头
+        return cameras
+
+    def store_stats(self):
+        # 返回统计信息快照
+        with self.stats_lock:  # 加锁
+            stats = dict(self.stats)  # 复制统计信息
+        stats["queued"] = self.queue.qsize()  # 排队中的写入项
+        return stats
+
+    def close(self, timeout=5.0):
+        # 写完队列中剩余的记录并停止写入线程
+        try:
+            self.queue.put(None, timeout=timeout)  # 退出标记
+        except queue.Full:  # 队列一直满，放弃剩余记录
+            return
+        self.thread.join(timeout)  # 等待写入线程退出
+        conn = getattr(self._local, "conn", None)  # 当前线程的查询连接
+        if conn is not None:  # 存在连接
+            conn.close()  # 关闭连接
+            self._local.conn = None  # 清除引用
@@ -0,0 +1,20 @@
+# 检测结果处理工具函数，供界面线程和离线分析进程共用
+
+
+def extract_detections(results):
+    """
+    把YOLOv8推理结果转换为检测结果字典列表：{'box', 'confidence', 'class_id'}
+    """
+    detections = []  # 初始化检测结果列表
+    for result in results:  # 遍历检测结果
+        boxes = result.boxes.cpu().numpy()  # 获取边界框数据并转换为numpy数组
+        for box in boxes:  # 遍历每个边界框
+            x1, y1, x2, y2 = map(int, box.xyxy[0])  # 提取边界框坐标并转换为整数
+            confidence = float(box.conf[0])  # 提取置信度并转换为浮点数
+            class_id = int(box.cls[0])  # 提取类别ID并转换为整数
+            detections.append({  # 将检测结果添加到列表中
+                'box': (x1, y1, x2, y2),  # 边界框坐标
+                'confidence': confidence,  # 置信度
+                'class_id': class_id  # 类别ID
+            })
+    return detections  # 返回检测结果列表
@@ -0,0 +1,297 @@
+# 速度/精度评估：在本地YOLO格式标注数据集上逐个运行推理配置（后端、输入尺寸、关键帧间隔、量化），
+# 记录 precision/recall/mAP50 和实测延迟、吞吐量，输出CSV和Pareto曲线图
+# 用法: python evaluate_pareto.py --data data.yaml --imgsz 320,480,640 --stride 1,2,4 --backends torch,onnx,openvino:int8
+
+# 导入必要的库
+import os  # 导入操作系统模块，用于文件和路径操作
+import sys  # 导入系统模块，用于退出程序
+import csv  # 导入CSV模块，用于输出结果
+import time  # 导入时间模块，用于计时
+import argparse  # 导入命令行参数解析模块
+import itertools  # 导入迭代工具，用于生成配置组合
+import numpy as np  # 导入NumPy库，用于指标计算
+import cv2  # 导入OpenCV库，用于读取图像
+from detection_utils import extract_detections  # 导入检测结果转换函数
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')  # 支持的图像扩展名
+CSV_FIELDS = ['config', 'backend', 'quant', 'imgsz', 'stride', 'images', 'precision', 'recall', 'mAP50',
+              'latency_ms', 'p95_latency_ms', 'fps', 'pareto']  # CSV列
+
+
+def resolve_dataset(data):
+    """
+    解析数据集：支持 data.yaml（使用 val 划分）、包含 images/ 和 labels/ 的目录、或图像目录本身
+    返回 (图像路径列表, 图像路径 -> 标注文件路径 的函数)
+    """
+    if data.endswith(('.yaml', '.yml')):  # data.yaml
+        import yaml  # 导入YAML解析库（ultralytics依赖）
+        with open(data, "r", encoding="utf-8") as f:  # 打开配置文件
+            cfg = yaml.safe_load(f)  # 解析配置
+        root = cfg.get("path") or os.path.dirname(os.path.abspath(data))  # 数据集根目录
+        if not os.path.isabs(root):  # 相对路径相对于配置文件
+            root = os.path.join(os.path.dirname(os.path.abspath(data)), root)
+        image_dir = os.path.join(root, cfg.get("val") or cfg.get("test"))  # 验证集图像目录
+    elif os.path.isdir(os.path.join(data, "images")):  # 包含 images/ 子目录
+        image_dir = os.path.join(data, "images")
+    else:  # 图像目录本身
+        image_dir = data
+
+    images = []  # 图像路径列表
+    for dirpath, _, filenames in os.walk(image_dir):  # 递归遍历图像目录
+        images.extend(os.path.join(dirpath, n) for n in filenames if n.lower().endswith(IMAGE_EXTENSIONS))
+    images.sort()  # 按路径排序，关键帧间隔评估时视为连续帧
+
+    def label_path(image_path):
+        # YOLO约定：把路径中的 images 目录替换为 labels，扩展名替换为 .txt
+        parts = image_path.split(os.sep)  # 拆分路径
+        for i in range(len(parts) - 1, -1, -1):  # 替换最后一个 images 目录
+            if parts[i] == "images":
+                parts[i] = "labels"
+                break
+        return os.path.splitext(os.sep.join(parts))[0] + ".txt"
+
+    return images, label_path
+
+
+def load_labels(path, width, height):
+    """
+    读取YOLO格式标注（class cx cy w h，归一化坐标），返回 [(class_id, (x1, y1, x2, y2)), ...]
+    """
+    labels = []  # 标注列表
+    if not os.path.exists(path):  # 没有标注文件表示没有目标
+        return labels
+    with open(path, "r") as f:  # 打开标注文件
+        for line in f:  # 逐行读取
+            values = line.split()  # 拆分字段
+            if len(values) < 5:  # 跳过无效行
+                continue
+            cls, cx, cy, w, h = int(values[0]), *map(float, values[1:5])  # 解析字段
+            labels.append((cls, ((cx - w / 2) * width, (cy - h / 2) * height,
+                                 (cx + w / 2) * width, (cy + h / 2) * height)))  # 转换为像素坐标
+    return labels
+
+
+def box_iou_matrix(a, b):
+    # 计算两组 (x1, y1, x2, y2) 边界框的IoU矩阵
+    a = np.asarray(a, dtype=np.float64).reshape(-1, 4)  # 转换为数组
+    b = np.asarray(b, dtype=np.float64).reshape(-1, 4)  # 转换为数组
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])  # 交集左上角
+    rb = np.minimum(a[:, None, 2:], b[None, :, 2:])  # 交集右下角
+    inter = np.clip(rb - lt, 0, None).prod(axis=2)  # 交集面积
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])  # a的面积
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])  # b的面积
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)  # IoU
+
+
+def match_predictions(predictions, labels, iou_threshold=0.5):
+    """
+    单张图像内按置信度从高到低贪心匹配同类别的标注，返回每个预测是否为真阳性
+    """
+    tp = np.zeros(len(predictions), dtype=bool)  # 真阳性标记
+    if not predictions or not labels:  # 没有预测或没有标注
+        return tp
+    ious = box_iou_matrix([p['box'] for p in predictions], [l[1] for l in labels])  # IoU矩阵
+    used = np.zeros(len(labels), dtype=bool)  # 已匹配的标注
+    for i in np.argsort([-p['confidence'] for p in predictions]):  # 置信度从高到低
+        for j in np.argsort(-ious[i]):  # IoU从高到低
+            if ious[i, j] < iou_threshold:  # 剩余标注IoU不足
+                break
+            if not used[j] and labels[j][0] == predictions[i]['class_id']:  # 同类别且未被匹配
+                used[j] = True  # 标记已匹配
+                tp[i] = True  # 真阳性
+                break
+    return tp
+
+
+def average_precision(tp, confidence, num_labels):
+    # 计算单个类别的AP（101点插值，与COCO一致）
+    if num_labels == 0 or len(tp) == 0:  # 没有标注或没有预测
+        return 0.0
+    order = np.argsort(-np.asarray(confidence))  # 按置信度降序
+    tp = np.asarray(tp, dtype=np.float64)[order]  # 排序后的真阳性
+    tp_cum = np.cumsum(tp)  # 累计真阳性
+    fp_cum = np.cumsum(1.0 - tp)  # 累计假阳性
+    recall = tp_cum / num_labels  # 召回率曲线
+    precision = tp_cum / np.maximum(tp_cum + fp_cum, 1e-9)  # 精确率曲线
+    envelope = np.flip(np.maximum.accumulate(np.flip(precision)))  # 精确率包络：召回率不低于该点时的最大精确率
+    x = np.linspace(0, 1, 101)  # 101个召回率采样点
+    idx = np.searchsorted(recall, x, side="left")  # 每个采样点首次达到的位置
+    sampled = np.where(idx < len(recall), envelope[np.minimum(idx, len(recall) - 1)], 0.0)  # 达不到的召回率记为0
+    return float(sampled.mean())  # 各采样点精确率的平均值即为AP
+
+
+def compute_metrics(per_image, conf_threshold=0.25, iou_threshold=0.5):
+    """
+    per_image: [(预测列表, 标注列表), ...]，返回 (precision, recall, mAP50)
+    precision/recall 在 conf_threshold 下计算，mAP50 使用全部预测
+    """
+    tps, confs, classes = [], [], []  # 所有预测的真阳性标记、置信度和类别
+    label_counts = {}  # 类别 -> 标注数
+    for predictions, labels in per_image:  # 逐张图像
+        tps.append(match_predictions(predictions, labels, iou_threshold))  # 匹配
+        confs.extend(p['confidence'] for p in predictions)  # 置信度
+        classes.extend(p['class_id'] for p in predictions)  # 类别
+        for cls, _ in labels:  # 统计标注数
+            label_counts[cls] = label_counts.get(cls, 0) + 1
+    tp = np.concatenate(tps) if tps else np.zeros(0, dtype=bool)  # 合并真阳性标记
+    confs = np.asarray(confs, dtype=np.float64)  # 置信度数组
+    classes = np.asarray(classes, dtype=np.int64)  # 类别数组
+
+    aps = [average_precision(tp[classes == c], confs[classes == c], n) for c, n in label_counts.items()]  # 每类AP
+    keep = confs >= conf_threshold  # 阈值以上的预测
+    total_labels = sum(label_counts.values())  # 标注总数
+    precision = float(tp[keep].sum() / max(keep.sum(), 1))  # 精确率
+    recall = float(tp[keep].sum() / max(total_labels, 1))  # 召回率
+    return precision, recall, float(np.mean(aps)) if aps else 0.0
+
+
+def pareto_front(rows):
+    # 标记Pareto最优配置：不存在吞吐量和mAP50都不差且至少一项更好的其他配置
+    for r in rows:  # 逐个配置
+        r['pareto'] = not any(
+            o is not r and o['fps'] >= r['fps'] and o['mAP50'] >= r['mAP50'] and
+            (o['fps'] > r['fps'] or o['mAP50'] > r['mAP50']) for o in rows)
+    return rows
+
+
+def evaluate_config(model, images, label_path, imgsz, stride, conf_threshold=0.25, warmup=3):
+    """
+    评估一个配置：按顺序处理图像，每 stride 张推理一次，其余复用上一次的预测（模拟关键帧间隔）
+    """
+    per_image = []  # (预测, 标注)
+    latencies = []  # 推理延迟（毫秒）
+    last_predictions = []  # 上一次推理的预测
+
+    if images:  # 预热
+        first = cv2.imread(images[0])  # 读取第一张图像
+        for _ in range(warmup):
+            model(first, imgsz=imgsz, conf=0.001, verbose=False)
+
+    for i, path in enumerate(images):  # 逐张处理
+        image = cv2.imread(path)  # 读取图像（不计入延迟）
+        if image is None:  # 读取失败
+            continue
+        h, w = image.shape[:2]  # 图像尺寸
+        if i % stride == 0:  # 关键帧，执行推理
+            t0 = time.perf_counter()  # 开始计时
+            results = model(image, imgsz=imgsz, conf=0.001, verbose=False)  # 低阈值推理，用于计算mAP
+            latencies.append((time.perf_counter() - t0) * 1000)  # 记录延迟
+            last_predictions = extract_detections(results)  # 转换结果
+        per_image.append((last_predictions, load_labels(label_path(path), w, h)))  # 记录预测和标注
+
+    precision, recall, map50 = compute_metrics(per_image, conf_threshold)  # 计算精度指标
+    latencies.sort()  # 排序用于分位数
+    total_ms = sum(latencies)  # 总推理耗时
+    return {
+        'images': len(per_image),  # 图像数
+        'precision': precision,  # 精确率
+        'recall': recall,  # 召回率
+        'mAP50': map50,  # mAP50
+        'latency_ms': total_ms / max(len(latencies), 1),  # 平均单次推理延迟
+        'p95_latency_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else 0.0,  # 95分位延迟
+        'fps': len(per_image) / (total_ms / 1000) if total_ms > 0 else 0.0  # 有效吞吐量（含跳帧）
+    }
+
+
+def load_model_for(model_path, backend, quant, imgsz, data_yaml=None):
+    # 按后端和量化方式准备模型（导出格式需要先导出）
+    from ultralytics import YOLO  # 导入YOLOv8模型
+    if backend == "torch":  # 原始PyTorch模型
+        return YOLO(model_path)
+    export_args = {"format": backend, "imgsz": imgsz}  # 导出参数
+    if quant == "int8":  # INT8量化需要校准数据
+        export_args.update(int8=True, data=data_yaml)
+    elif quant == "fp16":  # 半精度
+        export_args.update(half=True)
+    return YOLO(YOLO(model_path).export(**export_args), task="detect")  # 导出并加载
+
+
+def plot_pareto(rows, output_png):
+    # 绘制吞吐量-mAP50散点图并连接Pareto前沿，风格与 experiments/*.png 曲线一致
+    import matplotlib  # 导入matplotlib（ultralytics依赖）
+    matplotlib.use("Agg")  # 无界面后端
+    import matplotlib.pyplot as plt  # 导入绘图模块
+
+    fig, ax = plt.subplots(1, 1, figsize=(9, 6), tight_layout=True)  # 创建画布
+    ax.scatter([r['fps'] for r in rows], [r['mAP50'] for r in rows], c="grey", s=25, label="all configs")  # 所有配置
+    front = sorted((r for r in rows if r['pareto']), key=lambda r: r['fps'])  # Pareto前沿
+    ax.plot([r['fps'] for r in front], [r['mAP50'] for r in front], marker="o", linewidth=3, color="blue",
+            label="Pareto front")  # 前沿折线
+    for r in front:  # 标注前沿配置
+        ax.annotate(r['config'], (r['fps'], r['mAP50']), textcoords="offset points", xytext=(4, 4), fontsize=8)
+    ax.set_xlabel("Throughput (FPS)")  # 横轴
+    ax.set_ylabel("mAP50")  # 纵轴
+    ax.set_ylim(0, 1)  # 纵轴范围
+    ax.grid(True)  # 网格
+    ax.legend(loc="lower left")  # 图例
+    ax.set_title("Speed / Accuracy Pareto")  # 标题
+    fig.savefig(output_png, dpi=250)  # 保存图像
+    plt.close(fig)  # 关闭画布
+
+
+def _list(text, cast=str):
+    # 解析逗号分隔的列表
+    return [cast(x) for x in text.split(",") if x]
+
+
+def main():
+    # 命令行入口
+    parser = argparse.ArgumentParser(description="速度/精度Pareto评估")  # 创建参数解析器
+    parser.add_argument("--data", required=True, help="数据集：data.yaml、包含 images/labels 的目录或图像目录")  # 数据集
+    parser.add_argument("--model", default="best.pt", help="模型文件路径")  # 模型路径
+    parser.add_argument("--imgsz", type=lambda t: _list(t, int), default=[320, 480, 640], help="输入尺寸列表")  # 输入尺寸
+    parser.add_argument("--stride", type=lambda t: _list(t, int), default=[1], help="关键帧间隔列表")  # 关键帧间隔
+    parser.add_argument("--backends", type=_list, default=["torch"],
+                        help="后端列表，可带量化后缀，如 torch,onnx,openvino:int8")  # 后端
+    parser.add_argument("--conf", type=float, default=0.25, help="计算precision/recall的置信度阈值")  # 置信度阈值
+    parser.add_argument("--limit", type=int, default=0, help="最多评估的图像数，0表示全部")  # 图像数限制
+    parser.add_argument("--output", default="experiments/pareto", help="输出文件前缀（生成 .csv 和 .png）")  # 输出前缀
+    args = parser.parse_args()  # 解析参数
+
+    if not os.path.exists(args.model):  # 检查模型文件是否存在
+        print(f"模型文件 {args.model} 不存在!", file=sys.stderr)  # 输出错误信息
+        return 1
+    images, label_path = resolve_dataset(args.data)  # 解析数据集
+    if args.limit:  # 限制图像数
+        images = images[:args.limit]
+    if not images:  # 没有图像
+        print(f"数据集中没有图像: {args.data}", file=sys.stderr)  # 输出错误信息
+        return 1
+
+    from autotune import load_profile, apply_thread_settings  # 导入本机调优配置
+    apply_thread_settings(load_profile())  # 使用与线上一致的线程设置
+
+    rows = []  # 评估结果
+    data_yaml = args.data if args.data.endswith(('.yaml', '.yml')) else None  # INT8校准数据
+    for spec, imgsz in itertools.product(args.backends, args.imgsz):  # 每个后端和输入尺寸只导出一次模型
+        backend, _, quant = spec.partition(":")  # 拆分后端和量化方式
+        quant = quant or "fp32"  # 默认不量化
+        try:
+            model = load_model_for(args.model, backend, quant, imgsz, data_yaml)  # 准备模型
+        except Exception as e:  # 导出失败（缺少依赖等）
+            print(f"{spec} imgsz={imgsz}: 模型准备失败 ({e})", file=sys.stderr)
+            continue
+        for stride in args.stride:  # 逐个关键帧间隔
+            metrics = evaluate_config(model, images, label_path, imgsz, stride, args.conf)  # 评估
+            row = dict(config=f"{spec}@{imgsz}/s{stride}", backend=backend, quant=quant,
+                       imgsz=imgsz, stride=stride, **metrics)  # 结果行
+            rows.append(row)  # 记录结果
+            print(f"{row['config']}: P={row['precision']:.3f} R={row['recall']:.3f} mAP50={row['mAP50']:.3f} "
+                  f"{row['latency_ms']:.1f} ms, {row['fps']:.1f} FPS", file=sys.stderr)  # 输出进度
+
+    if not rows:  # 没有任何结果
+        return 1
+    pareto_front(rows)  # 标记Pareto最优配置
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)  # 创建输出目录
+    with open(args.output + ".csv", "w", newline="") as f:  # 写入CSV
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)  # CSV写入器
+        writer.writeheader()  # 写入表头
+        for r in rows:  # 写入每行
+            writer.writerow({k: (f"{v:.5g}" if isinstance(v, float) else v) for k, v in r.items()})
+    plot_pareto(rows, args.output + ".png")  # 绘制Pareto图
+    print(f"结果已保存到 {args.output}.csv 和 {args.output}.png", file=sys.stderr)  # 输出结果路径
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+# 帧缓冲池：按形状复用整帧大小的数组，避免每帧重新分配；统计池外分配次数，用于观察每帧分配数
+
+# 导入必要的库
+import threading  # 导入线程模块，用于解码线程和界面线程共享时加锁
+from collections import OrderedDict  # 导入有序字典，用于按最近使用淘汰不再出现的形状
+import numpy as np  # 导入NumPy库，用于分配数组
+
+
+class FramePool:
+    """
+    按 (形状, 类型) 复用的帧缓冲池
+
+    acquire() 优先返回已归还的缓冲区，没有时才分配新数组；使用方用完后调用 release() 归还。
+    每显示一帧调用一次 mark_frame()，stats() 中的 allocations / frames 即每帧分配数。
+    """
+
+    def __init__(self, max_free_per_shape=8, max_shapes=4):
+        self.max_free_per_shape = max_free_per_shape  # 每种形状最多保留的空闲缓冲区数
+        self.max_shapes = max_shapes  # 最多保留的形状数（显示区域大小变化后旧形状被淘汰）
+        self.free = OrderedDict()  # (形状, 类型) -> 空闲缓冲区列表
+        self.lock = threading.Lock()  # 解码线程与界面线程共享，需要加锁
+        self.allocations = 0  # 累计分配次数
+        self.frames = 0  # 累计帧数
+        self.in_use = 0  # 已借出的缓冲区数
+
+    def acquire(self, shape, dtype=np.uint8):
+        # 借出一个缓冲区（内容未初始化）
+        key = (tuple(shape), np.dtype(dtype).str)  # 缓冲区键
+        with self.lock:  # 加锁
+            self.in_use += 1  # 借出计数
+            buffers = self.free.get(key)  # 该形状的空闲缓冲区
+            if buffers:  # 有可复用的缓冲区
+                self.free.move_to_end(key)  # 标记为最近使用
+                return buffers.pop()
+            self.allocations += 1  # 分配计数
+        return np.empty(shape, dtype=dtype)  # 分配新数组
+
+    def adopt(self, buffer):
+        # 接管池外分配的数组（如OpenCV重新分配的解码结果），计入分配次数，之后可归还到池中
+        with self.lock:  # 加锁
+            self.in_use += 1  # 借出计数
+            self.allocations += 1  # 分配计数
+        return buffer
+
+    def release(self, buffer):
+        # 归还缓冲区
+        key = (buffer.shape, buffer.dtype.str)  # 缓冲区键
+        with self.lock:  # 加锁
+            self.in_use -= 1  # 借出计数
+            buffers = self.free.setdefault(key, [])  # 该形状的空闲列表
+            self.free.move_to_end(key)  # 标记为最近使用
+            if len(buffers) < self.max_free_per_shape:  # 未超过保留上限
+                buffers.append(buffer)
+            while len(self.free) > self.max_shapes:  # 淘汰最久未使用的形状
+                self.free.popitem(last=False)
+
+    def mark_frame(self):
+        # 记录处理了一帧
+        with self.lock:  # 加锁
+            self.frames += 1
+
+    def stats(self):
+        # 返回统计信息快照
+        with self.lock:  # 加锁
+            return {
+                'allocations': self.allocations,  # 累计分配次数
+                'frames': self.frames,  # 累计帧数
+                'in_use': self.in_use,  # 已借出的缓冲区数
+                'pooled': sum(len(b) for b in self.free.values())  # 池中空闲缓冲区数
+            }
@@ -0,0 +1,211 @@
+# 图像检测：在工作线程池中推理单张图像，支持取消，按 图像内容哈希 + 模型 + 推理参数 缓存结果；
+# 提交文件路径时在工作线程中按原分辨率解码，界面只保留降采样的预览
+
+# 导入必要的库
+import os  # 导入操作系统模块，用于读取模型文件的修改时间
+import json  # 导入JSON模块，用于把推理参数序列化到缓存键
+import hashlib  # 导入哈希模块，用于计算图像内容哈希
+import threading  # 导入线程模块，用于缓存加锁和每个工作线程独立的推理后端
+from collections import OrderedDict  # 导入有序字典，用于LRU结果缓存
+import cv2  # 导入OpenCV库，用于在工作线程中按原分辨率解码图像
+import numpy as np  # 导入NumPy库，用于获取图像的连续内存
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal  # 导入Qt线程池和信号
+from inference_backend import create_backend  # 导入推理后端（进程内模型或本地推理服务）
+from autotune import resolve_model_path, predict_kwargs  # 导入本机调优配置工具
+
+
+def image_digest(image):
+    """
+    计算图像内容哈希（包含尺寸和类型，内容相同的图像无论来自哪个文件都得到相同的值）
+    """
+    data = np.ascontiguousarray(image)  # 连续内存，避免哈希时复制
+    h = hashlib.blake2b(digest_size=16)  # 128位哈希
+    h.update(repr((data.shape, data.dtype.str)).encode())  # 尺寸和类型
+    h.update(memoryview(data).cast("B"))  # 像素数据
+    return h.hexdigest()
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """
+    计算图像文件内容哈希（按文件字节计算，命中缓存时无需解码）
+    """
+    h = hashlib.blake2b(digest_size=16)  # 128位哈希
+    with open(path, "rb") as f:  # 分块读取，大文件也不会一次性占用内存
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return "file:" + h.hexdigest()  # 前缀区分文件哈希和像素哈希
+
+
+def model_signature(model_path, profile, server_address=None):
+    """
+    模型和推理参数的签名：模型文件被替换（修改时间或大小变化）或参数变化时缓存自动失效
+    """
+    path = resolve_model_path(profile, model_path)  # 实际加载的模型文件
+    try:
+        stat = os.stat(path)  # 模型文件状态
+        version = (stat.st_mtime_ns, stat.st_size)  # 修改时间和大小
+    except OSError:  # 文件不存在（如使用推理服务）
+        version = None
+    params = json.dumps(predict_kwargs(profile), sort_keys=True)  # 推理参数
+    return (os.path.abspath(path), version, params, server_address)
+
+
+class _DetectSignals(QObject):
+    # QRunnable不是QObject，借助该对象把结果发回界面线程
+    result = pyqtSignal(int, list, str, bool)  # 请求ID、检测结果、后端描述、是否来自缓存
+    progress = pyqtSignal(int, int)  # 请求ID、进度百分比
+    error = pyqtSignal(int, str)  # 请求ID、错误信息
+
+
+class _DetectTask(QRunnable):
+    # 单张图像检测任务
+    def __init__(self, detector, request_id, image, model_path, server_address):
+        super().__init__()  # 调用父类初始化方法
+        self.detector = detector  # 所属检测器
+        self.request_id = request_id  # 请求ID
+        self.image = image  # 图像（数组或文件路径）
+        self.model_path = model_path  # 提交时的模型路径
+        self.server_address = server_address  # 提交时的推理服务地址
+
+    def run(self):
+        self.detector._run(self)  # 在工作线程中执行
+
+
+class ImageDetector(QObject):
+    """
+    单张图像检测器
+
+    submit() 立即返回请求ID，哈希、模型加载和推理都在工作线程池中进行，结果通过 result_signal 发回；
+    每个工作线程保留自己的推理后端，连续检测时不重新加载模型。cancel() 之后旧请求的结果不再发送，
+    尚未开始的任务直接从线程池移除（正在推理的任务无法中断，其结果仍写入缓存）。
+    """
+    result_signal = pyqtSignal(int, list, str, bool)  # 请求ID、检测结果、后端描述、是否来自缓存
+    progress_signal = pyqtSignal(int, int)  # 请求ID、进度百分比
+    error_signal = pyqtSignal(int, str)  # 请求ID、错误信息
+
+    def __init__(self, model_path, profile, server_address=None, workers=1, cache_size=64, parent=None):
+        super().__init__(parent)  # 调用父类初始化方法
+        self.model_path = model_path  # 模型路径
+        self.profile = profile  # 推理配置
+        self.server_address = server_address  # 推理服务地址
+        self.cache_size = cache_size  # 最多缓存的结果数
+        self.cache = OrderedDict()  # (图像哈希, 模型签名) -> (检测结果, 后端描述)
+        self.lock = threading.Lock()  # 缓存和后端列表加锁
+        self.request_id = 0  # 最近一次请求的ID，小于该值的请求视为已取消
+        self._local = threading.local()  # 每个工作线程独立的推理后端
+        self.backends = []  # 所有已创建的推理后端，关闭时统一释放
+        self.pool = QThreadPool(self)  # 检测线程池
+        self.pool.setMaxThreadCount(max(1, workers))  # 工作线程数（每个线程一个模型实例）
+        self.pool.setExpiryTimeout(-1)  # 工作线程空闲时不退出（默认30秒后退出，线程本地的模型会被丢弃并在下次请求时重新加载）
+        self.signals = _DetectSignals()  # 工作线程使用的信号对象
+        self.signals.result.connect(self._on_result)  # 结果先经过过滤再转发
+        self.signals.progress.connect(self._on_progress)  # 进度先经过过滤再转发
+        self.signals.error.connect(self._on_error)  # 错误先经过过滤再转发
+
+    def submit(self, image):
+        """
+        提交一张图像（数组或文件路径），取消之前所有未完成的请求，返回新的请求ID
+        """
+        self.cancel()  # 之前的请求不再需要
+        request_id = self.request_id  # 新请求ID
+        self.pool.start(_DetectTask(self, request_id, image, self.model_path, self.server_address))  # 提交任务
+        return request_id
+
+    def cancel(self):
+        # 取消所有未完成的请求
+        self.request_id += 1  # 旧请求ID全部失效
+        self.pool.clear()  # 移除尚未开始的任务
+
+    def clear_cache(self):
+        # 清空结果缓存
+        with self.lock:  # 加锁
+            self.cache.clear()
+
+    def shutdown(self, timeout=5.0):
+        """
+        取消所有请求并等待工作线程结束，然后关闭推理后端，返回是否在超时前结束
+        """
+        self.cancel()  # 取消请求
+        done = self.pool.waitForDone(int(timeout * 1000))  # 等待正在推理的任务
+        with self.lock:  # 加锁
+            backends, self.backends = self.backends, []  # 取出所有后端
+        for backend in backends:  # 关闭后端
+            backend.close()
+        return done
+
+    # ---- 工作线程 ----
+
+    def _active(self, task):
+        # 请求是否仍然有效（在工作线程中读取，整数读取在GIL下是原子的）
+        return task.request_id == self.request_id
+
+    def _backend(self, model_path, server_address):
+        # 获取本线程的推理后端，模型路径或服务地址变化时重新创建
+        key = (model_path, server_address)  # 后端键
+        entry = getattr(self._local, "entry", None)  # 本线程已有的后端
+        if entry is not None and entry[0] == key:  # 可以复用
+            return entry[1]
+        backend = create_backend(model_path, self.profile, server_address)  # 创建推理后端
+        with self.lock:  # 加锁
+            if entry is not None:  # 替换旧后端
+                self.backends.remove(entry[1])
+            self.backends.append(backend)
+        if entry is not None:  # 关闭旧后端
+            entry[1].close()
+        self._local.entry = (key, backend)  # 保存到线程本地
+        return backend
+
+    def _run(self, task):
+        # 检测一张图像：先查缓存，未命中时推理并写入缓存
+        if not self._active(task):  # 开始前已取消
+            return
+        try:
+            is_path = isinstance(task.image, str)  # 提交的是文件路径
+            digest = file_digest(task.image) if is_path else image_digest(task.image)  # 图像内容哈希
+            key = (digest, model_signature(task.model_path, self.profile, task.server_address))  # 缓存键
+            with self.lock:  # 加锁
+                cached = self.cache.get(key)  # 查询缓存
+                if cached is not None:  # 命中缓存
+                    self.cache.move_to_end(key)  # 更新LRU顺序
+            if cached is not None:  # 直接返回缓存结果
+                self.signals.result.emit(task.request_id, cached[0], cached[1], True)
+                return
+
+            image = task.image  # 待检测的图像
+            if is_path:  # 按原分辨率解码（只在需要推理时进行）
+                image = cv2.imread(task.image)
+                if image is None:  # 解码失败
+                    self.signals.error.emit(task.request_id, "无法读取图像文件")
+                    return
+            self.signals.progress.emit(task.request_id, 10)  # 加载模型
+            backend = self._backend(task.model_path, task.server_address)  # 获取推理后端
+            if not self._active(task):  # 加载模型期间已取消
+                return
+            self.signals.progress.emit(task.request_id, 50)  # 推理
+            detections = backend.predict([image])[0]  # 对图像进行目标检测
+            description = backend.describe()  # 后端描述
+
+            with self.lock:  # 加锁
+                self.cache[key] = (detections, description)  # 写入缓存（已取消的请求也缓存，之后再检测同一图像时直接使用）
+                while len(self.cache) > self.cache_size:  # 超过缓存上限
+                    self.cache.popitem(last=False)  # 淘汰最久未使用的结果
+            self.signals.result.emit(task.request_id, detections, description, False)  # 发送结果
+        except Exception as e:  # 捕获异常
+            self.signals.error.emit(task.request_id, str(e))  # 发送错误信息
+
+    # ---- 界面线程 ----
+
+    def _on_result(self, request_id, detections, description, cached):
+        # 只转发当前请求的结果
+        if request_id == self.request_id:
+            self.result_signal.emit(request_id, detections, description, cached)
+
+    def _on_progress(self, request_id, value):
+        # 只转发当前请求的进度
+        if request_id == self.request_id:
+            self.progress_signal.emit(request_id, value)
+
+    def _on_error(self, request_id, message):
+        # 只转发当前请求的错误
+        if request_id == self.request_id:
+            self.error_signal.emit(request_id, message)
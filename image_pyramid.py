@@ -0,0 +1,118 @@
+# 大图预览：按显示尺寸在解码阶段降采样（IMREAD_REDUCED_*），再生成多级金字塔并缓存，预览耗时和内存与原图大小基本无关
+
+# 导入必要的库
+import os  # 导入操作系统模块，用于获取文件信息
+from collections import OrderedDict  # 导入有序字典，用于LRU缓存
+import cv2  # 导入OpenCV库，用于降采样解码和金字塔缩放
+from PIL import Image  # 导入PIL库，只读取文件头获取图像尺寸
+
+# 解码阶段降采样的比例和对应的读取标志（JPEG在DCT阶段直接缩小，其他格式由OpenCV解码后缩小）
+REDUCED_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4),
+                 (2, cv2.IMREAD_REDUCED_COLOR_2), (1, cv2.IMREAD_COLOR))
+MIN_LEVEL_SIDE = 128  # 金字塔最小一级的长边像素数
+EXIF_ORIENTATION = 0x0112  # EXIF方向标签
+TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)  # 需要旋转90度的方向（手机和相机竖拍的照片）
+
+
+def image_size(path):
+    """
+    只读取文件头返回图像尺寸 (宽, 高)，无法识别时返回None；
+    cv2.imread 会按EXIF方向旋转图像，方向需要旋转90度时同样交换宽高，与解码结果保持一致
+    """
+    try:
+        with Image.open(path) as image:  # 延迟解码，只解析文件头
+            w, h = image.size  # 文件中存储的尺寸
+            if image.getexif().get(EXIF_ORIENTATION) in TRANSPOSED_ORIENTATIONS:  # 竖拍照片
+                w, h = h, w
+            return w, h
+    except (OSError, ValueError):  # 文件不存在或格式不支持
+        return None
+
+
+def required_factor(size, target_w, target_h):
+    """
+    保持纵横比显示到 target_w x target_h 区域时允许的最大降采样比例（不小于1）
+    """
+    w, h = size  # 原图宽高
+    scale = min(max(1, target_w) / w, max(1, target_h) / h)  # 显示缩放比例（由较紧的一边决定）
+    return max(1.0, 1.0 / scale)
+
+
+def decode_reduced(path, target_w, target_h, size=None):
+    """
+    以不小于显示尺寸的最大降采样比例解码图像，返回 (图像, 比例)；比例为原图像素与解码像素之比
+    """
+    size = size or image_size(path)  # 原图尺寸
+    if size is None:  # 无法读取文件头，按原尺寸解码
+        image = cv2.imread(path)
+        return image, 1
+    max_factor = required_factor(size, target_w, target_h)  # 允许的最大降采样比例
+    factor, flag = next((f, flag) for f, flag in REDUCED_FLAGS if f <= max_factor)  # 满足条件的最大比例（比例1总是满足）
+    image = cv2.imread(path, flag)  # 降采样解码
+    if image is None:  # 解码失败
+        return None, factor
+    return image, size[0] / image.shape[1]  # 实际比例（尺寸不能整除时略有差异）
+
+
+class ImagePyramid:
+    """
+    单张图像的多级金字塔：第0级为降采样解码的结果，之后每级缩小一半，直到长边小于 MIN_LEVEL_SIDE
+    """
+
+    def __init__(self, base, factor, full_size):
+        self.full_size = full_size  # 原图尺寸 (宽, 高)
+        self.levels = [(base, factor)]  # [(图像, 比例), ...]
+        image = base  # 当前级
+        while max(image.shape[:2]) >= 2 * MIN_LEVEL_SIDE:  # 还能继续缩小
+            image = cv2.pyrDown(image)  # 高斯平滑后缩小一半
+            self.levels.append((image, full_size[0] / image.shape[1]))
+
+    def level_for(self, target_w, target_h):
+        """
+        返回显示到 target_w x target_h 区域所需的最小一级 (图像, 比例)
+        """
+        max_factor = required_factor(self.full_size, target_w, target_h)  # 允许的最大比例
+        for image, factor in reversed(self.levels):  # 从最小的一级开始
+            if factor <= max_factor * 1.01:  # 缩放到显示区域时不需要放大（容许取整误差）
+                return image, factor
+        return self.levels[0]  # 显示区域比第0级还大，返回最清晰的一级
+
+    def covers(self, target_w, target_h):
+        # 第0级是否足够显示到目标尺寸（放大显示区域后可能需要以更小的比例重新解码）
+        return self.levels[0][1] <= required_factor(self.full_size, target_w, target_h) * 1.01
+
+    @property
+    def nbytes(self):
+        # 金字塔占用的内存
+        return sum(image.nbytes for image, _ in self.levels)
+
+
+class PyramidCache:
+    """
+    最近使用图像的金字塔缓存，按 路径 + 文件大小 + 修改时间 校验，在最近的几张图像之间切换时无需重新解码
+    """
+
+    def __init__(self, capacity=8):
+        self.capacity = capacity  # 最多缓存的图像数
+        self.cache = OrderedDict()  # 路径 -> (文件键, 金字塔)
+
+    def get(self, path, target_w, target_h):
+        """
+        返回图像的金字塔，未缓存、文件已变化或缓存的分辨率不足时重新解码；无法读取时返回None
+        """
+        st = os.stat(path)  # 文件信息
+        key = (st.st_size, st.st_mtime_ns)  # 文件键
+        entry = self.cache.get(path)  # 查询缓存
+        if entry is not None and entry[0] == key and entry[1].covers(target_w, target_h):  # 命中
+            self.cache.move_to_end(path)  # 更新LRU顺序
+            return entry[1]
+        size = image_size(path)  # 原图尺寸
+        base, factor = decode_reduced(path, target_w, target_h, size)  # 降采样解码
+        if base is None:  # 解码失败
+            return None
+        pyramid = ImagePyramid(base, factor, size or (base.shape[1], base.shape[0]))  # 生成金字塔
+        self.cache[path] = (key, pyramid)  # 放入缓存
+        self.cache.move_to_end(path)  # 更新LRU顺序
+        while len(self.cache) > self.capacity:  # 超过缓存上限
+            self.cache.popitem(last=False)  # 淘汰最久未使用的图像
+        return pyramid
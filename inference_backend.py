@@ -0,0 +1,81 @@
+# 推理后端：进程内YOLO模型或本地推理服务客户端，对外提供相同的 predict 接口
+
+# 导入必要的库
+import os  # 导入操作系统模块，用于读取环境变量
+from detection_utils import extract_detections  # 导入检测结果转换函数
+from autotune import resolve_model_path, predict_kwargs  # 导入本机调优配置工具
+
+SERVER_ENV = "ANOMALY_INFERENCE_SERVER"  # 推理服务地址环境变量，如 127.0.0.1:8765 或 /tmp/anomaly.sock
+
+
+class LocalBackend:
+    """
+    进程内推理：直接加载YOLO模型
+    """
+
+    def __init__(self, model_path, profile):
+        from ultralytics import YOLO  # 导入YOLOv8模型
+        self.model = YOLO(resolve_model_path(profile, model_path))  # 按调优配置初始化YOLOv8模型
+        self.kwargs = predict_kwargs(profile)  # 推理参数
+        self.dynamic_imgsz = (profile.get("backend") or "torch") == "torch"  # 导出的模型输入尺寸固定
+
+    def predict(self, frames):
+        # 对一组帧推理，返回每帧的检测结果列表
+        return [extract_detections([result]) for result in self.model(frames, **self.kwargs)]
+
+    def set_imgsz(self, imgsz):
+        # 运行时调整推理输入尺寸（下一次 predict 生效）
+        self.kwargs["imgsz"] = imgsz
+
+    def describe(self):
+        # 后端描述，用于界面显示
+        return "本地模型"
+
+    def close(self):
+        pass
+
+
+class RemoteBackend:
+    """
+    服务推理：把帧发送到本地推理服务，由服务端合并多个客户端的请求成批推理
+    """
+
+    def __init__(self, address, profile):
+        from inference_server import InferenceClient  # 导入推理服务客户端
+        self.address = address  # 服务地址
+        self.client = InferenceClient(address)  # 创建客户端
+        self.kwargs = predict_kwargs(profile)  # 推理参数
+        self.dynamic_imgsz = True  # 输入尺寸随请求发送，由服务端模型处理
+        self.client.stats()  # 立即发送一次请求，确认服务可用
+
+    def predict(self, frames):
+        # 对一组帧推理，返回每帧的检测结果列表
+        return self.client.predict(frames, **self.kwargs)
+
+    def set_imgsz(self, imgsz):
+        # 运行时调整推理输入尺寸
+        self.kwargs["imgsz"] = imgsz
+
+    def describe(self):
+        # 后端描述，包含最近一次请求的排队耗时和批大小
+        if not self.client.last_queue_ms:  # 尚未推理
+            return f"推理服务 {self.address}"
+        queue_ms = max(self.client.last_queue_ms)  # 最近一次请求的最大排队耗时
+        batch = max(self.client.last_batch_sizes)  # 最近一次请求的批大小
+        return f"推理服务 {self.address} (排队 {queue_ms:.1f} ms, 批大小 {batch})"
+
+    def close(self):
+        self.client.close()  # 关闭连接
+
+
+def create_backend(model_path, profile, server_address=None):
+    """
+    创建推理后端：指定了服务地址（参数或环境变量）时优先连接推理服务，连接失败回退到进程内模型
+    """
+    address = server_address or os.environ.get(SERVER_ENV)  # 服务地址
+    if address:  # 配置了推理服务
+        try:
+            return RemoteBackend(address, profile)
+        except (ConnectionError, OSError):  # 服务不可用
+            pass
+    return LocalBackend(model_path, profile)  # 使用进程内模型
@@ -0,0 +1,399 @@
+# 本地推理服务：由一个进程持有模型，把多个界面客户端的请求合并成批次推理
+# 用法: python inference_server.py --model best.pt --address 127.0.0.1:8765   （或 --address /tmp/anomaly.sock 使用Unix套接字）
+
+# 导入必要的库
+import os  # 导入操作系统模块，用于删除残留的套接字文件
+import sys  # 导入系统模块，用于退出程序
+import json  # 导入JSON模块，用于消息头编码
+import time  # 导入时间模块，用于统计排队和推理耗时
+import queue  # 导入队列模块，用于请求排队
+import socket  # 导入socket模块，用于客户端连接
+import struct  # 导入struct模块，用于长度前缀编码
+import argparse  # 导入命令行参数解析模块
+import threading  # 导入线程模块，用于批处理线程和锁
+import socketserver  # 导入socketserver模块，用于多线程服务器
+import numpy as np  # 导入NumPy库，用于帧数据序列化
+
+DEFAULT_ADDRESS = "127.0.0.1:8765"  # 默认服务地址
+MAX_HEADER_BYTES = 1 << 20  # 消息头最大长度（1MB）
+MAX_REQUEST_FRAMES = 16  # 单个请求最多帧数
+MAX_FRAME_BYTES = 3840 * 2160 * 3  # 单帧最大字节数（4K BGR）
+# 客户端可以设置的推理参数：参数名 -> (类型, 最小值, 最大值)；其他参数（如 save/project）一律拒绝，服务端不会写文件
+ALLOWED_KWARGS = {"imgsz": (int, 32, 4096), "conf": (float, 0.0, 1.0), "iou": (float, 0.0, 1.0)}
+
+
+def parse_address(address):
+    """
+    解析服务地址："host:port" 为TCP，其他视为Unix套接字路径
+    """
+    host, sep, port = address.rpartition(":")  # 拆分主机和端口
+    if sep and port.isdigit() and not address.startswith("/"):  # TCP地址
+        return socket.AF_INET, (host or "127.0.0.1", int(port))
+    return socket.AF_UNIX, address  # Unix套接字路径
+
+
+def _recv_exact(sock, size):
+    # 从套接字中读取指定字节数
+    buf = bytearray(size)  # 预分配缓冲区
+    view = memoryview(buf)  # 缓冲区视图
+    received = 0  # 已读取字节数
+    while received < size:  # 读取直到满足长度
+        n = sock.recv_into(view[received:], size - received)  # 读取数据
+        if n == 0:  # 连接关闭
+            raise ConnectionError("连接已关闭")
+        received += n  # 累加已读取字节数
+    return buf  # 返回数据
+
+
+def send_message(sock, header, payload=b""):
+    # 发送消息：4字节头长度 + JSON头 + 8字节负载长度 + 负载
+    header_bytes = json.dumps(header).encode("utf-8")  # 编码消息头
+    sock.sendall(struct.pack(">I", len(header_bytes)) + header_bytes + struct.pack(">Q", len(payload)))  # 发送头部
+    if payload:  # 有负载时发送负载
+        sock.sendall(payload)
+
+
+def recv_message(sock, check=None):
+    """
+    接收消息，返回 (消息头, 负载)；check(header, payload_len) 在读取负载之前调用，
+    消息不合法时抛出 ValueError，不会按客户端声明的长度分配内存
+    """
+    header_len = struct.unpack(">I", _recv_exact(sock, 4))[0]  # 读取头长度
+    if header_len > MAX_HEADER_BYTES:  # 消息头过长
+        raise ValueError(f"消息头过长: {header_len} 字节")
+    header = json.loads(bytes(_recv_exact(sock, header_len)).decode("utf-8"))  # 读取并解析消息头
+    payload_len = struct.unpack(">Q", _recv_exact(sock, 8))[0]  # 读取负载长度
+    if check is not None:  # 校验消息头和负载长度
+        check(header, payload_len)
+    payload = _recv_exact(sock, payload_len) if payload_len else bytearray()  # 读取负载
+    return header, payload
+
+
+def frame_shapes(header, payload_len):
+    """
+    校验请求中的帧形状，返回形状列表：每帧为 (高, 宽, 3) 的正整数，不超过 MAX_FRAME_BYTES，
+    帧数不超过 MAX_REQUEST_FRAMES，所有帧的字节数之和必须等于负载长度
+    """
+    if not isinstance(header, dict):  # 消息头必须是对象
+        raise ValueError("消息头格式错误")
+    metas = header.get("frames", [])  # 帧元数据
+    if not isinstance(metas, list) or len(metas) > MAX_REQUEST_FRAMES:  # 帧数过多
+        raise ValueError(f"单个请求最多 {MAX_REQUEST_FRAMES} 帧")
+    shapes, total = [], 0  # 形状列表和总字节数
+    for meta in metas:  # 逐帧校验
+        shape = meta.get("shape") if isinstance(meta, dict) else None  # 帧形状
+        if (not isinstance(shape, list) or len(shape) != 3 or shape[2] != 3
+                or not all(type(v) is int and v > 0 for v in shape)):  # 必须是 (高, 宽, 3) 正整数
+            raise ValueError(f"帧形状不合法: {shape}")
+        size = shape[0] * shape[1] * shape[2]  # 字节数
+        if size > MAX_FRAME_BYTES:  # 单帧过大
+            raise ValueError(f"帧过大: {shape}")
+        shapes.append(tuple(shape))
+        total += size
+    if total != payload_len:  # 负载长度与帧形状不一致
+        raise ValueError(f"负载长度 {payload_len} 与帧形状不符（应为 {total}）")
+    return shapes
+
+
+def check_request(header, payload_len):
+    # recv_message 的校验函数：统计请求不能带负载，推理请求的帧形状必须与负载一致
+    if isinstance(header, dict) and header.get("op") == "stats":  # 查询统计信息
+        if payload_len:
+            raise ValueError("统计请求不能带负载")
+        return
+    frame_shapes(header, payload_len)
+
+
+def validate_kwargs(kwargs):
+    """
+    只保留允许的推理参数并检查类型和范围；verbose 由服务端固定为 False，其他参数抛出 ValueError
+    """
+    if not isinstance(kwargs, dict):  # 参数必须是对象
+        raise ValueError("推理参数格式错误")
+    result = {"verbose": False}  # 服务端不输出推理日志
+    for name, value in kwargs.items():  # 逐个检查
+        if name == "verbose":  # 忽略客户端的日志设置
+            continue
+        if name not in ALLOWED_KWARGS:  # 不允许的参数
+            raise ValueError(f"不支持的推理参数: {name}")
+        kind, low, high = ALLOWED_KWARGS[name]  # 类型和范围
+        if isinstance(value, bool) or not isinstance(value, (int, float)):  # 必须是数值
+            raise ValueError(f"推理参数 {name} 必须是数值")
+        if kind is int and value != int(value):  # 整数参数
+            raise ValueError(f"推理参数 {name} 必须是整数")
+        value = kind(value)  # 转换类型
+        if not low <= value <= high:  # 超出范围
+            raise ValueError(f"推理参数 {name} 超出范围 [{low}, {high}]")
+        result[name] = value
+    return result
+
+
+class _Request:
+    # 队列中的单帧推理请求
+    def __init__(self, frame, kwargs):
+        self.frame = frame  # 帧数据
+        self.kwargs = kwargs  # 推理参数
+        self.key = json.dumps(kwargs, sort_keys=True)  # 推理参数键，参数相同的请求才能合并成一批
+        self.enqueued = time.perf_counter()  # 入队时间
+        self.done = threading.Event()  # 完成事件
+        self.detections = None  # 检测结果
+        self.error = None  # 错误信息
+        self.queue_ms = 0.0  # 排队耗时（毫秒）
+        self.batch_size = 0  # 所在批次大小
+
+
+class InferenceBatcher:
+    """
+    批处理线程：收集队列中的请求，最多等待 max_wait_ms 凑满 max_batch 帧后统一推理
+    """
+
+    def __init__(self, model, max_batch=8, max_wait_ms=5.0):
+        self.model = model  # 模型实例
+        self.max_batch = max_batch  # 最大批大小
+        self.max_wait = max_wait_ms / 1000.0  # 最长等待时间（秒）
+        self.queue = queue.Queue()  # 请求队列
+        self.stats_lock = threading.Lock()  # 统计信息锁
+        self.stats = {  # 统计信息
+            "frames": 0,  # 已处理帧数
+            "batches": 0,  # 已处理批次数
+            "queue_ms_total": 0.0,  # 累计排队耗时
+            "queue_ms_max": 0.0,  # 最大排队耗时
+            "infer_ms_total": 0.0,  # 累计推理耗时
+            "batch_sizes": {}  # 批大小分布
+        }
+        self.thread = threading.Thread(target=self._loop, daemon=True)  # 批处理线程
+        self.thread.start()  # 启动批处理线程
+
+    def submit(self, frame, kwargs):
+        # 提交一帧请求
+        request = _Request(frame, kwargs)  # 创建请求
+        self.queue.put(request)  # 放入队列
+        return request
+
+    def _loop(self):
+        from detection_utils import extract_detections  # 导入检测结果转换函数
+        while True:  # 持续处理
+            batch = [self.queue.get()]  # 等待第一个请求
+            deadline = time.perf_counter() + self.max_wait  # 本批截止时间
+            while len(batch) < self.max_batch:  # 尝试凑满一批
+                remaining = deadline - time.perf_counter()  # 剩余等待时间
+                if remaining <= 0:  # 超过等待时间
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))  # 获取更多请求
+                except queue.Empty:  # 没有更多请求
+                    break
+
+            groups = {}  # 推理参数键 -> 请求列表
+            for request in batch:  # 按推理参数分组
+                groups.setdefault(request.key, []).append(request)
+            for requests in groups.values():  # 逐组推理
+                start = time.perf_counter()  # 推理开始时间
+                try:
+                    results = self.model([r.frame for r in requests], **requests[0].kwargs)  # 批量推理
+                    for r, result in zip(requests, results):  # 分发结果
+                        r.detections = extract_detections([result])
+                except Exception as e:  # 推理失败
+                    for r in requests:  # 所有请求都返回错误
+                        r.error = str(e)
+                infer_ms = (time.perf_counter() - start) * 1000  # 推理耗时
+                self._record(requests, start, infer_ms)  # 记录统计信息
+
+    def _record(self, requests, start, infer_ms):
+        # 记录统计信息并唤醒等待的请求
+        size = len(requests)  # 批大小
+        with self.stats_lock:  # 加锁更新统计
+            self.stats["frames"] += size  # 累计帧数
+            self.stats["batches"] += 1  # 累计批次数
+            self.stats["infer_ms_total"] += infer_ms  # 累计推理耗时
+            self.stats["batch_sizes"][str(size)] = self.stats["batch_sizes"].get(str(size), 0) + 1  # 批大小分布
+            for r in requests:  # 逐个请求
+                r.queue_ms = (start - r.enqueued) * 1000  # 排队耗时
+                r.batch_size = size  # 批大小
+                self.stats["queue_ms_total"] += r.queue_ms  # 累计排队耗时
+                self.stats["queue_ms_max"] = max(self.stats["queue_ms_max"], r.queue_ms)  # 最大排队耗时
+        for r in requests:  # 唤醒等待的请求
+            r.done.set()
+
+    def snapshot(self):
+        # 返回统计信息快照
+        with self.stats_lock:  # 加锁读取
+            stats = dict(self.stats, batch_sizes=dict(self.stats["batch_sizes"]))  # 复制统计信息
+        frames = max(1, stats["frames"])  # 避免除零
+        stats["queue_ms_avg"] = stats["queue_ms_total"] / frames  # 平均排队耗时
+        stats["batch_size_avg"] = stats["frames"] / max(1, stats["batches"])  # 平均批大小
+        stats["infer_ms_avg"] = stats["infer_ms_total"] / max(1, stats["batches"])  # 平均每批推理耗时
+        stats["queue_depth"] = self.queue.qsize()  # 当前排队数
+        return stats
+
+
+class _RequestHandler(socketserver.BaseRequestHandler):
+    # 单个客户端连接的处理器（每个连接一个线程）
+    def handle(self):
+        batcher = self.server.batcher  # 批处理器
+        while True:  # 同一连接上可以连续发送多个请求
+            try:
+                header, payload = recv_message(self.request, check_request)  # 接收请求（先校验再读取负载）
+            except (ConnectionError, OSError):  # 客户端断开
+                return
+            except ValueError as e:  # 请求不合法（负载未读取，无法继续使用该连接）
+                try:
+                    send_message(self.request, {"ok": False, "error": f"请求不合法: {e}"})
+                except OSError:  # 客户端已断开
+                    pass
+                return
+            if header.get("op") == "stats":  # 查询统计信息
+                send_message(self.request, {"ok": True, "stats": batcher.snapshot()})
+                continue
+
+            try:
+                kwargs = validate_kwargs(header.get("kwargs", {}))  # 只允许 imgsz/conf/iou
+            except ValueError as e:  # 参数不合法，连接仍可继续使用
+                send_message(self.request, {"ok": False, "error": str(e)})
+                continue
+            frames = []  # 请求中的帧
+            offset = 0  # 负载偏移
+            for shape in frame_shapes(header, len(payload)):  # 按已校验的形状切分负载
+                size = shape[0] * shape[1] * shape[2]  # 字节数
+                frames.append(np.frombuffer(payload, dtype=np.uint8, count=size, offset=offset).reshape(shape))  # 零拷贝还原帧
+                offset += size  # 移动偏移
+            requests = [batcher.submit(frame, kwargs) for frame in frames]  # 提交到批处理器
+            for r in requests:  # 等待所有帧完成
+                r.done.wait()
+            errors = [r.error for r in requests if r.error]  # 收集错误
+            send_message(self.request, {
+                "ok": not errors,  # 是否成功
+                "error": errors[0] if errors else None,  # 错误信息
+                "detections": [r.detections for r in requests],  # 每帧的检测结果
+                "queue_ms": [r.queue_ms for r in requests],  # 每帧的排队耗时
+                "batch_sizes": [r.batch_size for r in requests]  # 每帧所在批次的大小
+            })
+
+
+class _TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True  # 连接线程随主线程退出
+    allow_reuse_address = True  # 允许快速重启
+
+
+if hasattr(socketserver, "UnixStreamServer"):  # Windows没有Unix套接字
+    class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True  # 连接线程随主线程退出
+
+
+def create_server(model, address=DEFAULT_ADDRESS, max_batch=8, max_wait_ms=5.0):
+    """
+    创建推理服务（调用 serve_forever() 开始服务）
+    """
+    family, addr = parse_address(address)  # 解析地址
+    if family == socket.AF_UNIX:  # Unix套接字
+        if os.path.exists(addr):  # 删除残留的套接字文件
+            os.unlink(addr)
+        server = _UnixServer(addr, _RequestHandler)  # 创建Unix套接字服务器
+    else:  # TCP
+        server = _TCPServer(addr, _RequestHandler)  # 创建TCP服务器
+    server.batcher = InferenceBatcher(model, max_batch, max_wait_ms)  # 创建批处理器
+    return server
+
+
+class InferenceClient:
+    """
+    推理服务客户端：每个客户端保持一个长连接，线程安全
+    """
+
+    def __init__(self, address=DEFAULT_ADDRESS, timeout=30.0):
+        self.family, self.addr = parse_address(address)  # 解析地址
+        self.timeout = timeout  # 超时时间
+        self.sock = None  # 套接字
+        self.lock = threading.Lock()  # 同一连接上的请求串行发送
+        self.last_queue_ms = []  # 最近一次请求每帧的排队耗时
+        self.last_batch_sizes = []  # 最近一次请求每帧所在批次的大小
+
+    def _connect(self):
+        # 建立连接
+        if self.sock is None:  # 尚未连接
+            self.sock = socket.socket(self.family, socket.SOCK_STREAM)  # 创建套接字
+            self.sock.settimeout(self.timeout)  # 设置超时
+            self.sock.connect(self.addr)  # 连接服务
+        return self.sock
+
+    def _call(self, header, payload=b""):
+        # 发送请求并等待响应，连接失效时关闭以便下次重连
+        with self.lock:  # 加锁
+            try:
+                sock = self._connect()  # 获取连接
+                send_message(sock, header, payload)  # 发送请求
+                response, _ = recv_message(sock)  # 接收响应
+            except (ConnectionError, OSError):  # 连接异常
+                self.close()  # 关闭连接
+                raise
+        if not response.get("ok"):  # 服务端返回错误
+            raise RuntimeError(response.get("error") or "推理服务返回错误")
+        return response
+
+    def predict(self, frames, **kwargs):
+        """
+        对一组帧进行推理，返回每帧的检测结果列表
+        """
+        frames = [np.ascontiguousarray(f) for f in frames]  # 保证内存连续
+        header = {"op": "predict", "frames": [{"shape": list(f.shape)} for f in frames], "kwargs": kwargs}  # 请求头
+        payload = b"".join(memoryview(f).cast("B") for f in frames)  # 拼接帧数据
+        response = self._call(header, payload)  # 发送请求
+        self.last_queue_ms = response["queue_ms"]  # 记录排队耗时
+        self.last_batch_sizes = response["batch_sizes"]  # 记录批大小
+        return [[dict(d, box=tuple(d['box'])) for d in dets] for dets in response["detections"]]  # 还原边界框为元组
+
+    def stats(self):
+        # 查询服务端统计信息
+        return self._call({"op": "stats"})["stats"]
+
+    def close(self):
+        # 关闭连接
+        if self.sock is not None:  # 已连接
+            try:
+                self.sock.close()  # 关闭套接字
+            finally:
+                self.sock = None  # 清除引用
+
+
+def main():
+    # 命令行入口
+    parser = argparse.ArgumentParser(description="本地推理服务")  # 创建参数解析器
+    parser.add_argument("--model", default="best.pt", help="模型文件路径")  # 模型路径
+    parser.add_argument("--address", default=DEFAULT_ADDRESS, help="服务地址，host:port 或 Unix套接字路径")  # 服务地址
+    parser.add_argument("--max-batch", type=int, default=8, help="最大批大小")  # 最大批大小
+    parser.add_argument("--max-wait-ms", type=float, default=5.0, help="凑批最长等待时间（毫秒）")  # 凑批等待时间
+    parser.add_argument("--stats-interval", type=float, default=30.0, help="打印统计信息的间隔（秒），0表示不打印")  # 统计输出间隔
+    args = parser.parse_args()  # 解析参数
+
+    if not os.path.exists(args.model):  # 检查模型文件是否存在
+        print(f"模型文件 {args.model} 不存在!", file=sys.stderr)  # 输出错误信息
+        return 1
+
+    from ultralytics import YOLO  # 导入YOLOv8模型
+    from autotune import load_profile, apply_thread_settings, resolve_model_path, profile_for_model  # 导入本机调优配置
+    profile = profile_for_model(load_profile(), args.model)  # 读取本机调优配置（导出的模型须由 --model 导出）
+    apply_thread_settings(profile)  # 设置torch线程数
+    model = YOLO(resolve_model_path(profile, args.model))  # 加载模型（所有客户端共享）
+
+    server = create_server(model, args.address, args.max_batch, args.max_wait_ms)  # 创建服务
+    if args.stats_interval > 0:  # 定期打印统计信息
+        def report():
+            while True:  # 循环打印
+                time.sleep(args.stats_interval)  # 等待间隔
+                s = server.batcher.snapshot()  # 获取统计信息
+                print(f"帧数 {s['frames']}, 平均批大小 {s['batch_size_avg']:.2f}, "
+                      f"平均排队 {s['queue_ms_avg']:.1f} ms, 最大排队 {s['queue_ms_max']:.1f} ms, "
+                      f"排队中 {s['queue_depth']}", file=sys.stderr)  # 输出统计信息
+        threading.Thread(target=report, daemon=True).start()  # 启动统计线程
+    print(f"推理服务已启动: {args.address}", file=sys.stderr)  # 输出启动信息
+    try:
+        server.serve_forever()  # 开始服务
+    except KeyboardInterrupt:  # Ctrl+C退出
+        pass
+    finally:
+        server.server_close()  # 关闭服务
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
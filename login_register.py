@@ -1,12 +1,55 @@
 # 导入必要的库
-import json  # 用于处理JSON数据
-import os  # 用于操作系统功能，如文件检查
-import hashlib  # 用于密码加密
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, 
                             QLineEdit, QPushButton, QTabWidget, QCheckBox,
                             QMessageBox, QGraphicsDropShadowEffect)  # 导入Qt部件用于创建GUI
 from PyQt5.QtGui import QColor, QFont, QPalette, QBrush, QLinearGradient, QPixmap  # 导入Qt图形相关类
-from PyQt5.QtCore import Qt, pyqtSignal  # 导入Qt核心类，包括信号
+from PyQt5.QtCore import Qt, QThread, pyqtSignal  # 导入Qt核心类，包括信号
+from user_store import UserStore, hash_password, verify_password, needs_rehash  # 导入用户存储和密码哈希工具
+
+class AuthThread(QThread):
+    # 在后台线程中执行密码哈希和数据库读写，避免阻塞界面
+    result_signal = pyqtSignal(bool, str)  # 定义信号，传递是否成功和提示消息
+    
+    def __init__(self, user_store, action, username, password):
+        super().__init__()  # 调用父类初始化方法
+        self.user_store = user_store  # 用户存储
+        self.action = action  # 操作类型："login" 或 "register"
+        self.username = username  # 用户名
+        self.password = password  # 明文密码
+    
+    def run(self):
+        try:
+            self.user_store.ensure_default_admin("admin123")  # 首次启动时创建默认管理员（PBKDF2哈希较慢，不在界面线程中执行）
+            if self.action == "login":  # 登录
+                ok, message = self.do_login()  # 执行登录校验
+            else:  # 注册
+                ok, message = self.do_register()  # 执行注册
+        except Exception as e:  # 捕获数据库等异常
+            ok, message = False, f"操作失败: {str(e)}"  # 返回错误消息
+        finally:
+            self.user_store.close()  # 关闭本线程的数据库连接
+        self.result_signal.emit(ok, message)  # 发送结果信号
+    
+    def do_login(self):
+        # 检查用户是否存在
+        user = self.user_store.get_user(self.username)  # 按用户名查询账户
+        if user is None:  # 用户名不存在
+            return False, "用户名不存在"
+        
+        # 验证密码
+        if not verify_password(self.password, user["password"]):  # 比较密码是否匹配
+            return False, "密码错误"
+        
+        # 旧版无盐哈希在登录成功后升级为加盐哈希
+        if needs_rehash(user["password"]):  # 检查是否需要升级
+            self.user_store.update_password(self.username, hash_password(self.password))  # 写入新的哈希
+        return True, f"欢迎回来, {self.username}!"
+    
+    def do_register(self):
+        # 添加新用户，用户名已存在时插入失败
+        if not self.user_store.add_user(self.username, hash_password(self.password), is_admin=False):  # 原子插入新账户
+            return False, "用户名已存在"
+        return True, "账户已创建，现在可以登录了"
 
 class LoginRegisterWidget(QWidget):
     # 定义信号
@@ -24,7 +67,9 @@ class LoginRegisterWidget(QWidget):
         self.set_gradient_background()  # 调用方法设置渐变背景
         
         # 初始化用户数据
-        self.user_data_file = "user_data.json"  # 设置用户数据文件名
+        self.user_data_file = "user_data.json"  # 旧版用户数据文件名，首次启动时迁移到数据库
+        self.user_db_file = "user_data.db"  # 设置用户数据库文件名
+        self.auth_thread = None  # 初始化认证线程为None
         self.init_user_data()  # 调用初始化用户数据方法
         
         # 创建界面
@@ -42,20 +87,13 @@ class LoginRegisterWidget(QWidget):
         self.setAutoFillBackground(True)  # 启用自动填充背景
     
     def init_user_data(self):
-        # 如果用户数据文件不存在，创建一个包含默认管理员账户的文件
-        if not os.path.exists(self.user_data_file):  # 检查用户数据文件是否存在
-            default_admin = {  # 创建默认管理员账户
-                "admin": {
-                    "password": self.hash_password("admin123"),  # 加密默认密码
-                    "is_admin": True  # 设置为管理员
-                }
-            }
-            with open(self.user_data_file, "w") as f:  # 打开文件进行写入
-                json.dump(default_admin, f, indent=4)  # 写入默认管理员数据
+        # 打开用户数据库（首次启动时自动迁移旧版JSON数据）
+        self.user_store = UserStore(self.user_db_file, self.user_data_file)  # 创建用户存储
+        # 默认管理员账户在第一次登录/注册时由认证线程创建，避免首次启动时界面卡顿
     
     def hash_password(self, password):
-        # 使用SHA-256加密密码
-        return hashlib.sha256(password.encode()).hexdigest()  # 对密码进行加密并返回十六进制字符串
+        # 使用加盐的PBKDF2-SHA256加密密码
+        return hash_password(password)  # 对密码进行加密并返回存储格式字符串
     
     def init_ui(self):
         # 主布局
@@ -164,6 +202,7 @@ class LoginRegisterWidget(QWidget):
         
         # 登录按钮
         login_button = QPushButton("登录")  # 创建登录按钮
+        self.login_button = login_button  # 保存引用，认证期间禁用
         login_button.setCursor(Qt.PointingHandCursor)  # 设置鼠标悬停时为手型光标
         login_button.setStyleSheet("""
             QPushButton {
@@ -252,6 +291,7 @@ class LoginRegisterWidget(QWidget):
         
         # 注册按钮
         register_button = QPushButton("注册")  # 创建注册按钮
+        self.register_button = register_button  # 保存引用，认证期间禁用
         register_button.setCursor(Qt.PointingHandCursor)  # 设置鼠标悬停时为手型光标
         register_button.setStyleSheet("""
             QPushButton {
@@ -310,22 +350,19 @@ class LoginRegisterWidget(QWidget):
             QMessageBox.warning(self, "登录失败", "用户名和密码不能为空")  # 显示警告消息
             return
         
-        # 检查用户是否存在
-        with open(self.user_data_file, "r") as f:  # 打开用户数据文件
-            user_data = json.load(f)  # 加载用户数据
-        
-        if username not in user_data:  # 检查用户名是否存在
-            QMessageBox.warning(self, "登录失败", "用户名不存在")  # 显示警告消息
-            return
-        
-        # 验证密码
-        hashed_password = self.hash_password(password)  # 对输入的密码进行加密
-        if user_data[username]["password"] != hashed_password:  # 比较密码是否匹配
-            QMessageBox.warning(self, "登录失败", "密码错误")  # 显示警告消息
+        # 在后台线程中查询账户并验证密码
+        self.start_auth("login", username, password, self.on_login_result)  # 启动认证线程
+    
+    def on_login_result(self, ok, message):
+        # 登录结果处理
+        self.set_auth_busy(False)  # 恢复按钮
+        if not ok:  # 登录失败
+            QMessageBox.warning(self, "登录失败", message)  # 显示警告消息
             return
         
         # 登录成功
-        QMessageBox.information(self, "登录成功", f"欢迎回来, {username}!")  # 显示成功消息
+        username = self.auth_thread.username  # 获取登录的用户名
+        QMessageBox.information(self, "登录成功", message)  # 显示成功消息
         self.login_successful.emit(username)  # 发射登录成功信号，传递用户名
     
     def register(self):
@@ -342,25 +379,18 @@ class LoginRegisterWidget(QWidget):
             QMessageBox.warning(self, "注册失败", "两次输入的密码不一致")  # 显示警告消息
             return
         
-        # 检查用户名是否已存在
-        with open(self.user_data_file, "r") as f:  # 打开用户数据文件
-            user_data = json.load(f)  # 加载用户数据
-        
-        if username in user_data:  # 检查用户名是否已存在
-            QMessageBox.warning(self, "注册失败", "用户名已存在")  # 显示警告消息
+        # 在后台线程中加密密码并写入数据库
+        self.start_auth("register", username, password, self.on_register_result)  # 启动认证线程
+    
+    def on_register_result(self, ok, message):
+        # 注册结果处理
+        self.set_auth_busy(False)  # 恢复按钮
+        if not ok:  # 注册失败
+            QMessageBox.warning(self, "注册失败", message)  # 显示警告消息
             return
         
-        # 添加新用户
-        user_data[username] = {
-            "password": self.hash_password(password),  # 对密码进行加密
-            "is_admin": False  # 设置为非管理员
-        }
-        
-        with open(self.user_data_file, "w") as f:  # 打开用户数据文件用于写入
-            json.dump(user_data, f, indent=4)  # 写入更新后的用户数据
-        
         # 注册成功
-        QMessageBox.information(self, "注册成功", "账户已创建，现在可以登录了")  # 显示成功消息
+        QMessageBox.information(self, "注册成功", message)  # 显示成功消息
         
         # 清空表单并切换到登录选项卡
         self.reg_username.clear()  # 清空用户名输入框
@@ -369,6 +399,20 @@ class LoginRegisterWidget(QWidget):
         tab_widget = self.findChild(QTabWidget)  # 查找选项卡部件
         tab_widget.setCurrentIndex(0)  # 切换到登录选项卡
     
+    def start_auth(self, action, username, password, callback):
+        # 创建并启动认证线程
+        if self.auth_thread is not None and self.auth_thread.isRunning():  # 上一次认证尚未完成
+            return  # 忽略重复点击
+        self.set_auth_busy(True)  # 禁用按钮
+        self.auth_thread = AuthThread(self.user_store, action, username, password)  # 创建认证线程
+        self.auth_thread.result_signal.connect(callback)  # 连接结果信号到处理方法
+        self.auth_thread.start()  # 启动线程
+    
+    def set_auth_busy(self, busy):
+        # 认证期间禁用登录和注册按钮
+        self.login_button.setEnabled(not busy)  # 设置登录按钮状态
+        self.register_button.setEnabled(not busy)  # 设置注册按钮状态
+    
     def resizeEvent(self, event):
         # 窗口大小改变时更新渐变
         self.set_gradient_background()  # 更新渐变背景
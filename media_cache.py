@@ -0,0 +1,201 @@
+# 媒体元数据与预览缩略图缓存：按 路径 + 文件大小 + 修改时间 缓存帧率、帧数、时长、分辨率、编码和预览图
+
+# 导入必要的库
+import os  # 导入操作系统模块，用于获取文件信息
+import queue  # 导入队列模块，用于界面的读取请求
+import sqlite3  # 导入SQLite，用于持久化缓存
+import threading  # 导入线程模块，用于线程本地连接
+import cv2  # 导入OpenCV库，用于读取视频元数据和首帧
+import numpy as np  # 导入NumPy库，用于解码缓存的预览图
+from PyQt5.QtCore import QThread, pyqtSignal  # 导入Qt线程和信号
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')  # 支持的视频扩展名
+PREVIEW_MAX_WIDTH = 640  # 预览图最大宽度
+
+
+def _file_key(path):
+    # 文件的缓存校验键：大小和修改时间（纳秒）
+    st = os.stat(path)  # 获取文件信息
+    return st.st_size, st.st_mtime_ns
+
+
+def probe_video(path):
+    """
+    打开视频读取元数据和首帧，返回元数据字典（首帧失败时 preview 为None）
+    """
+    cap = cv2.VideoCapture(path)  # 打开视频文件
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS)  # 帧率
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))  # 总帧数
+        fourcc = int(cap.get(cv2.CAP_PROP_FOURCC))  # 编码四字符码
+        codec = "".join(chr((fourcc >> (8 * i)) & 0xFF) for i in range(4)).strip("\x00 ")  # 解析编码名称
+        ret, frame = cap.read()  # 读取第一帧
+    finally:
+        cap.release()  # 释放视频捕获对象
+
+    preview = None  # 预览图JPEG数据
+    width = height = 0  # 分辨率
+    if ret:  # 读取成功
+        height, width = frame.shape[:2]  # 实际分辨率
+        if width > PREVIEW_MAX_WIDTH:  # 缩小预览图
+            scale = PREVIEW_MAX_WIDTH / width  # 缩放比例
+            frame = cv2.resize(frame, (PREVIEW_MAX_WIDTH, int(height * scale)), interpolation=cv2.INTER_AREA)  # 缩放
+        ok, encoded = cv2.imencode(".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), 85])  # 编码为JPEG
+        if ok:  # 编码成功
+            preview = encoded.tobytes()
+    return {
+        'fps': fps,  # 帧率
+        'frame_count': frame_count,  # 总帧数
+        'duration': frame_count / fps if fps > 0 else 0.0,  # 时长（秒）
+        'width': width,  # 宽度
+        'height': height,  # 高度
+        'codec': codec,  # 编码
+        'preview': preview  # 预览图JPEG数据
+    }
+
+
+def decode_preview(preview):
+    # 把缓存的JPEG预览图解码为OpenCV图像
+    if not preview:  # 没有预览图
+        return None
+    return cv2.imdecode(np.frombuffer(preview, dtype=np.uint8), cv2.IMREAD_COLOR)  # 解码
+
+
+class MediaCache:
+    """
+    基于SQLite的媒体元数据缓存，文件大小或修改时间变化后自动失效
+    """
+
+    def __init__(self, db_path="media_cache.db"):
+        self.db_path = db_path  # 数据库文件路径
+        self._local = threading.local()  # 每个线程独立的数据库连接
+        conn = self._connect()  # 获取连接
+        with conn:  # 在事务中执行
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS media ("
+                " path TEXT PRIMARY KEY,"
+                " size INTEGER NOT NULL,"
+                " mtime_ns INTEGER NOT NULL,"
+                " fps REAL, frame_count INTEGER, duration REAL,"
+                " width INTEGER, height INTEGER, codec TEXT,"
+                " preview BLOB)"
+            )  # 媒体元数据表，路径为主键
+
+    def _connect(self):
+        # 获取当前线程的数据库连接
+        conn = getattr(self._local, "conn", None)  # 尝试获取已有连接
+        if conn is None:  # 当前线程还没有连接
+            conn = sqlite3.connect(self.db_path, timeout=10)  # 打开数据库
+            conn.execute("PRAGMA journal_mode=WAL")  # 启用WAL模式，后台写入不阻塞界面读取
+            conn.execute("PRAGMA synchronous=NORMAL")  # WAL模式下兼顾安全与性能
+            self._local.conn = conn  # 保存到线程本地
+        return conn
+
+    def get(self, path):
+        """
+        查询缓存，文件不存在、未缓存或已变化时返回None
+        """
+        try:
+            size, mtime_ns = _file_key(path)  # 当前文件大小和修改时间
+        except OSError:  # 文件不存在
+            return None
+        row = self._connect().execute(
+            "SELECT fps, frame_count, duration, width, height, codec, preview FROM media"
+            " WHERE path = ? AND size = ? AND mtime_ns = ?", (path, size, mtime_ns)
+        ).fetchone()  # 按主键查询并校验文件未变化
+        if row is None:  # 未命中
+            return None
+        keys = ('fps', 'frame_count', 'duration', 'width', 'height', 'codec', 'preview')  # 字段名
+        return dict(zip(keys, row))  # 返回元数据字典
+
+    def put(self, path, info):
+        # 写入或更新缓存
+        size, mtime_ns = _file_key(path)  # 当前文件大小和修改时间
+        conn = self._connect()  # 获取连接
+        with conn:  # 在事务中执行
+            conn.execute(
+                "INSERT OR REPLACE INTO media (path, size, mtime_ns, fps, frame_count, duration,"
+                " width, height, codec, preview) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (path, size, mtime_ns, info['fps'], info['frame_count'], info['duration'],
+                 info['width'], info['height'], info['codec'], info['preview'])
+            )  # 写入元数据
+
+    def get_or_probe(self, path):
+        # 命中缓存直接返回，否则读取视频并写入缓存
+        info = self.get(path)  # 查询缓存
+        if info is None:  # 未命中
+            info = probe_video(path)  # 读取视频
+            self.put(path, info)  # 写入缓存
+        return info
+
+    def close(self):
+        # 关闭当前线程的数据库连接
+        conn = getattr(self._local, "conn", None)  # 获取当前线程连接
+        if conn is not None:  # 存在连接
+            conn.close()  # 关闭连接
+            self._local.conn = None  # 清除引用
+
+
+class MediaPrefetchThread(QThread):
+    """
+    常驻预取线程：为目录中尚未缓存的视频读取元数据和预览图；
+    probe() 请求的视频（界面刚选择、缓存未命中）优先于目录预取处理，结果通过 probed_signal 发回界面
+    """
+    progress_signal = pyqtSignal(int, int)  # 定义信号，传递已处理数和总数
+    probed_signal = pyqtSignal(str, object)  # 定义信号，传递视频路径和元数据字典（读取失败时为None）
+
+    def __init__(self, cache):
+        super().__init__()  # 调用父类初始化方法
+        self.cache = cache  # 媒体缓存
+        self.requests = queue.Queue()  # 界面请求立即读取的视频路径
+        self.lock = threading.Lock()  # 保护待预取目录
+        self.directory = None  # 当前预取的目录
+        self.pending_directory = None  # 界面设置、尚未开始预取的目录
+        self.running = True  # 设置运行标志
+
+    def prefetch(self, directory):
+        # 切换预取目录（与当前目录相同时忽略），在下一个文件之前生效
+        with self.lock:  # 加锁
+            if directory != self.directory:  # 新目录
+                self.directory = self.pending_directory = directory
+
+    def probe(self, path):
+        # 请求读取指定视频，完成后发送 probed_signal
+        self.requests.put(path)
+
+    def _probe(self, path):
+        # 读取视频元数据（命中缓存时直接返回），失败时返回None
+        try:
+            return self.cache.get_or_probe(path)  # 未缓存时读取并写入
+        except (OSError, sqlite3.Error):  # 单个文件失败不影响其他文件
+            return None
+
+    def run(self):
+        paths = []  # 当前目录中尚未预取的视频
+        total = 0  # 当前目录的视频总数
+        while self.running:  # 常驻循环
+            try:
+                path = self.requests.get(timeout=0.1) if not paths else self.requests.get_nowait()  # 优先处理界面请求
+            except queue.Empty:  # 没有请求
+                path = None
+            if path is not None:  # 界面请求
+                self.probed_signal.emit(path, self._probe(path))
+                continue
+            with self.lock:  # 加锁
+                directory, self.pending_directory = self.pending_directory, None  # 取出新目录
+            if directory is not None:  # 切换到新目录
+                try:
+                    with os.scandir(directory) as entries:  # 遍历目录
+                        paths = [e.path for e in entries if e.is_file() and e.name.lower().endswith(VIDEO_EXTENSIONS)]  # 过滤视频文件
+                except OSError:  # 目录不可访问
+                    paths = []
+                total = len(paths)  # 视频总数
+                continue
+            if paths:  # 预取下一个视频
+                self._probe(paths.pop(0))
+                self.progress_signal.emit(total - len(paths), total)  # 发送进度
+        self.cache.close()  # 关闭本线程的数据库连接
+
+    def stop(self):
+        self.running = False  # 设置运行标志为False，停止循环
+        self.wait()  # 等待线程结束（最多等待当前视频读取完成）
@@ -0,0 +1,128 @@
+# 模型热切换与A/B对比：后台加载并预热新模型，检测线程在帧与帧之间替换；A/B模式下抽样对比两个模型的结果和延迟
+
+# 导入必要的库
+import os  # 导入操作系统模块，用于查找模型文件
+import time  # 导入时间模块，用于计时
+import numpy as np  # 导入NumPy库，用于生成预热输入
+from PyQt5.QtCore import QThread, pyqtSignal  # 导入Qt线程和信号
+from alert_engine import box_iou  # 导入边界框交并比函数
+from inference_backend import create_backend  # 导入推理后端（进程内模型或本地推理服务）
+
+MODEL_EXTENSIONS = ('.pt', '.onnx', '.torchscript')  # 模型选择对话框中的文件类型
+WARMUP_RUNS = 2  # 预热推理次数（第一次推理包含内存分配和算子初始化，明显慢于之后）
+MATCH_IOU = 0.5  # 两个模型的框视为同一目标的最小交并比
+ANOMALY_CLASS_ID = 0  # 异常类别ID
+
+
+def find_models(roots=(".", "runs", "experiments")):
+    """
+    查找可选的模型文件：当前目录下的模型，以及训练输出目录（runs/、experiments/）中的 weights/*.pt
+    """
+    models = []  # 模型路径列表
+    for root in roots:  # 遍历搜索目录
+        if not os.path.isdir(root):  # 目录不存在
+            continue
+        if root == ".":  # 当前目录只看第一层
+            models += sorted(name for name in os.listdir(root) if name.endswith(MODEL_EXTENSIONS))
+            continue
+        for dirpath, _, filenames in os.walk(root):  # 遍历训练输出目录
+            if os.path.basename(dirpath) == "weights":  # ultralytics 训练保存的权重目录
+                models += sorted(os.path.join(dirpath, name) for name in filenames if name.endswith(".pt"))
+    return models
+
+
+def model_profile(profile, model_path, tuned_model_path):
+    """
+    返回加载指定模型使用的推理配置：调优配置中导出的ONNX/OpenVINO模型只对应调优时的原始模型，
+    切换到其他权重文件时改用原始torch后端，线程数、输入尺寸和批大小保持不变
+    """
+    if model_path == tuned_model_path or not profile.get("model_path"):  # 调优时的模型或未导出
+        return profile
+    return dict(profile, backend="torch", model_path=None)  # 不使用导出的模型
+
+
+class ModelLoaderThread(QThread):
+    # 模型加载线程：创建推理后端并预热，完成后把后端交给界面线程（由界面转交给检测线程）
+    loaded_signal = pyqtSignal(object, str, float)  # 定义信号，传递推理后端、模型路径和加载耗时（毫秒）
+    error_signal = pyqtSignal(str, str)  # 定义信号，传递模型路径和错误信息
+
+    def __init__(self, model_path, profile, server_address=None):
+        super().__init__()  # 调用父类初始化方法
+        self.model_path = model_path  # 模型路径
+        self.profile = profile  # 推理配置
+        self.server_address = server_address  # 推理服务地址
+
+    def run(self):
+        t0 = time.perf_counter()  # 开始时间
+        try:
+            backend = create_backend(self.model_path, self.profile, self.server_address)  # 创建推理后端
+            imgsz = int(self.profile.get("imgsz") or 640)  # 推理输入尺寸
+            dummy = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)  # 预热输入
+            for _ in range(WARMUP_RUNS):  # 预热，切换后第一帧不会卡顿
+                backend.predict([dummy])
+        except Exception as e:  # 模型文件无效或服务不可用
+            self.error_signal.emit(self.model_path, str(e))  # 通知界面
+            return
+        self.loaded_signal.emit(backend, self.model_path, (time.perf_counter() - t0) * 1000)  # 发送已预热的后端
+
+
+def detections_disagree(a, b, class_id=None, iou_threshold=MATCH_IOU):
+    """
+    判断两个模型对同一帧的检测结果是否不一致：按置信度从高到低贪心匹配同类别且交并比足够的框，
+    任一方有未匹配的框即为不一致；class_id 不为None时只比较该类别
+    """
+    if class_id is not None:  # 只比较指定类别
+        a = [d for d in a if d['class_id'] == class_id]
+        b = [d for d in b if d['class_id'] == class_id]
+    if len(a) != len(b):  # 数量不同必然不一致
+        return True
+    unmatched = list(b)  # 尚未匹配的框
+    for d in sorted(a, key=lambda d: d['confidence'], reverse=True):  # 按置信度从高到低
+        best, best_iou = None, iou_threshold  # 最佳匹配
+        for candidate in unmatched:  # 寻找同类别交并比最大的框
+            if candidate['class_id'] == d['class_id']:
+                iou = box_iou(d['box'], candidate['box'])  # 交并比
+                if iou >= best_iou:
+                    best, best_iou = candidate, iou
+        if best is None:  # 没有匹配的框
+            return True
+        unmatched.remove(best)  # 标记为已匹配
+    return False
+
+
+class ABComparator:
+    """
+    A/B对比统计：累计抽样帧数、结果不一致的帧数、异常判断相反的帧数以及两个模型的单帧推理延迟
+    """
+
+    def __init__(self, model_a, model_b):
+        self.model_a = model_a  # 当前模型（A）
+        self.model_b = model_b  # 候选模型（B）
+        self.frames = 0  # 抽样帧数
+        self.disagree = 0  # 检测结果不一致的帧数
+        self.anomaly_flip = 0  # 一个模型报告异常而另一个没有的帧数
+        self.ms_a = 0.0  # A 累计推理耗时（毫秒）
+        self.ms_b = 0.0  # B 累计推理耗时（毫秒）
+
+    def record(self, detections_a, detections_b, ms_a, ms_b):
+        # 记录一批抽样帧（两个列表按帧对应），ms_a / ms_b 为该批的总推理耗时
+        for a, b in zip(detections_a, detections_b):  # 逐帧比较
+            self.frames += 1
+            self.disagree += detections_disagree(a, b)  # 框级不一致
+            self.anomaly_flip += (any(d['class_id'] == ANOMALY_CLASS_ID for d in a)
+                                  != any(d['class_id'] == ANOMALY_CLASS_ID for d in b))  # 异常判断相反
+        self.ms_a += ms_a
+        self.ms_b += ms_b
+
+    def metrics(self):
+        # 当前对比结果，用于界面显示
+        n = max(1, self.frames)  # 避免除零
+        return {
+            'model_a': self.model_a,  # 当前模型
+            'model_b': self.model_b,  # 候选模型
+            'frames': self.frames,  # 抽样帧数
+            'disagreement': self.disagree / n,  # 检测结果不一致率
+            'anomaly_flip': self.anomaly_flip / n,  # 异常判断相反的比例
+            'ms_a': self.ms_a / n,  # A 单帧推理延迟（毫秒）
+            'ms_b': self.ms_b / n  # B 单帧推理延迟（毫秒）
+        }
@@ -0,0 +1,158 @@
+# 离线分析：把单个长视频按时间切分成多个片段，在进程池中并行推理
+# 用法: python offline_analysis.py video.mp4 --workers 8 --threads 4 --output detections.jsonl
+
+# 导入必要的库
+import os  # 导入操作系统模块，用于获取CPU核数和文件检查
+import sys  # 导入系统模块，用于退出程序
+import json  # 导入JSON模块，用于输出检测结果
+import argparse  # 导入命令行参数解析模块
+import multiprocessing  # 导入多进程模块，用于创建进程上下文
+from concurrent.futures import ProcessPoolExecutor, as_completed  # 导入进程池
+import cv2  # 导入OpenCV库，用于视频读取
+
+
+def split_segments(total_frames, num_segments):
+    """
+    把 [0, total_frames) 均匀切分为 num_segments 个 (start, end) 片段，end 不包含
+    """
+    num_segments = max(1, min(num_segments, total_frames))  # 片段数不超过总帧数
+    step = total_frames / num_segments  # 每个片段的平均帧数
+    bounds = [int(round(i * step)) for i in range(num_segments + 1)]  # 计算片段边界
+    return [(bounds[i], bounds[i + 1]) for i in range(num_segments) if bounds[i] < bounds[i + 1]]  # 生成片段列表
+
+
+SEEK_BACKOFF_FRAMES = 64  # 定位越过目标时首次回退的帧数，之后每次加倍
+
+
+def open_at(video_path, start):
+    """
+    打开视频并定位到第 start 帧，返回视频捕获对象；定位结果不准确时（部分编码只能定位到关键帧）
+    从实际位置向后逐帧跳过，定位失败或越过目标时逐步提前定位点重试，都失败时才从头逐帧跳过，
+    保证片段之间没有重叠和缺口
+    """
+    cap = cv2.VideoCapture(video_path)  # 打开视频文件
+    if start <= 0:  # 从头开始，无需定位
+        return cap
+    target = start  # 本次定位的目标帧
+    backoff = SEEK_BACKOFF_FRAMES  # 下次回退的帧数
+    while True:
+        ok = cap.set(cv2.CAP_PROP_POS_FRAMES, target)  # 定位
+        pos = int(cap.get(cv2.CAP_PROP_POS_FRAMES)) if ok else -1  # 实际位置
+        if 0 <= pos <= start:  # 落在片段起点之前，向后逐帧跳过即可
+            break
+        if target == 0:  # 提前到开头仍然失败
+            break
+        target = max(0, target - backoff)  # 提前定位点
+        backoff *= 2  # 回退帧数加倍
+    if not 0 <= pos <= start:  # 无法定位，从头开始
+        print(f"{video_path}: 无法定位到第 {start} 帧，从头逐帧跳过", file=sys.stderr)  # 输出提示，该片段会明显变慢
+        cap.release()
+        cap = cv2.VideoCapture(video_path)  # 重新打开
+        pos = 0
+    while pos < start and cap.grab():  # 逐帧跳过到片段起点（只解复用和解码，不转换颜色）
+        pos += 1
+    return cap
+
+
+def _analyze_segment(video_path, model_path, start, end, threads_per_worker):
+    """
+    工作进程入口：定位到片段起点，使用独立的模型实例逐帧推理，返回 [(全局帧号, 检测结果), ...]；
+    end 为None时读取到视频结束（最后一个片段，元数据中的帧数可能偏小）
+    """
+    import torch  # 在工作进程中导入torch，设置线程数
+    from ultralytics import YOLO  # 导入YOLOv8模型
+    from detection_utils import extract_detections  # 导入检测结果转换函数
+
+    torch.set_num_threads(threads_per_worker)  # 限制每个工作进程的算子内线程数，避免进程间争抢CPU
+    cv2.setNumThreads(1)  # 解码和预处理使用单线程
+
+    model = YOLO(model_path)  # 每个工作进程加载自己的模型实例
+    cap = open_at(video_path, start)  # 打开视频并准确定位到片段起点
+
+    segment_results = []  # 片段内的检测结果
+    frame_index = start  # 当前全局帧号
+    while end is None or frame_index < end:  # 处理到片段终点（最后一个片段读到视频结束）
+        ret, frame = cap.read()  # 读取一帧
+        if not ret:  # 读取失败（视频结束）
+            break
+        results = model(frame, verbose=False)  # 对当前帧进行目标检测
+        segment_results.append((frame_index, extract_detections(results)))  # 记录全局帧号和检测结果
+        frame_index += 1  # 帧号加1
+
+    cap.release()  # 释放视频捕获对象
+    return segment_results  # 返回片段检测结果
+
+
+def analyze_video_parallel(video_path, model_path="best.pt", workers=None, threads_per_worker=1,
+                           segments_per_worker=1, progress_callback=None):
+    """
+    并行分析整个视频，按全局帧号顺序逐个产出 (frame_index, detections)
+
+    - workers: 工作进程数，默认 CPU核数 // threads_per_worker
+    - threads_per_worker: 每个工作进程的torch线程数
+    - segments_per_worker: 每个工作进程平均分到的片段数，大于1时负载更均衡
+    - progress_callback: 每完成一个片段调用一次，参数为 (已完成片段数, 总片段数)
+    """
+    cap = cv2.VideoCapture(video_path)  # 打开视频文件读取元数据
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))  # 获取视频总帧数
+    cap.release()  # 释放视频捕获对象
+    if total_frames <= 0:  # 无法获取帧数
+        raise ValueError(f"无法读取视频帧数: {video_path}")
+
+    if workers is None:  # 未指定工作进程数
+        workers = max(1, (os.cpu_count() or 1) // threads_per_worker)  # 按CPU核数和每进程线程数计算
+    segments = split_segments(total_frames, workers * segments_per_worker)  # 切分片段
+
+    # 使用spawn方式创建进程，避免在已加载torch/Qt的进程中fork
+    context = multiprocessing.get_context("spawn")  # 获取spawn上下文
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:  # 创建进程池
+        futures = {
+            executor.submit(_analyze_segment, video_path, model_path, start,
+                            end if i < len(segments) - 1 else None, threads_per_worker): i
+            for i, (start, end) in enumerate(segments)
+        }  # 提交所有片段，记录片段序号（最后一个片段读到视频结束，不依赖可能不准确的帧数）
+
+        finished = {}  # 已完成但尚未按顺序产出的片段结果
+        next_segment = 0  # 下一个要产出的片段序号
+        for done_count, future in enumerate(as_completed(futures), 1):  # 按完成顺序获取结果
+            finished[futures[future]] = future.result()  # 保存片段结果（工作进程异常会在这里抛出）
+            if progress_callback is not None:  # 设置了进度回调
+                progress_callback(done_count, len(segments))  # 报告进度
+            while next_segment in finished:  # 按片段顺序产出已就绪的结果
+                for item in finished.pop(next_segment):  # 逐帧产出
+                    yield item
+                next_segment += 1  # 下一个片段
+
+
+def main():
+    # 命令行入口
+    parser = argparse.ArgumentParser(description="长视频分段并行离线分析")  # 创建参数解析器
+    parser.add_argument("video", help="视频文件路径")  # 视频路径
+    parser.add_argument("--model", default="best.pt", help="模型文件路径")  # 模型路径
+    parser.add_argument("--workers", type=int, default=None, help="工作进程数，默认按CPU核数计算")  # 工作进程数
+    parser.add_argument("--threads", type=int, default=1, help="每个工作进程的torch线程数")  # 每进程线程数
+    parser.add_argument("--segments-per-worker", type=int, default=1, help="每个工作进程分到的片段数")  # 片段粒度
+    parser.add_argument("--output", default=None, help="输出JSON Lines文件，默认输出到标准输出")  # 输出文件
+    args = parser.parse_args()  # 解析参数
+
+    if not os.path.exists(args.model):  # 检查模型文件是否存在
+        print(f"模型文件 {args.model} 不存在!", file=sys.stderr)  # 输出错误信息
+        return 1
+
+    def report(done, total):
+        # 输出片段进度
+        print(f"已完成片段 {done}/{total}", file=sys.stderr)  # 进度输出到标准错误
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout  # 打开输出
+    try:
+        for frame_index, detections in analyze_video_parallel(
+                args.video, args.model, args.workers, args.threads, args.segments_per_worker, report):  # 按顺序获取检测结果
+            out.write(json.dumps({"frame": frame_index, "detections": detections}, ensure_ascii=False) + "\n")  # 每帧一行
+    finally:
+        if out is not sys.stdout:  # 输出到文件时关闭文件
+            out.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
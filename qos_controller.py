@@ -0,0 +1,111 @@
+# 在线服务质量（QoS）控制：根据实测每帧耗时和推理延迟，在运行时调整推理输入尺寸和关键帧间隔，
+# 使视频处理速度保持在目标帧率附近
+
+# 导入必要的库
+import time  # 导入时间模块，用于滞回计时
+
+DEGRADE_SIZES = (480, 384, 320)  # 降级时依次尝试的输入尺寸
+DEGRADE_STRIDES = (2, 3, 4)  # 输入尺寸降到最低后依次尝试的关键帧间隔
+
+
+def build_levels(imgsz=640, dynamic_imgsz=True):
+    """
+    生成质量等级列表，等级0为最高质量：先降低输入尺寸，再增大关键帧间隔
+    导出为固定尺寸的后端（ONNX/OpenVINO）不能改变输入尺寸，只调整关键帧间隔
+    """
+    sizes = [imgsz] + ([s for s in DEGRADE_SIZES if s < imgsz] if dynamic_imgsz else [])  # 可用输入尺寸
+    levels = [{'imgsz': s, 'stride': 1} for s in sizes]  # 每帧推理的等级
+    levels += [{'imgsz': sizes[-1], 'stride': k} for k in DEGRADE_STRIDES]  # 跳帧推理的等级
+    return levels
+
+
+class QosController:
+    """
+    带滞回的质量等级控制器
+
+    每处理一批帧调用一次 record()，用指数滑动平均估计每帧耗时和推理延迟。
+    超出预算持续 degrade_after 秒才降一级，低于预算的 headroom 倍持续 upgrade_after 秒才升一级，
+    两者之间不调整；每次调整后重新开始计时，避免等级来回振荡。
+    """
+
+    def __init__(self, levels, target_fps=25.0, latency_budget_ms=None, degrade_after=1.0,
+                 upgrade_after=5.0, headroom=0.75, smoothing=0.2):
+        self.levels = levels  # 质量等级列表
+        self.target_fps = target_fps if target_fps and target_fps > 0 else 25.0  # 目标处理帧率
+        self.latency_budget_ms = latency_budget_ms  # 单次推理延迟预算（毫秒），None表示不限制
+        self.degrade_after = degrade_after  # 持续超预算多少秒后降级
+        self.upgrade_after = upgrade_after  # 持续有余量多少秒后升级
+        self.headroom = headroom  # 升级所需的余量比例
+        self.smoothing = smoothing  # 指数滑动平均系数
+        self.level = 0  # 当前等级
+        self.frame_ms = None  # 每帧耗时的滑动平均（毫秒）
+        self.infer_ms = None  # 推理延迟的滑动平均（毫秒）
+        self.over_since = None  # 开始持续超预算的时间
+        self.under_since = None  # 开始持续有余量的时间
+        self.changes = 0  # 等级调整次数
+
+    def current(self):
+        # 当前等级的参数 {'imgsz', 'stride'}
+        return self.levels[self.level]
+
+    def record(self, frames, elapsed, infer_ms=None, now=None):
+        """
+        记录一批帧的处理耗时（秒）和其中的推理延迟（毫秒），返回等级是否发生变化
+        """
+        if frames <= 0:  # 没有处理任何帧
+            return False
+        self.frame_ms = self._smooth(self.frame_ms, elapsed * 1000 / frames)  # 更新每帧耗时
+        if infer_ms is not None:  # 本批执行了推理
+            self.infer_ms = self._smooth(self.infer_ms, infer_ms)  # 更新推理延迟
+        return self._adjust(time.monotonic() if now is None else now)  # 根据预算调整等级
+
+    def _smooth(self, value, sample):
+        # 指数滑动平均
+        return sample if value is None else value + self.smoothing * (sample - value)
+
+    def _adjust(self, now):
+        # 滞回控制：超预算/有余量都需要持续一段时间才调整
+        budget_ms = 1000.0 / self.target_fps  # 每帧耗时预算
+        latency_ok = self.latency_budget_ms is None or self.infer_ms is None  # 未设置推理延迟预算
+        over = self.frame_ms > budget_ms or (not latency_ok and self.infer_ms > self.latency_budget_ms)  # 超出预算
+        under = self.frame_ms < budget_ms * self.headroom and (
+            latency_ok or self.infer_ms < self.latency_budget_ms * self.headroom)  # 有足够余量
+
+        if over:  # 超出预算
+            self.under_since = None  # 中断余量计时
+            if self.over_since is None:  # 开始计时
+                self.over_since = now
+            elif now - self.over_since >= self.degrade_after and self.level < len(self.levels) - 1:  # 持续超预算
+                return self._set_level(self.level + 1, now)  # 降一级
+        elif under:  # 有余量
+            self.over_since = None  # 中断超预算计时
+            if self.under_since is None:  # 开始计时
+                self.under_since = now
+            elif now - self.under_since >= self.upgrade_after and self.level > 0:  # 持续有余量
+                return self._set_level(self.level - 1, now)  # 升一级
+        else:  # 处于滞回区间内，保持当前等级
+            self.over_since = self.under_since = None
+        return False
+
+    def _set_level(self, level, now):
+        # 切换等级并重新开始计时和测量
+        self.level = level  # 设置新等级
+        self.changes += 1  # 调整次数加1
+        self.over_since = self.under_since = None  # 重新计时
+        self.frame_ms = self.infer_ms = None  # 丢弃旧等级下的测量值
+        return True
+
+    def metrics(self):
+        # 当前等级和测量值，用于界面显示和日志
+        level = self.current()  # 当前等级参数
+        return {
+            'level': self.level,  # 当前等级（0为最高质量）
+            'levels': len(self.levels),  # 等级总数
+            'imgsz': level['imgsz'],  # 推理输入尺寸
+            'stride': level['stride'],  # 关键帧间隔
+            'target_fps': self.target_fps,  # 目标帧率
+            'fps': 1000.0 / self.frame_ms if self.frame_ms else 0.0,  # 实测处理帧率
+            'frame_ms': self.frame_ms or 0.0,  # 每帧耗时（毫秒）
+            'infer_ms': self.infer_ms or 0.0,  # 推理延迟（毫秒）
+            'changes': self.changes  # 等级调整次数
+        }
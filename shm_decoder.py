@@ -0,0 +1,199 @@
+# 独立进程解码：解码进程把帧写入预分配的共享内存环形缓冲区，推理和显示按槽位号零拷贝读取
+
+# 导入必要的库
+import queue  # 导入队列模块，用于超时异常
+import multiprocessing  # 导入多进程模块，用于解码进程和槽位队列
+from multiprocessing import shared_memory  # 导入共享内存
+import cv2  # 导入OpenCV库，用于视频解码
+import numpy as np  # 导入NumPy库，用于在共享内存上创建数组视图
+
+
+def _decoder_main(video_path, shm_name, shape, start_frame, free_slots, filled_slots, stop_event):
+    """
+    解码进程入口：从空闲队列取得槽位，直接解码到该槽位的共享内存，再把槽位号放入就绪队列
+
+    槽位在任一时刻只属于一方（解码进程或读取方），所有权随队列消息转移，因此读取方不会看到写了一半的帧
+    """
+    cv2.setNumThreads(1)  # 解码进程只使用单线程预处理
+    shm = shared_memory.SharedMemory(name=shm_name)  # 连接到父进程创建的共享内存
+    slot_bytes = int(np.prod(shape))  # 每个槽位的字节数
+    slots = [np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=i * slot_bytes)
+             for i in range(shm.size // slot_bytes)]  # 每个槽位的数组视图
+
+    cap = cv2.VideoCapture(video_path)  # 打开视频文件
+    if start_frame:  # 需要从指定帧开始
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)  # 定位到起始帧
+    frame_index = start_frame  # 当前帧号
+    view = frame = None  # 当前槽位视图和解码结果
+    try:
+        while not stop_event.is_set():  # 未收到停止信号时持续解码
+            try:
+                slot = free_slots.get(timeout=0.1)  # 等待空闲槽位（读取方处理慢时在此形成背压）
+            except queue.Empty:  # 暂无空闲槽位
+                continue
+            view = slots[slot]  # 槽位视图
+            ret, frame = cap.read(image=view)  # 直接解码到共享内存
+            if not ret:  # 视频结束
+                break
+            if frame.shape != view.shape:  # 实际分辨率与探测结果不一致
+                cv2.resize(frame, (shape[1], shape[0]), dst=view)  # 缩放写入槽位
+            elif frame.ctypes.data != view.ctypes.data:  # OpenCV重新分配了缓冲区
+                view[...] = frame  # 复制到槽位
+            filled_slots.put((slot, frame_index))  # 把槽位交给读取方
+            frame_index += 1  # 帧号加1
+    finally:
+        cap.release()  # 释放视频捕获对象
+        filled_slots.put(None)  # 发送结束标记
+        del slots, view, frame  # 释放对共享内存的引用
+        shm.close()  # 断开共享内存
+
+
+class CaptureFrameSource:
+    """
+    进程内解码的帧来源（与原来直接使用 cv2.VideoCapture 等价）
+
+    提供帧缓冲池时直接解码到池中的缓冲区，read() 返回的槽位号在使用完毕后通过 release(slot) 归还
+    """
+
+    def __init__(self, video_path, start_frame=0, metadata=None, pool=None):
+        self.cap = cv2.VideoCapture(video_path)  # 打开视频文件
+        self.pool = pool  # 帧缓冲池，None时每帧由OpenCV分配新数组
+        self.buffers = {}  # 槽位号 -> 借出的缓冲区
+        self.next_slot = 0  # 下一个槽位号
+        self.shape = (int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                      int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)), 3)  # 帧形状（BGR）
+        if start_frame:  # 需要从指定帧开始
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)  # 定位到起始帧
+        if metadata:  # 有缓存的元数据
+            self.total_frames, self.fps = metadata['frame_count'], metadata['fps']  # 使用缓存的帧数和帧率
+        else:  # 从视频读取
+            self.total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))  # 获取视频总帧数
+            self.fps = self.cap.get(cv2.CAP_PROP_FPS)  # 获取视频帧率
+
+    def read(self):
+        # 读取一帧，返回 (是否成功, 帧, 槽位号)，不使用缓冲池时槽位号固定为-1
+        if self.pool is None or min(self.shape) <= 0:  # 不使用缓冲池或无法获取分辨率
+            ret, frame = self.cap.read()  # 读取一帧
+            return ret, frame, -1
+        buffer = self.pool.acquire(self.shape)  # 借出缓冲区
+        ret, frame = self.cap.read(image=buffer)  # 直接解码到缓冲区
+        if not ret:  # 视频结束
+            self.pool.release(buffer)  # 归还缓冲区
+            return False, None, -1
+        if frame.ctypes.data != buffer.ctypes.data:  # 实际分辨率不同，OpenCV重新分配了数组
+            self.pool.release(buffer)  # 归还未使用的缓冲区
+            buffer = self.pool.adopt(frame)  # 接管新数组，之后按新形状复用
+            self.shape = frame.shape  # 更新帧形状
+        slot = self.next_slot  # 分配槽位号
+        self.next_slot += 1  # 槽位号自增
+        self.buffers[slot] = buffer  # 记录借出的缓冲区
+        return True, buffer, slot
+
+    def release(self, slot):
+        # 使用完毕后把缓冲区归还到池中
+        buffer = self.buffers.pop(slot, None)  # 取出借出的缓冲区
+        if buffer is not None:  # 有效槽位
+            self.pool.release(buffer)
+
+    def close(self):
+        self.cap.release()  # 释放视频捕获对象
+
+
+class SharedMemoryDecoder:
+    """
+    共享内存环形缓冲区帧来源：解码在独立进程中进行，不与推理线程争抢GIL
+
+    read() 返回的帧是共享内存上的视图，使用完毕后必须调用 release(slot) 归还槽位
+    """
+
+    def __init__(self, video_path, num_slots=16, start_frame=0, metadata=None):
+        if metadata and metadata['width'] > 0 and metadata['height'] > 0:  # 有缓存的元数据时无需再次打开视频
+            width, height = metadata['width'], metadata['height']  # 帧宽高
+            self.total_frames, self.fps = metadata['frame_count'], metadata['fps']  # 帧数和帧率
+        else:  # 打开视频探测分辨率等信息
+            probe = cv2.VideoCapture(video_path)  # 打开视频文件
+            width = int(probe.get(cv2.CAP_PROP_FRAME_WIDTH))  # 帧宽度
+            height = int(probe.get(cv2.CAP_PROP_FRAME_HEIGHT))  # 帧高度
+            self.total_frames = int(probe.get(cv2.CAP_PROP_FRAME_COUNT))  # 获取视频总帧数
+            self.fps = probe.get(cv2.CAP_PROP_FPS)  # 获取视频帧率
+            probe.release()  # 释放探测用的捕获对象
+        if width <= 0 or height <= 0:  # 无法获取分辨率
+            raise ValueError(f"无法读取视频分辨率: {video_path}")
+
+        self.shape = (height, width, 3)  # 帧形状（BGR）
+        slot_bytes = height * width * 3  # 每个槽位的字节数
+        self.shm = shared_memory.SharedMemory(create=True, size=slot_bytes * num_slots)  # 预分配共享内存
+        self.slots = [np.ndarray(self.shape, dtype=np.uint8, buffer=self.shm.buf, offset=i * slot_bytes)
+                      for i in range(num_slots)]  # 每个槽位的数组视图
+
+        context = multiprocessing.get_context("spawn")  # 使用spawn方式创建解码进程
+        self.free_slots = context.Queue()  # 空闲槽位队列（读取方 -> 解码进程）
+        self.filled_slots = context.Queue()  # 就绪槽位队列（解码进程 -> 读取方）
+        self.stop_event = context.Event()  # 停止信号
+        for i in range(num_slots):  # 初始时所有槽位都空闲
+            self.free_slots.put(i)
+        self.process = context.Process(
+            target=_decoder_main,
+            args=(video_path, self.shm.name, self.shape, start_frame,
+                  self.free_slots, self.filled_slots, self.stop_event),
+            daemon=True
+        )  # 创建解码进程
+        self.process.start()  # 启动解码进程
+        self.finished = False  # 是否已读到结束标记
+
+    def read(self):
+        # 读取一帧，返回 (是否成功, 帧视图, 槽位号)
+        if self.finished:  # 已经结束
+            return False, None, -1
+        while True:  # 等待下一个就绪槽位
+            try:
+                item = self.filled_slots.get(timeout=0.5)  # 获取就绪槽位
+                break
+            except queue.Empty:  # 暂无就绪帧
+                if not self.process.is_alive() and self.filled_slots.empty():  # 解码进程异常退出，不会再有结束标记
+                    item = None  # 按结束处理
+                    break
+        if item is None:  # 结束标记
+            self.finished = True  # 标记结束
+            return False, None, -1
+        slot, _ = item  # 槽位号和帧号
+        return True, self.slots[slot], slot  # 返回零拷贝视图
+
+    def release(self, slot):
+        # 归还槽位，解码进程可以复用
+        if slot >= 0:  # 有效槽位
+            self.free_slots.put(slot)
+
+    def close(self):
+        # 停止解码进程并释放共享内存
+        self.stop_event.set()  # 通知解码进程停止
+        self.process.join(timeout=2)  # 等待解码进程退出
+        if self.process.is_alive():  # 仍未退出
+            self.process.terminate()  # 强制终止
+        for q in (self.free_slots, self.filled_slots):  # 关闭队列
+            q.cancel_join_thread()  # 不等待队列后台线程刷新
+            q.close()  # 关闭队列
+        self.slots = []  # 释放本对象持有的视图
+        try:
+            self.shm.close()  # 断开共享内存
+        except BufferError:  # 界面线程仍持有帧视图时无法立即断开，映射随最后一个视图释放
+            pass
+        try:
+            self.shm.unlink()  # 删除共享内存名称
+        except FileNotFoundError:  # 已被删除
+            pass
+
+
+def open_frame_source(video_path, shared=True, num_slots=16, start_frame=0, metadata=None, pool=None):
+    """
+    打开帧来源：优先使用共享内存解码进程，失败时回退到进程内解码
+
+    metadata 为媒体缓存中的元数据（帧率、帧数、分辨率），提供时不再单独打开视频读取这些信息；
+    pool 为进程内解码时使用的帧缓冲池
+    """
+    if shared:  # 使用独立进程解码
+        try:
+            return SharedMemoryDecoder(video_path, num_slots, start_frame, metadata)
+        except (OSError, ValueError):  # 共享内存不可用或无法探测分辨率
+            pass
+    return CaptureFrameSource(video_path, start_frame, metadata, pool)  # 回退到进程内解码
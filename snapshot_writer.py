@@ -0,0 +1,178 @@
+# 异常快照异步写入：有界队列 + 写入线程，按事件限速，磁盘配额超出时淘汰最旧的快照
+
+# 导入必要的库
+import os  # 导入操作系统模块，用于文件和路径操作
+import time  # 导入时间模块，用于限速和文件命名
+import queue  # 导入队列模块，用于有界任务队列
+import threading  # 导入线程模块，用于写入线程和锁
+from collections import deque  # 导入双端队列，用于按时间顺序记录快照文件
+from datetime import datetime  # 导入日期时间模块，用于按日期分目录
+import cv2  # 导入OpenCV库，用于JPEG编码
+
+SNAPSHOT_EXTENSION = ".jpg"  # 快照文件扩展名
+
+
+class DiskQuotaManager:
+    """
+    磁盘配额管理：按写入时间记录快照文件，总大小超过配额时删除最旧的文件
+    """
+
+    def __init__(self, root, quota_bytes):
+        self.root = root  # 快照根目录
+        self.quota_bytes = quota_bytes  # 配额（字节）
+        self.files = deque()  # (路径, 大小)，最旧的在左侧
+        self.total_bytes = 0  # 当前总大小
+        self.evicted = 0  # 已淘汰的文件数
+        self.lock = threading.Lock()  # 多个写入线程共享，需要加锁
+        self._scan_existing()  # 统计已有的快照文件
+
+    def _scan_existing(self):
+        # 启动时扫描已有快照，按修改时间排序
+        existing = []  # 已有文件
+        for dirpath, _, filenames in os.walk(self.root):  # 遍历快照目录
+            for name in filenames:  # 遍历文件
+                if name.endswith(SNAPSHOT_EXTENSION):  # 只统计快照文件
+                    path = os.path.join(dirpath, name)  # 完整路径
+                    st = os.stat(path)  # 文件信息
+                    existing.append((st.st_mtime, path, st.st_size))  # 记录修改时间、路径和大小
+        for _, path, size in sorted(existing):  # 按修改时间从旧到新加入
+            self.files.append((path, size))
+            self.total_bytes += size  # 累加大小
+        self.enforce()  # 启动时若已超配额则立即淘汰
+
+    def add(self, path, size):
+        # 记录新写入的文件并检查配额
+        with self.lock:  # 加锁
+            self.files.append((path, size))  # 加入记录
+            self.total_bytes += size  # 累加大小
+        self.enforce()  # 检查配额
+
+    def enforce(self):
+        # 淘汰最旧的文件直到总大小不超过配额
+        while True:  # 循环淘汰
+            with self.lock:  # 加锁
+                if self.total_bytes <= self.quota_bytes or not self.files:  # 未超配额
+                    return
+                path, size = self.files.popleft()  # 取出最旧的文件
+                self.total_bytes -= size  # 扣减大小
+                self.evicted += 1  # 淘汰计数加1
+            try:
+                os.remove(path)  # 删除文件
+            except FileNotFoundError:  # 文件已被手动删除
+                pass
+
+
+class SnapshotWriter:
+    """
+    异常快照写入器
+
+    submit() 在检测线程中调用，只做限速判断和帧复制并放入有界队列，从不阻塞；
+    队列满时直接丢弃并计数。写入线程负责JPEG编码、保存异常区域裁剪图和整帧上下文图。
+    """
+
+    def __init__(self, root="snapshots", workers=2, queue_size=32, min_interval=2.0,
+                 quota_bytes=2 * 1024 ** 3, jpeg_quality=90, crop_padding=0.2):
+        self.root = root  # 快照根目录
+        os.makedirs(root, exist_ok=True)  # 创建快照目录
+        self.min_interval = min_interval  # 同一事件两次快照的最小间隔（秒）
+        self.jpeg_params = [int(cv2.IMWRITE_JPEG_QUALITY), jpeg_quality]  # JPEG编码参数
+        self.crop_padding = crop_padding  # 裁剪区域向外扩展的比例
+        self.quota = DiskQuotaManager(root, quota_bytes)  # 磁盘配额管理
+        self.queue = queue.Queue(maxsize=queue_size)  # 有界任务队列
+        self.last_submit = {}  # 事件ID -> 上一次接受快照的时间
+        self.stats_lock = threading.Lock()  # 统计信息锁
+        self.stats = {"written": 0, "dropped": 0, "rate_limited": 0, "failed": 0}  # 统计信息
+        self.threads = [threading.Thread(target=self._worker, daemon=True) for _ in range(workers)]  # 写入线程
+        for t in self.threads:  # 启动写入线程
+            t.start()
+
+    def submit(self, frame, boxes, incident_id, frame_index=0, tag="video"):
+        """
+        提交一帧快照，返回是否被接受；被限速或队列已满时返回False
+        """
+        now = time.monotonic()  # 当前时间
+        last = self.last_submit.get(incident_id)  # 该事件上一次快照时间
+        if last is not None and now - last < self.min_interval:  # 未到限速间隔
+            self._count("rate_limited")  # 计数
+            return False
+        if self.queue.full():  # 队列已满，不复制帧直接丢弃
+            self._count("dropped")  # 计数
+            return False
+        task = (frame.copy(), list(boxes), incident_id, frame_index, tag, datetime.now())  # 复制帧（原帧可能被复用）
+        try:
+            self.queue.put_nowait(task)  # 放入队列，不阻塞
+        except queue.Full:  # 与其他提交方竞争时队列刚好满
+            self._count("dropped")  # 计数
+            return False
+        self.last_submit[incident_id] = now  # 记录接受时间
+        return True
+
+    def end_incident(self, incident_id):
+        # 事件结束后清除限速记录
+        self.last_submit.pop(incident_id, None)
+
+    def _count(self, key, n=1):
+        # 更新统计信息
+        with self.stats_lock:  # 加锁
+            self.stats[key] += n
+
+    def snapshot_stats(self):
+        # 返回统计信息快照
+        with self.stats_lock:  # 加锁
+            stats = dict(self.stats)  # 复制统计信息
+        stats["queued"] = self.queue.qsize()  # 排队中的任务数
+        stats["evicted"] = self.quota.evicted  # 已淘汰文件数
+        stats["disk_bytes"] = self.quota.total_bytes  # 当前占用空间
+        return stats
+
+    def _worker(self):
+        # 写入线程：编码并保存快照
+        while True:  # 持续处理
+            task = self.queue.get()  # 获取任务
+            if task is None:  # 退出标记
+                return
+            try:
+                self._write(*task)  # 写入快照
+            except Exception:  # 编码或写入失败不影响后续任务
+                self._count("failed")  # 计数
+            finally:
+                self.queue.task_done()  # 标记任务完成
+
+    def _write(self, frame, boxes, incident_id, frame_index, tag, when):
+        # 保存整帧上下文图和每个异常区域的裁剪图
+        day_dir = os.path.join(self.root, when.strftime("%Y%m%d"))  # 按日期分目录
+        os.makedirs(day_dir, exist_ok=True)  # 创建目录
+        prefix = f"{tag}_{when.strftime('%H%M%S_%f')}_event{incident_id}_frame{frame_index}"  # 文件名前缀
+
+        images = [("context", frame)]  # 整帧上下文图
+        h, w = frame.shape[:2]  # 帧尺寸
+        for i, (x1, y1, x2, y2) in enumerate(boxes):  # 异常区域裁剪图
+            pad_x = int((x2 - x1) * self.crop_padding)  # 横向扩展
+            pad_y = int((y2 - y1) * self.crop_padding)  # 纵向扩展
+            crop = frame[max(0, y1 - pad_y):min(h, y2 + pad_y), max(0, x1 - pad_x):min(w, x2 + pad_x)]  # 裁剪
+            if crop.size:  # 裁剪区域有效
+                images.append((f"crop{i}", crop))
+
+        for suffix, image in images:  # 逐个编码保存
+            ok, encoded = cv2.imencode(SNAPSHOT_EXTENSION, image, self.jpeg_params)  # JPEG编码
+            if not ok:  # 编码失败
+                self._count("failed")
+                continue
+            path = os.path.join(day_dir, f"{prefix}_{suffix}{SNAPSHOT_EXTENSION}")  # 文件路径
+            tmp_path = path + ".tmp"  # 临时文件，写完再改名，避免留下不完整的快照
+            with open(tmp_path, "wb") as f:  # 写入临时文件
+                f.write(encoded.tobytes())
+            os.replace(tmp_path, path)  # 原子改名
+            self.quota.add(path, len(encoded))  # 记录到配额管理
+            self._count("written")  # 计数
+
+    def close(self, timeout=5.0):
+        # 停止写入线程，尽量写完队列中剩余的快照
+        deadline = time.monotonic() + timeout  # 截止时间
+        for _ in self.threads:  # 每个写入线程一个退出标记
+            try:
+                self.queue.put(None, timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Full:  # 队列一直满，放弃剩余快照
+                break
+        for t in self.threads:  # 等待写入线程退出
+            t.join(max(0.0, deadline - time.monotonic()))
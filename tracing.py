@@ -0,0 +1,135 @@
+# 可选的性能追踪：记录各处理阶段的开始/结束时间和线程，存入环形缓冲区，导出为 Chrome trace JSON（可在 Perfetto 中查看）
+# 用法: with tracing.span("inference"): ...；设置环境变量 ANOMALY_TRACE=1 或在界面中开启
+
+# 导入必要的库
+import os  # 导入操作系统模块，用于读取环境变量和进程ID
+import json  # 导入JSON模块，用于导出追踪文件
+import time  # 导入时间模块，用于高精度计时
+import itertools  # 导入迭代工具，用于无锁的写入位置计数
+import threading  # 导入线程模块，用于获取线程ID和名称
+
+TRACE_ENV = "ANOMALY_TRACE"  # 启动时开启追踪的环境变量
+DEFAULT_CAPACITY = 1 << 16  # 环形缓冲区默认容量（事件数）
+
+
+class _NullSpan:
+    # 追踪关闭时使用的空上下文，所有调用共享同一个实例
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _Span:
+    # 追踪开启时的计时上下文
+    __slots__ = ("buffer", "name", "start")
+
+    def __init__(self, buffer, name):
+        self.buffer = buffer  # 所属环形缓冲区
+        self.name = name  # 阶段名称
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()  # 开始时间
+        return self
+
+    def __exit__(self, *exc):
+        self.buffer.record(self.name, self.start, time.perf_counter_ns())  # 记录事件
+        return False
+
+
+class TraceBuffer:
+    """
+    追踪事件环形缓冲区
+
+    写入位置由 itertools.count 分配（在GIL下是原子操作），每个事件写入一个预分配的列表元素，
+    写入方之间不需要加锁；缓冲区写满后覆盖最旧的事件。
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity  # 容量
+        self.events = [None] * capacity  # 预分配的事件槽位
+        self.counter = itertools.count()  # 写入位置计数
+        self.thread_names = {}  # 线程ID -> 线程名称
+        self.enabled = False  # 是否开启
+
+    def record(self, name, start_ns, end_ns):
+        # 写入一个完整事件（名称, 线程ID, 开始时间, 持续时间）
+        tid = threading.get_native_id()  # 系统线程ID，与性能分析工具一致
+        self.events[next(self.counter) % self.capacity] = (name, tid, start_ns, end_ns - start_ns)
+
+    def clear(self):
+        # 清空事件
+        self.events = [None] * self.capacity  # 重新分配槽位
+        self.counter = itertools.count()  # 重置写入位置
+
+    def to_chrome_trace(self):
+        # 转换为 Chrome trace 事件格式（时间单位为微秒）
+        events = sorted((e for e in list(self.events) if e is not None), key=lambda e: e[2])  # 按开始时间排序
+        pid = os.getpid()  # 进程ID
+        base = events[0][2] if events else 0  # 时间基准
+        trace = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+                 for tid, name in list(self.thread_names.items())]  # 线程名称元数据
+        trace += [{"name": name, "ph": "X", "pid": pid, "tid": tid,
+                   "ts": (start - base) / 1000.0, "dur": dur / 1000.0}
+                  for name, tid, start, dur in events]  # 完整事件
+        return {"traceEvents": trace, "displayTimeUnit": "ms"}
+
+
+_buffer = TraceBuffer()  # 全局环形缓冲区
+_NULL_SPAN = _NullSpan()  # 共享的空上下文
+
+
+def span(name):
+    """
+    返回记录一个阶段的上下文管理器；追踪关闭时返回共享的空上下文，开销只有一次属性判断
+    """
+    if not _buffer.enabled:  # 追踪关闭
+        return _NULL_SPAN
+    return _Span(_buffer, name)
+
+
+def set_thread_name(name):
+    # 为当前线程设置在追踪文件中显示的名称
+    _buffer.thread_names[threading.get_native_id()] = name
+
+
+def enable(capacity=None):
+    # 开启追踪（指定容量时重新分配缓冲区）
+    if capacity and capacity != _buffer.capacity:  # 调整容量
+        _buffer.capacity = capacity
+        _buffer.clear()
+    _buffer.enabled = True
+
+
+def disable():
+    # 关闭追踪（已记录的事件保留，可继续导出）
+    _buffer.enabled = False
+
+
+def is_enabled():
+    # 追踪是否开启
+    return _buffer.enabled
+
+
+def clear():
+    # 清空已记录的事件
+    _buffer.clear()
+
+
+def dump(path):
+    """
+    把已记录的事件导出为 Chrome trace JSON，返回事件数
+    """
+    trace = _buffer.to_chrome_trace()  # 转换格式
+    tmp_path = path + ".tmp"  # 临时文件
+    with open(tmp_path, "w", encoding="utf-8") as f:  # 写入临时文件
+        json.dump(trace, f, ensure_ascii=False)
+    os.replace(tmp_path, path)  # 原子改名
+    return sum(1 for e in trace["traceEvents"] if e["ph"] == "X")
+
+
+if os.environ.get(TRACE_ENV, "") not in ("", "0"):  # 环境变量开启追踪
+    enable()
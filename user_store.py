@@ -0,0 +1,175 @@
+# 导入必要的库
+import os  # 用于文件路径检查
+import json  # 用于读取旧版JSON用户数据
+import hmac  # 用于常量时间的哈希比较
+import hashlib  # 用于密码哈希
+import sqlite3  # 用于嵌入式数据库存储
+import secrets  # 用于生成随机盐值
+import threading  # 用于线程本地连接和缓存锁
+
+# 密码哈希参数
+PBKDF2_ALGORITHM = "pbkdf2_sha256"  # 哈希算法标识，写入存储的哈希字符串前缀
+PBKDF2_ITERATIONS = 200000  # PBKDF2迭代次数
+SALT_BYTES = 16  # 盐值字节数
+
+
+def hash_password(password, salt=None, iterations=PBKDF2_ITERATIONS):
+    """
+    使用加盐的PBKDF2-SHA256对密码进行哈希，返回 "算法$迭代次数$盐$哈希" 格式的字符串
+    """
+    if salt is None:  # 未指定盐值时随机生成
+        salt = secrets.token_hex(SALT_BYTES)  # 生成十六进制盐值
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt.encode(), iterations)  # 计算PBKDF2哈希
+    return f"{PBKDF2_ALGORITHM}${iterations}${salt}${digest.hex()}"  # 拼接存储格式
+
+
+def legacy_hash_password(password):
+    """
+    旧版无盐SHA-256哈希，仅用于校验从 user_data.json 迁移过来的账户
+    """
+    return hashlib.sha256(password.encode()).hexdigest()  # 对密码进行加密并返回十六进制字符串
+
+
+def verify_password(password, stored_hash):
+    """
+    校验密码是否与存储的哈希匹配，同时兼容旧版无盐SHA-256哈希
+    """
+    if stored_hash.startswith(PBKDF2_ALGORITHM + "$"):  # 新版加盐哈希
+        _, iterations, salt, _ = stored_hash.split("$", 3)  # 拆分出迭代次数和盐值
+        candidate = hash_password(password, salt, int(iterations))  # 用相同参数重新计算
+    else:  # 旧版无盐哈希
+        candidate = legacy_hash_password(password)  # 计算旧版哈希
+    return hmac.compare_digest(candidate, stored_hash)  # 常量时间比较，避免时序攻击
+
+
+def needs_rehash(stored_hash):
+    # 判断存储的哈希是否需要升级为当前的加盐格式
+    if not stored_hash.startswith(PBKDF2_ALGORITHM + "$"):  # 旧版哈希需要升级
+        return True
+    return int(stored_hash.split("$", 2)[1]) != PBKDF2_ITERATIONS  # 迭代次数变化也需要升级
+
+
+class UserStore:
+    """
+    基于SQLite（WAL模式）的用户存储
+
+    - 用户名为主键，查询走索引，并在内存中缓存已读取的账户
+    - 写入使用事务，多个程序实例同时注册时不会互相覆盖
+    - 首次打开时自动从旧版 user_data.json 迁移账户
+    """
+
+    def __init__(self, db_path="user_data.db", legacy_json_path="user_data.json"):
+        self.db_path = db_path  # 数据库文件路径
+        self.legacy_json_path = legacy_json_path  # 旧版JSON用户数据路径
+        self._local = threading.local()  # 每个线程独立的数据库连接
+        self._cache = {}  # 用户名 -> 账户记录的内存缓存
+        self._cache_lock = threading.Lock()  # 保护缓存的锁（同时保护版本检测连接）
+        # data_version 只在同一个连接上比较才有意义，用一个长期存在的连接检测其他连接的写入
+        self._version_conn = sqlite3.connect(db_path, timeout=10, check_same_thread=False)  # 版本检测连接（加锁后跨线程使用）
+        self._data_version = None  # 版本检测连接上次看到的数据版本号
+
+        self._init_schema()  # 初始化表结构
+        self._migrate_legacy_json()  # 迁移旧版JSON数据
+
+    def _connect(self):
+        # 获取当前线程的数据库连接（SQLite连接不能跨线程共享）
+        conn = getattr(self._local, "conn", None)  # 尝试获取已有连接
+        if conn is None:  # 当前线程还没有连接
+            conn = sqlite3.connect(self.db_path, timeout=10)  # 打开数据库，写锁冲突时最多等待10秒
+            conn.execute("PRAGMA journal_mode=WAL")  # 启用WAL模式，读写互不阻塞
+            conn.execute("PRAGMA synchronous=NORMAL")  # WAL模式下兼顾安全与性能
+            self._local.conn = conn  # 保存到线程本地
+        return conn  # 返回连接
+
+    def _init_schema(self):
+        # 创建用户表和元数据表
+        conn = self._connect()  # 获取连接
+        with conn:  # 在事务中执行
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS users ("
+                " username TEXT PRIMARY KEY,"
+                " password TEXT NOT NULL,"
+                " is_admin INTEGER NOT NULL DEFAULT 0)"
+            )  # 用户表，用户名为主键
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+            )  # 元数据表，记录迁移状态等
+
+    def _migrate_legacy_json(self):
+        # 一次性从旧版 user_data.json 导入账户
+        conn = self._connect()  # 获取连接
+        with conn:  # 在同一个事务中检查并写入迁移标记，避免多实例重复迁移
+            conn.execute("BEGIN IMMEDIATE")  # 立即获取写锁
+            done = conn.execute("SELECT value FROM meta WHERE key = 'legacy_json_migrated'").fetchone()  # 查询迁移标记
+            if done is not None:  # 已经迁移过
+                return
+            if os.path.exists(self.legacy_json_path):  # 存在旧版数据文件
+                with open(self.legacy_json_path, "r") as f:  # 打开旧版数据文件
+                    user_data = json.load(f)  # 加载用户数据
+                conn.executemany(
+                    "INSERT OR IGNORE INTO users (username, password, is_admin) VALUES (?, ?, ?)",
+                    [(name, info["password"], int(bool(info.get("is_admin", False))))
+                     for name, info in user_data.items()]
+                )  # 批量导入账户，已存在的用户名保持不变
+            conn.execute("INSERT INTO meta (key, value) VALUES ('legacy_json_migrated', '1')")  # 写入迁移标记
+
+    def _check_external_writes(self):
+        # 通过 PRAGMA data_version 检测写入（包括其他程序实例和本进程其他线程的连接），必要时清空缓存
+        with self._cache_lock:  # 加锁访问缓存和版本检测连接
+            version = self._version_conn.execute("PRAGMA data_version").fetchone()[0]  # 版本检测连接看到的数据版本号
+            if version != self._data_version:  # 版本号变化说明其他连接修改过数据库
+                self._cache.clear()  # 清空缓存
+                self._data_version = version  # 记录新的版本号
+
+    def get_user(self, username):
+        """
+        查询账户，返回 {'username', 'password', 'is_admin'} 字典，不存在时返回None
+        """
+        self._check_external_writes()  # 检查缓存是否仍然有效
+        with self._cache_lock:  # 加锁访问缓存
+            cached = self._cache.get(username)  # 查询缓存
+        if cached is not None:  # 命中缓存
+            return cached
+
+        row = self._connect().execute(
+            "SELECT username, password, is_admin FROM users WHERE username = ?", (username,)
+        ).fetchone()  # 按主键查询
+        if row is None:  # 用户不存在（不缓存不存在的结果，以便看到其他实例新注册的用户）
+            return None
+        user = {"username": row[0], "password": row[1], "is_admin": bool(row[2])}  # 组装账户记录
+        with self._cache_lock:  # 加锁写入缓存
+            self._cache[username] = user  # 写入缓存
+        return user  # 返回账户记录
+
+    def add_user(self, username, password_hash, is_admin=False):
+        """
+        新增账户，用户名已存在时返回False
+        """
+        conn = self._connect()  # 获取连接
+        with conn:  # 在事务中执行
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO users (username, password, is_admin) VALUES (?, ?, ?)",
+                (username, password_hash, int(is_admin))
+            )  # 原子插入，主键冲突时忽略
+        return cursor.rowcount == 1  # 插入成功返回True
+
+    def update_password(self, username, password_hash):
+        # 更新账户的密码哈希（用于旧版哈希升级）
+        conn = self._connect()  # 获取连接
+        with conn:  # 在事务中执行
+            conn.execute("UPDATE users SET password = ? WHERE username = ?", (password_hash, username))  # 更新密码
+        with self._cache_lock:  # 加锁访问缓存
+            self._cache.pop(username, None)  # 使缓存失效
+
+    def ensure_default_admin(self, password="admin123"):
+        # 数据库为空时创建默认管理员账户（密码哈希较慢，在后台线程中调用）
+        conn = self._connect()  # 获取连接
+        if conn.execute("SELECT 1 FROM users LIMIT 1").fetchone() is None:  # 没有任何账户
+            self.add_user("admin", hash_password(password), is_admin=True)  # 创建默认管理员
+
+    def close(self):
+        # 关闭当前线程的数据库连接
+        conn = getattr(self._local, "conn", None)  # 获取当前线程连接
+        if conn is not None:  # 存在连接
+            conn.close()  # 关闭连接
+            self._local.conn = None  # 清除引用